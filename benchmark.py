@@ -0,0 +1,953 @@
+"""
+Brother printer web UI emulator, fake Zabbix trapper and benchmarks for brother.py.
+
+Usage:
+    python3 benchmark.py run --sizes 1 10 100 1000
+    python3 benchmark.py startup --budget-ms 100
+    python3 benchmark.py emulate --printers 10 --port 8080 --language es
+    python3 benchmark.py trapper --port 10051
+    python3 benchmark.py snmp --printers 10
+    python3 benchmark.py snmp-agent --printers 10 --port 1161
+"""
+import argparse
+import bisect
+import contextlib
+import io
+import json
+import os
+import random
+import socketserver
+import ssl
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import concurrent.futures
+import http.server
+import urllib.parse
+import zlib
+
+import brother
+
+# Texts of the information page of a colour laser printer, per language
+PAGE_LANGUAGES = {
+    'en': {
+        'title': 'Maintenance Information',
+        'remaining': 'Remaining Life',
+        'toner': 'Toner {color}**',
+        'drum': 'Drum Unit {color}*',
+        'colors': ['Cyan (C)', 'Magenta (M)', 'Yellow (Y)', 'Black (BK)'],
+        'belt': 'Belt Unit',
+        'fuser': 'Fuser Unit',
+        'life': 'Life Remaining',
+        'pages_unit': 'pages',
+        'total_pages': 'Total Pages Printed',
+        'colour': 'Colour',
+        'bw': 'B&amp;W',
+        'login': 'Please Login'
+    },
+    'es': {
+        'title': 'Información de mantenimiento',
+        'remaining': 'Vida útil restante',
+        'toner': 'Tóner {color}**',
+        'drum': 'Unidad de tambor {color}*',
+        'colors': ['Cian (C)', 'Magenta (M)', 'Amarillo (Y)', 'Negro (BK)'],
+        'belt': 'Unidad de correa',
+        'fuser': 'Unidad de fusor',
+        'life': 'Vida restante',
+        'pages_unit': 'páginas',
+        'total_pages': 'Total de páginas impresas',
+        'colour': 'Color',
+        'bw': 'ByN',
+        'login': 'Iniciar sesión'
+    }
+}
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><title>Brother HL-L8360CDW series</title></head>
+<body><div id="mainContent">
+<form method="post" action="/home/status.html">
+<h2>{login}</h2>
+<input type="hidden" id="CSRFToken" name="CSRFToken" value="{csrf}">
+<input type="password" id="LogBox" name="B1891">
+<input type="hidden" name="loginurl" value="/general/information.html?kind=item">
+</form></div></body></html>
+"""
+
+# Padding that mimics the menus and scripts of the real page
+PAGE_PADDING = '<div class="menu"><ul>' + ''.join(
+    f'<li><a href="/general/item{number}.html">Item {number}</a></li>' for number in range(150)
+) + '</ul></div>\n'
+
+def render_information_page(values, language='en'):
+    """
+    Renders an information page like the one served by the printer.
+
+    Args:
+        values: Dictionary with the same shape as extract_printer_data returns
+        language: 'en' or 'es'
+
+    Returns:
+        str: HTML of the page
+    """
+    texts = PAGE_LANGUAGES[language]
+    colors = dict(zip(['cyan', 'magenta', 'yellow', 'black'], texts['colors']))
+    lines = [
+        '<!DOCTYPE html>\n<html><head><title>Brother HL-L8360CDW series</title></head><body>',
+        PAGE_PADDING,
+        f'<div id="mainContent"><h2>{texts["title"]}</h2>',
+        f'<div class="contentsGroup"><h3>{texts["remaining"]}</h3><dl class="items_info">'
+    ]
+    for color, level in values['toner'].items():
+        lines.append(f'<dt>{texts["toner"].format(color=colors[color])}</dt><dd>({level}%)</dd>')
+    for color, level in values['drum'].items():
+        lines.append(f'<dt>{texts["drum"].format(color=colors[color])}</dt><dd>({level}%)</dd>')
+    for unit, label in (('belt_unit', texts['belt']), ('fuser_unit', texts['fuser'])):
+        lines.append(f'<dt>{label}</dt><dd>{values[unit]["pages"]} {texts["pages_unit"]}</dd>')
+        lines.append(f'<dt class="subhead">{texts["life"]}</dt><dd>({values[unit]["percent"]}%)</dd>')
+    pages = values['pages_printed']
+    lines.extend([
+        '</dl></div>',
+        f'<div class="contentsGroup"><h3>{texts["total_pages"]}</h3><dl class="items_info_1line">',
+        f'<dt>Total</dt><dd>{pages["total"]}</dd>'
+    ])
+    # Printers without the colour/mono split (monochrome models) leave them out
+    for counter in ('colour', 'bw'):
+        if counter in pages:
+            lines.append(f'<dt class="subhead"><span>{texts[counter]}</span></dt><dd>{pages[counter]}</dd>')
+    lines.extend([
+        '</dl></div></div>',
+        PAGE_PADDING,
+        '</body></html>\n'
+    ])
+    return '\n'.join(lines)
+
+def random_printer_values(rng):
+    """Returns random consumable levels and counters for an emulated printer."""
+    colour = rng.randint(0, 50000)
+    bw = rng.randint(0, 100000)
+    return {
+        'toner': {color: rng.randint(0, 100) for color in ('cyan', 'magenta', 'yellow', 'black')},
+        'drum': {color: rng.randint(0, 100) for color in ('cyan', 'magenta', 'yellow', 'black')},
+        'belt_unit': {'pages': rng.randint(0, 50000), 'percent': rng.randint(0, 100)},
+        'fuser_unit': {'pages': rng.randint(0, 100000), 'percent': rng.randint(0, 100)},
+        'pages_printed': {'total': colour + bw, 'colour': colour, 'bw': bw}
+    }
+
+class QuietHTTPServer(http.server.ThreadingHTTPServer):
+    """HTTP server that ignores clients closing the connection before the answer ends."""
+
+    def handle_error(self, request, client_address):
+        # Streamed reads and poll deadlines close the socket on purpose
+        if isinstance(sys.exc_info()[1], (ConnectionError, ssl.SSLError)):
+            return
+        super().handle_error(request, client_address)
+
+class PrinterEmulator:
+    """
+    Serves the web UI of one or many Brother printers.
+
+    Every printer lives under its own path prefix (/printer/<n>), so one
+    server can emulate a whole fleet. It implements /home/status.html with
+    the CSRFToken, the B1891 login POST (redirecting to the information
+    page) and /general/information.html?kind=item, which returns the login
+    page without a valid session cookie.
+    """
+
+    def __init__(self, printers=1, password='initpass', language='en', latency=0.0, slow=0,
+                 failure_rate=0.0, redirect=True, https=False, certfile=None, seed=0):
+        """
+        Args:
+            printers: Number of emulated printers
+            password: Password accepted by the login form
+            language: 'en', 'es' or 'mixed' (alternating per printer)
+            latency: Seconds to wait before every answer
+            slow: Bytes per second for the answer body (0 sends it at once)
+            failure_rate: Probability of answering with an HTTP 500 error
+            redirect: If False, the login POST answers with a plain page and
+                      the client has to GET the information page itself
+            https: Serve over TLS with a self-signed certificate
+            certfile: PEM file with certificate and key (generated if None)
+            seed: Seed for the random printer values
+        """
+        rng = random.Random(seed)
+        languages = ['en', 'es'] if language == 'mixed' else [language]
+        self.printers = [
+            {
+                'values': random_printer_values(rng),
+                'language': languages[number % len(languages)],
+                'token': f'{rng.getrandbits(64):016x}'
+            }
+            for number in range(printers)
+        ]
+        self.pages = [
+            render_information_page(printer['values'], printer['language']) for printer in self.printers
+        ]
+        self.password = password
+        self.latency = latency
+        self.slow = slow
+        self.failure_rate = failure_rate
+        self.redirect = redirect
+        self.https = https
+        self.certfile = certfile
+        self.stats = {'requests': 0, 'logins': 0, 'failures': 0, 'bytes': 0}
+        self._lock = threading.Lock()
+        self._server = None
+        self._tempdir = None
+
+    def url(self, number):
+        """Returns the base URL of printer number."""
+        scheme = 'https' if self.https else 'http'
+        host, port = self._server.server_address[:2]
+        return f'{scheme}://{host}:{port}/printer/{number}'
+
+    def start(self, host='127.0.0.1', port=0):
+        """
+        Starts serving in a background thread.
+
+        Returns:
+            PrinterEmulator: self
+        """
+        self._server = QuietHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._server.request_queue_size = 1024
+        if self.https:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.certfile or self._self_signed_certificate())
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stops the server."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._tempdir:
+            self._tempdir.cleanup()
+
+    def _self_signed_certificate(self):
+        self._tempdir = tempfile.TemporaryDirectory()
+        path = os.path.join(self._tempdir.name, 'printer.pem')
+        subprocess.run(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+             '-subj', '/CN=localhost', '-keyout', path, '-out', path],
+            check=True, capture_output=True
+        )
+        return path
+
+    def _count(self, counter, value=1):
+        with self._lock:
+            self.stats[counter] += value
+
+    def _handler(self):
+        emulator = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _printer(self):
+                parts = urllib.parse.urlsplit(self.path).path.split('/')
+                try:
+                    number = int(parts[2])
+                    printer = emulator.printers[number]
+                except (IndexError, ValueError):
+                    return None, None, None
+                return number, printer, '/' + '/'.join(parts[3:])
+
+            def _authenticated(self, printer):
+                return f"AuthCookie={printer['token']}" in (self.headers.get('Cookie') or '')
+
+            def _answer(self, status, body='', headers=()):
+                emulator._count('requests')
+                if emulator.latency:
+                    time.sleep(emulator.latency)
+                if emulator.failure_rate and random.random() < emulator.failure_rate:
+                    emulator._count('failures')
+                    status, body, headers = 500, 'Internal Server Error', ()
+                data = body.encode('utf-8')
+                emulator._count('bytes', len(data))
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if emulator.slow:
+                    step = max(1, emulator.slow // 10)
+                    for start in range(0, len(data), step):
+                        self.wfile.write(data[start:start + step])
+                        self.wfile.flush()
+                        time.sleep(step / emulator.slow)
+                else:
+                    self.wfile.write(data)
+
+            def _login_page(self, number, printer):
+                texts = PAGE_LANGUAGES[printer['language']]
+                return LOGIN_PAGE.format(login=texts['login'], csrf=f"csrf{number}")
+
+            def do_GET(self):
+                number, printer, path = self._printer()
+                if printer is None:
+                    return self._answer(404, 'Not Found')
+                if path == '/home/status.html':
+                    return self._answer(200, self._login_page(number, printer),
+                                        [('Set-Cookie', f'SessionId={number}; Path=/printer/{number}/')])
+                if path == '/general/information.html':
+                    if self._authenticated(printer):
+                        return self._answer(200, emulator.pages[number])
+                    return self._answer(200, self._login_page(number, printer))
+                return self._answer(404, 'Not Found')
+
+            def do_POST(self):
+                number, printer, path = self._printer()
+                length = int(self.headers.get('Content-Length') or 0)
+                form = urllib.parse.parse_qs(self.rfile.read(length).decode('utf-8'))
+                if printer is None or path != '/home/status.html':
+                    return self._answer(404, 'Not Found')
+                if form.get('B1891') != [emulator.password] or form.get('CSRFToken') != [f"csrf{number}"]:
+                    return self._answer(200, self._login_page(number, printer))
+
+                emulator._count('logins')
+                cookie = ('Set-Cookie', f"AuthCookie={printer['token']}; Path=/printer/{number}/")
+                if emulator.redirect:
+                    return self._answer(302, '', [
+                        ('Location', f'/printer/{number}/general/information.html?kind=item'), cookie
+                    ])
+                return self._answer(200, '<html><body>Status</body></html>', [cookie])
+
+        return Handler
+
+class FakeTrapper:
+    """
+    Zabbix trapper stand-in that accepts the sender protocol and records
+    every received item.
+    """
+
+    def __init__(self, fail_keys=(), compress=False, large=False, reply='valid'):
+        """
+        Args:
+            fail_keys: Item keys reported as failed to the client
+            compress: Answer with a zlib compressed body (compression flag)
+            large: Answer with 64-bit lengths (large packet flag)
+            reply: 'valid', 'invalid' (garbage instead of a Zabbix answer)
+                   or 'none' (close the connection after reading the values)
+        """
+        self.items = []
+        self.connections = 0
+        self.fail_keys = set(fail_keys)
+        self.compress = compress
+        self.large = large
+        self.reply = reply
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def address(self):
+        """Returns (host, port) where the trapper listens."""
+        return self._server.server_address
+
+    def start(self, host='127.0.0.1', port=0):
+        """
+        Starts listening in a background thread.
+
+        Returns:
+            FakeTrapper: self
+        """
+        trapper = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                header = self._read(13)
+                length = struct.unpack('<I', header[5:9])[0]
+                request = json.loads(self._read(length).decode('utf-8'))
+                items = request.get('data', [])
+                failed = sum(1 for item in items if item.get('key') in trapper.fail_keys)
+                with trapper._lock:
+                    trapper.connections += 1
+                    trapper.items.extend(items)
+                if trapper.reply == 'none':
+                    return
+                if trapper.reply == 'invalid':
+                    self.request.sendall(b'HTTP/1.1 400 Bad Request\r\n\r\n')
+                    return
+                response = json.dumps({
+                    'response': 'success',
+                    'info': f'processed: {len(items) - failed}; failed: {failed}; '
+                            f'total: {len(items)}; seconds spent: 0.000100'
+                }).encode('utf-8')
+                flags = brother.ZABBIX_FLAG_STANDARD
+                size = len(response)
+                if trapper.compress:
+                    flags |= brother.ZABBIX_FLAG_COMPRESSED
+                    response = zlib.compress(response)
+                if trapper.large:
+                    flags |= brother.ZABBIX_FLAG_LARGE
+                    lengths = struct.pack('<QQ', len(response), size)
+                else:
+                    lengths = struct.pack('<II', len(response), size if trapper.compress else 0)
+                self.request.sendall(brother.ZABBIX_HEADER + bytes([flags]) + lengths + response)
+
+            def _read(self, size):
+                data = b''
+                while len(data) < size:
+                    chunk = self.request.recv(size - len(data))
+                    if not chunk:
+                        raise ConnectionError("Client closed the connection")
+                    data += chunk
+                return data
+
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stops the trapper."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+class FakeSnmpAgent:
+    """
+    SNMPv2c agent stand-in that answers GET, GETNEXT and GETBULK with the
+    Printer-MIB supplies table and the Brother private counters of emulated
+    printers.
+
+    The community selects the printer: 'public' is printer 0 and
+    'public@<n>' printer n, so one UDP port can serve a whole fleet.
+    """
+
+    def __init__(self, printers, community='public', brother_oids=True, max_varbinds=None):
+        """
+        Args:
+            printers: List of printer values (see random_printer_values)
+            community: Community accepted by the agent
+            brother_oids: Also serve the Brother private maintenance and
+                          counter blocks (without them the remaining life
+                          of the belt and fuser comes from level/max)
+            max_varbinds: GETBULK answers with more varbinds than this get
+                          a tooBig error instead, like a small agent buffer
+        """
+        self.community = community
+        self.max_varbinds = max_varbinds
+        self.tables = [self._build_table(values, brother_oids) for values in printers]
+        self.stats = {'requests': 0, 'varbinds': 0, 'too_big': 0}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def address(self):
+        """Returns (host, port) where the agent listens."""
+        return self._server.server_address
+
+    def community_for(self, number):
+        """Returns the community that selects printer number."""
+        return self.community if number == 0 else f'{self.community}@{number}'
+
+    @staticmethod
+    def _build_table(values, brother_oids):
+        integer = brother.BER_INTEGER
+        string = brother.BER_OCTET_STRING
+        rows = []
+        for number, color in enumerate(brother.SNMP_COLORS, 1):
+            if color in values['toner']:
+                rows.append((3, color, f'{color.capitalize()} Toner Cartridge', 19, 100, values['toner'][color]))
+            if color in values['drum']:
+                rows.append((9, color, f'{color.capitalize()} Drum Unit', 7, 30000, values['drum'][color] * 300))
+        for supply_type, unit, name in ((20, 'belt_unit', 'Belt Unit'), (15, 'fuser_unit', 'Fuser Unit')):
+            pages = values[unit]['pages']
+            maximum = round(pages * 100 / values[unit]['percent']) if values[unit]['percent'] else pages + 1
+            rows.append((supply_type, None, name, 7, maximum, pages))
+
+        table = {}
+        colorants = {color: number for number, color in enumerate(brother.SNMP_COLORS, 1)}
+        for color, number in colorants.items():
+            table[brother.PRT_COLORANT_VALUE + (1, number)] = (string, color.encode())
+        for row, (supply_type, color, description, unit, maximum, level) in enumerate(rows, 1):
+            index = (1, row)
+            table[brother.PRT_SUPPLIES_COLORANT + index] = (integer, colorants.get(color, 0))
+            table[brother.PRT_SUPPLIES_TYPE + index] = (integer, supply_type)
+            table[brother.PRT_SUPPLIES_DESCRIPTION + index] = (string, description.encode())
+            table[brother.PRT_SUPPLIES_UNIT + index] = (integer, unit)
+            table[brother.PRT_SUPPLIES_MAX + index] = (integer, maximum)
+            table[brother.PRT_SUPPLIES_LEVEL + index] = (integer, level)
+
+        pages = values['pages_printed']
+        table[brother.PRT_MARKER_LIFE_COUNT] = (brother.SNMP_COUNTER32, pages['total'])
+        if brother_oids:
+            def block(records):
+                return b''.join(bytes((code, 0x01, 0x04)) + value.to_bytes(4, 'big')
+                                for code, value in records) + b'\xff'
+            table[brother.BROTHER_COUNTERS] = (string, block(
+                [(0x00, pages['total']), (0x01, pages['bw']), (0x02, pages['colour'])]
+            ))
+            table[brother.BROTHER_MAINTENANCE] = (string, block(
+                [(0x69, values['belt_unit']['percent'] * 100), (0x6a, values['fuser_unit']['percent'] * 100)]
+            ))
+        return {'values': table, 'oids': sorted(table)}
+
+    @staticmethod
+    def _encode(tag, value):
+        if tag == brother.BER_OCTET_STRING:
+            return value
+        return brother.ber_encode_integer(value, tag)[2:]
+
+    def answer(self, packet):
+        """
+        Builds the answer to an SNMP request.
+
+        Returns:
+            bytes: Response datagram, or None for unknown communities
+        """
+        request = brother.parse_snmp_message(packet)
+        community, _, number = request['community'].partition('@')
+        number = int(number or 0)
+        if community != self.community or number >= len(self.tables):
+            return None
+        table = self.tables[number]
+
+        def following(oid):
+            position = bisect.bisect_right(table['oids'], oid)
+            if position == len(table['oids']):
+                return oid, brother.SNMP_END_OF_MIB_VIEW, b''
+            found = table['oids'][position]
+            tag, value = table['values'][found]
+            return found, tag, self._encode(tag, value)
+
+        varbinds = []
+        oids = [oid for oid, _, _ in request['varbinds']]
+        if request['pdu_type'] == brother.SNMP_GET:
+            for oid in oids:
+                if oid in table['values']:
+                    tag, value = table['values'][oid]
+                    varbinds.append((oid, tag, self._encode(tag, value)))
+                else:
+                    varbinds.append((oid, brother.SNMP_NO_SUCH_INSTANCE, b''))
+        elif request['pdu_type'] == brother.SNMP_GET_NEXT:
+            varbinds = [following(oid) for oid in oids]
+        elif request['pdu_type'] == brother.SNMP_GET_BULK:
+            non_repeaters = request['error_status']
+            varbinds = [following(oid) for oid in oids[:non_repeaters]]
+            cursors = oids[non_repeaters:]
+            for _ in range(request['error_index']):
+                row = [following(oid) for oid in cursors]
+                varbinds.extend(row)
+                cursors = [oid for oid, _, _ in row]
+                if all(tag == brother.SNMP_END_OF_MIB_VIEW for _, tag, _ in row):
+                    break
+            if self.max_varbinds is not None and len(varbinds) > self.max_varbinds:
+                with self._lock:
+                    self.stats['too_big'] += 1
+                return brother.build_snmp_message(request['community'], brother.SNMP_RESPONSE,
+                                                  request['request_id'], [], brother.SNMP_TOO_BIG)
+
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['varbinds'] += len(varbinds)
+        return brother.build_snmp_message(request['community'], brother.SNMP_RESPONSE, request['request_id'],
+                                          varbinds)
+
+    def start(self, host='127.0.0.1', port=0):
+        """
+        Starts listening in a background thread.
+
+        Returns:
+            FakeSnmpAgent: self
+        """
+        agent = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                packet, sock = self.request
+                try:
+                    response = agent.answer(packet)
+                except ValueError:
+                    return
+                if response:
+                    sock.sendto(response, self.client_address)
+
+        self._server = socketserver.ThreadingUDPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stops the agent."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def benchmark_size(printers, workers, extractor, emulator_options, trapper):
+    """
+    Polls an emulated fleet twice (cold login and cached session) and sends
+    the results to the fake trapper.
+
+    Args:
+        printers: Number of emulated printers
+        workers: Printers polled at the same time
+        extractor: Name of the extractor in brother.EXTRACTORS
+        emulator_options: Keyword arguments for PrinterEmulator
+        trapper: Running FakeTrapper
+
+    Returns:
+        dict: Per-stage latencies (p50/p95 in ms) and throughput
+    """
+    emulator = PrinterEmulator(printers, **emulator_options).start()
+    cache_dir = tempfile.TemporaryDirectory()
+    cache = brother.SessionCache(cache_dir.name, ttl=3600)
+    stages = {'login': [], 'download': [], 'parse': [], 'send': []}
+    errors = 0
+
+    def poll(number, cached):
+        html_content, elapsed = _timed(
+            brother.login_y_descargar_html, emulator.url(number), emulator.password, None,
+            timeout=30, session_cache=cache if cached else None
+        )
+        return html_content, elapsed
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                # Cold poll: full login + download, then save the session
+                start = time.perf_counter()
+                cold = list(executor.map(lambda number: poll(number, True), range(printers)))
+                cold_wall = time.perf_counter() - start
+
+                # Warm poll: the cached session goes straight to the information page
+                start = time.perf_counter()
+                warm = list(executor.map(lambda number: poll(number, True), range(printers)))
+                warm_wall = time.perf_counter() - start
+
+            items = []
+            for number, ((cold_html, cold_time), (warm_html, warm_time)) in enumerate(zip(cold, warm)):
+                if not cold_html or not warm_html:
+                    errors += 1
+                    continue
+                stages['download'].append(warm_time)
+                stages['login'].append(max(0.0, cold_time - warm_time))
+                data, parse_time = _timed(brother.EXTRACTORS[extractor], warm_html)
+                stages['parse'].append(parse_time)
+                if data != emulator.printers[number]['values']:
+                    errors += 1
+                items.extend(brother.build_zabbix_items(f'printer-{number}', data))
+
+            host, port = trapper.address
+            summary, send_time = _timed(brother.send_items_to_zabbix, items, host, port, 'native')
+            stages['send'].append(send_time)
+    finally:
+        emulator.stop()
+        cache_dir.cleanup()
+
+    result = {
+        'printers': printers,
+        'workers': workers,
+        'extractor': extractor,
+        'errors': errors,
+        'values_sent': summary['processed'],
+        'cold_wall': cold_wall,
+        'warm_wall': warm_wall,
+        'throughput_cold': printers / cold_wall if cold_wall else 0.0,
+        'throughput_warm': printers / warm_wall if warm_wall else 0.0,
+        'http_requests': emulator.stats['requests'],
+        'logins': emulator.stats['logins']
+    }
+    for stage, values in stages.items():
+        result[f'{stage}_p50_ms'] = _percentile(values, 0.5) * 1000
+        result[f'{stage}_p95_ms'] = _percentile(values, 0.95) * 1000
+    return result
+
+def run_benchmarks(args):
+    """Runs the benchmark for every fleet size and prints a report."""
+    trapper = FakeTrapper().start()
+    emulator_options = {
+        'language': args.language,
+        'latency': args.latency,
+        'slow': args.slow,
+        'failure_rate': args.failure_rate,
+        'redirect': not args.no_redirect,
+        'https': args.https,
+        'certfile': args.certfile
+    }
+    results = []
+
+    print(f"{'printers':>8} {'login p50':>10} {'download p50':>13} {'parse p50':>10} {'send':>9} "
+          f"{'cold/s':>8} {'warm/s':>8} {'errors':>7}")
+    try:
+        for size in args.sizes:
+            result = benchmark_size(size, min(args.workers, size), args.parser, emulator_options, trapper)
+            results.append(result)
+            print(f"{size:>8} {result['login_p50_ms']:>8.2f}ms {result['download_p50_ms']:>11.2f}ms "
+                  f"{result['parse_p50_ms']:>8.2f}ms {result['send_p50_ms']:>7.2f}ms "
+                  f"{result['throughput_cold']:>8.1f} {result['throughput_warm']:>8.1f} {result['errors']:>7}")
+    finally:
+        trapper.stop()
+
+    if args.json:
+        # One JSON line per run so results can be tracked over time
+        with open(args.json, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'time': time.time(), 'options': emulator_options, 'results': results}) + '\n')
+        print(f"\nResults appended to '{args.json}'")
+
+    return all(result['errors'] == 0 for result in results) or args.failure_rate > 0
+
+def run_snmp_benchmark(args):
+    """
+    Polls emulated printers from their web UI, over SNMP and with both
+    (source 'auto'), checks that every source returns the same data and
+    prints the latency and the number of requests of each.
+
+    Returns:
+        bool: True if every source returned the emulated values
+    """
+    emulator = PrinterEmulator(args.printers).start()
+    agent = FakeSnmpAgent([printer['values'] for printer in emulator.printers],
+                          brother_oids=not args.no_brother_oids).start()
+    host, port = agent.address
+    ok = True
+
+    print(f"{'source':>8} {'p50':>9} {'p95':>9} {'HTTP req':>9} {'SNMP req':>9} {'errors':>7}")
+    try:
+        for source in brother.PRINTER_SOURCES:
+            snmp_only = brother.SnmpOnlyPrinters()
+            latencies = []
+            errors = 0
+            http_before = emulator.stats['requests']
+            snmp_before = agent.stats['requests']
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(args.rounds):
+                    for number in range(args.printers):
+                        printer = {
+                            'url': emulator.url(number).replace('127.0.0.1', host),
+                            'zabbix_hostname': f'printer-{number}',
+                            'password': emulator.password,
+                            'snmp_port': port,
+                            'snmp_community': agent.community_for(number)
+                        }
+                        result = brother.poll_printer(printer, source=source, extractor=args.parser,
+                                                      snmp_only=snmp_only)
+                        latencies.append(result['latency'])
+                        if result['data'] != emulator.printers[number]['values']:
+                            errors += 1
+            polls = args.rounds * args.printers
+            print(f"{source:>8} {_percentile(latencies, 0.5) * 1000:>7.2f}ms "
+                  f"{_percentile(latencies, 0.95) * 1000:>7.2f}ms "
+                  f"{(emulator.stats['requests'] - http_before) / polls:>9.1f} "
+                  f"{(agent.stats['requests'] - snmp_before) / polls:>9.1f} {errors:>7}")
+            # Without the private OIDs the remaining life comes from level/max,
+            # which can differ by a rounding step from the web UI
+            if errors and (source == 'html' or not args.no_brother_oids):
+                ok = False
+    finally:
+        agent.stop()
+        emulator.stop()
+    return ok
+
+def run_readings_benchmark(args):
+    """
+    Compares the memory and the cost of building the Zabbix items of the
+    nested extractor dictionaries and of PrinterReading, and checks that
+    both give the same items and that the serializations round-trip.
+
+    Returns:
+        bool: True if both representations give the same items
+    """
+    import pickle
+    import tracemalloc
+
+    rng = random.Random(0)
+    ok = True
+    print(f"{'shape':>14} {'bytes/printer':>14} {'printers/s':>10}")
+    for shape in ('dict', 'PrinterReading'):
+        tracemalloc.start()
+        readings = [random_printer_values(rng) for _ in range(args.printers)]
+        if shape == 'PrinterReading':
+            readings = [brother.PrinterReading.from_dict(values) for values in readings]
+        size = tracemalloc.get_traced_memory()[0] / args.printers
+        tracemalloc.stop()
+
+        sample = readings[:1000]
+        _, elapsed = _timed(lambda: [brother.build_zabbix_items('printer', values) for values in sample])
+        print(f"{shape:>14} {size:>14.0f} {len(sample) / elapsed:>10.0f}")
+
+    for values in (random_printer_values(rng) for _ in range(100)):
+        reading = brother.PrinterReading.from_dict(values)
+        copies = (brother.PrinterReading.from_json(reading.to_json()), pickle.loads(pickle.dumps(reading)))
+        if (brother.build_zabbix_items('printer', values) != brother.build_zabbix_items('printer', reading)
+                or any(copy != values for copy in copies)):
+            ok = False
+    print(f"\nSerialized size: {len(reading.to_json())} bytes JSON, "
+          f"{len(json.dumps(values))} bytes for the nested dictionary as JSON")
+    print("✓ Same items and lossless serialization" if ok else "✗ The readings differ from the dictionaries")
+    return ok
+
+# Modules that the lightweight subcommands must not load
+HEAVY_MODULES = ('requests', 'urllib3', 'bs4', 'subprocess', 'sqlite3', 'concurrent.futures')
+
+def run_startup_benchmark(args):
+    """
+    Measures the startup time of brother.py and checks it against a budget.
+
+    Returns:
+        bool: True if the parse-only path is within the budget and doesn't
+              import any of HEAVY_MODULES
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'brother.py')
+    values = random_printer_values(random.Random(0))
+    with tempfile.NamedTemporaryFile('w', suffix='.html', delete=False, encoding='utf-8') as file:
+        file.write(render_information_page(values))
+        page = file.name
+
+    commands = {
+        'import brother': [sys.executable, '-c', 'import brother'],
+        'parse --parser fast': [sys.executable, script, 'parse', '--parser', 'fast', page],
+        'parse (bs4)': [sys.executable, script, 'parse', page],
+        'baseline python': [sys.executable, '-c', 'pass']
+    }
+    timings = {}
+    try:
+        for name, command in commands.items():
+            runs = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                subprocess.run(command, check=True, capture_output=True,
+                               cwd=os.path.dirname(script))
+                runs.append(time.perf_counter() - start)
+            timings[name] = _percentile(runs, 0.5) * 1000
+            print(f"{name:>22}: {timings[name]:7.1f} ms (median of {args.runs})")
+
+        imports = subprocess.run(
+            [sys.executable, '-X', 'importtime', script, 'parse', '--parser', 'fast', page],
+            check=True, capture_output=True, text=True
+        ).stderr
+    finally:
+        os.remove(page)
+
+    loaded = {line.split('|')[-1].strip() for line in imports.splitlines() if line.startswith('import time:')}
+    heavy = [module for module in HEAVY_MODULES if module in loaded]
+    # Measured over a bare interpreter so the budget doesn't depend on the machine's Python startup
+    overhead = timings['parse --parser fast'] - timings['baseline python']
+    within_budget = overhead <= args.budget_ms
+
+    print(f"\n'parse --parser fast' overhead over bare Python: {overhead:.1f} ms "
+          f"(budget {args.budget_ms:.0f} ms) -> {'OK' if within_budget else 'EXCEEDED'}")
+    if heavy:
+        print(f"✗ Heavy modules loaded by the parse-only path: {', '.join(heavy)}")
+    else:
+        print("✓ The parse-only path doesn't load " + ', '.join(HEAVY_MODULES))
+    return within_budget and not heavy
+
+def serve_forever(*servers):
+    """Keeps the emulators running until Ctrl+C."""
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Emulators and benchmarks for brother.py')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Benchmark login, download, parse and send against emulated printers')
+    run.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000], help='Fleet sizes (default: 1 10 100 1000)')
+    run.add_argument('--workers', type=int, default=50, help='Printers polled at the same time (default: 50)')
+    run.add_argument('--parser', choices=sorted(brother.EXTRACTORS), default='bs4', help='Extractor to benchmark (default: bs4)')
+    run.add_argument('--json', help='File where a JSON line with the results is appended')
+
+    startup = commands.add_parser('startup', help='Measure the startup time of brother.py against a budget')
+    startup.add_argument('--runs', type=int, default=10, help='Runs of each command (default: 10)')
+    startup.add_argument('--budget-ms', type=float, default=100, help='Maximum startup overhead of the parse-only path over a bare interpreter (default: 100)')
+
+    emulate = commands.add_parser('emulate', help='Serve emulated printers until Ctrl+C')
+    emulate.add_argument('--printers', type=int, default=1, help='Number of printers (default: 1)')
+    emulate.add_argument('--port', type=int, default=8080, help='Port to listen on (default: 8080)')
+    emulate.add_argument('--password', default='initpass', help='Printer password (default: initpass)')
+
+    trapper_command = commands.add_parser('trapper', help='Run a fake Zabbix trapper that prints the received items')
+    trapper_command.add_argument('--port', type=int, default=10051, help='Port to listen on (default: 10051)')
+
+    snmp = commands.add_parser('snmp', help='Compare the web UI, SNMP and auto sources against emulated printers')
+    snmp.add_argument('--printers', type=int, default=10, help='Number of printers (default: 10)')
+    snmp.add_argument('--rounds', type=int, default=5, help='Polls of every printer per source (default: 5)')
+    snmp.add_argument('--parser', choices=sorted(brother.EXTRACTORS), default='bs4', help='Extractor for the web UI (default: bs4)')
+    snmp.add_argument('--no-brother-oids', action='store_true', help='Serve only the standard Printer-MIB')
+
+    readings = commands.add_parser('readings', help='Compare the memory and speed of PrinterReading with the nested dictionaries')
+    readings.add_argument('--printers', type=int, default=10000, help='Readings kept in memory (default: 10000)')
+
+    snmp_agent = commands.add_parser('snmp-agent', help='Run an SNMP agent stand-in for emulated printers')
+    snmp_agent.add_argument('--printers', type=int, default=1, help='Number of printers (default: 1)')
+    snmp_agent.add_argument('--port', type=int, default=1161, help='UDP port to listen on (default: 1161)')
+    snmp_agent.add_argument('--community', default='public', help='Community (printer n answers to <community>@n)')
+    snmp_agent.add_argument('--no-brother-oids', action='store_true', help='Serve only the standard Printer-MIB')
+
+    for command in (run, emulate):
+        command.add_argument('--language', choices=['en', 'es', 'mixed'], default='en', help='Language of the web UI (default: en)')
+        command.add_argument('--latency', type=float, default=0.0, help='Seconds the printer waits before every answer')
+        command.add_argument('--slow', type=int, default=0, help='Bytes per second for the answers (default: unlimited)')
+        command.add_argument('--failure-rate', type=float, default=0.0, help='Probability of an HTTP 500 answer')
+        command.add_argument('--no-redirect', action='store_true', help='Do not redirect the login POST to the information page')
+        command.add_argument('--https', action='store_true', help='Serve over HTTPS with a self-signed certificate')
+        command.add_argument('--certfile', help='PEM file with certificate and key for --https')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        sys.exit(0 if run_benchmarks(args) else 1)
+
+    elif args.command == 'startup':
+        sys.exit(0 if run_startup_benchmark(args) else 1)
+
+    elif args.command == 'emulate':
+        emulator = PrinterEmulator(
+            args.printers, args.password, args.language, args.latency, args.slow, args.failure_rate,
+            not args.no_redirect, args.https, args.certfile
+        ).start('0.0.0.0', args.port)
+        for number in range(args.printers):
+            print(f"Printer {number}: {emulator.url(number)}")
+        serve_forever(emulator)
+
+    elif args.command == 'snmp':
+        sys.exit(0 if run_snmp_benchmark(args) else 1)
+
+    elif args.command == 'readings':
+        sys.exit(0 if run_readings_benchmark(args) else 1)
+
+    elif args.command == 'snmp-agent':
+        rng = random.Random(0)
+        agent = FakeSnmpAgent([random_printer_values(rng) for _ in range(args.printers)], args.community,
+                              not args.no_brother_oids).start('0.0.0.0', args.port)
+        for number in range(args.printers):
+            print(f"Printer {number}: community '{agent.community_for(number)}' on UDP port {args.port}")
+        serve_forever(agent)
+
+    elif args.command == 'trapper':
+        trapper = FakeTrapper().start('0.0.0.0', args.port)
+        print(f"Fake Zabbix trapper listening on port {args.port}")
+        last = 0
+        try:
+            while True:
+                time.sleep(1)
+                for item in trapper.items[last:]:
+                    print(f"{item.get('host')} {item.get('key')} = {item.get('value')}")
+                last = len(trapper.items)
+        except KeyboardInterrupt:
+            trapper.stop()
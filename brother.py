@@ -1,448 +1,4514 @@
-import requests
 import os
-import subprocess
 import re
 import argparse
-from bs4 import BeautifulSoup
+import contextlib
+import sys
+import json
+import struct
+import time
+import threading
+import collections
+import collections.abc
+import heapq
+import itertools
+import random
+import signal
+import uuid
+from html.parser import HTMLParser
 
-def extract_printer_data(html_content):
+PERCENT_PATTERN = re.compile(r'(\d+)%')
+NUMBER_PATTERN = re.compile(r'(\d+)')
+
+def _empty_data():
+    """Returns the empty result dictionary shared by all the extractors."""
+    return {
+        'toner': {},
+        'drum': {},
+        'belt_unit': {},
+        'fuser_unit': {},
+        'pages_printed': {}
+    }
+
+# One value of a reading: section of the result dictionary, name inside the
+# section, PrinterReading slot, Zabbix item key and label format
+ReadingField = collections.namedtuple('ReadingField', 'metric name slot key label')
+
+def reading_field(metric, name):
+    """
+    Returns:
+        ReadingField: Description of the value 'name' of the section 'metric'
+    """
+    if metric in ('toner', 'drum'):
+        return ReadingField(metric, name, f'{metric}_{name}', f'{name}.{metric}.level',
+                            f"{metric.capitalize()} {name.capitalize()}: {{}}%")
+    if metric in ('belt_unit', 'fuser_unit'):
+        unit = metric.split('_')[0]
+        if name == 'pages':
+            return ReadingField(metric, name, f'{metric}_{name}', f'brother.{unit}.pages',
+                                f"{unit.capitalize()} Unit pages: {{}}")
+        return ReadingField(metric, name, f'{metric}_{name}', f'brother.{unit}.{name}',
+                            f"{unit.capitalize()} Unit remaining life: {{}}%")
+    labels = {'total': "Total pages: {}", 'colour': "Colour pages: {}", 'bw': "B&W pages: {}"}
+    return ReadingField(metric, name, f'{metric}_{name}', f'brother.pages.{name}',
+                        labels.get(name, f"{name} pages: {{}}"))
+
+# Fixed layout of PrinterReading: the values of a colour laser printer
+READING_FIELDS = tuple(
+    [reading_field(metric, color) for metric in ('toner', 'drum') for color in ('cyan', 'magenta', 'yellow', 'black')] +
+    [reading_field(unit, name) for unit in ('belt_unit', 'fuser_unit') for name in ('pages', 'percent')] +
+    [reading_field('pages_printed', counter) for counter in ('total', 'colour', 'bw')]
+)
+READING_SECTIONS = tuple(_empty_data())
+_READING_SLOTS = {field.slot: field for field in READING_FIELDS}
+
+def _check_reading_value(name, value):
+    """Raises ValueError unless value is a non-negative integer."""
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError(f"Invalid value for {name}: {value!r} (expected a non-negative integer)")
+
+class PrinterReading(collections.abc.Mapping):
+    """
+    Values read from one printer, one slot per field of READING_FIELDS
+    instead of the five nested dictionaries returned by the extractors, so
+    a daemon can keep the readings of thousands of printers around.
+    
+    Values outside the fixed layout (colours of other model families) go to
+    'extra' with the nested shape. The reading is also a read-only mapping
+    with the shape of the extractor dictionaries ('toner' -> {'cyan': 96})
+    for the code that expects them; flatten() is what the output backends
+    use, and to_json() is a compact serialization. Every value is a
+    non-negative integer (levels in %, pages and counters).
+    """
+    
+    __slots__ = tuple(_READING_SLOTS) + ('extra',)
+    
+    def __init__(self, **values):
+        """
+        Args:
+            values: Slot values (e.g. toner_cyan=96); missing ones are None
+            
+        Raises:
+            TypeError: If a slot is unknown
+            ValueError: If a value isn't a non-negative integer
+        """
+        for slot in _READING_SLOTS:
+            value = values.pop(slot, None)
+            if value is not None:
+                _check_reading_value(slot, value)
+            setattr(self, slot, value)
+        extra = values.pop('extra', None)
+        if values:
+            raise TypeError(f"Unknown reading fields: {', '.join(values)}")
+        for metric, names in (extra or {}).items():
+            if not isinstance(names, dict):
+                raise ValueError(f"Invalid extra values for {metric}: {names!r}")
+            for name, value in names.items():
+                _check_reading_value(f'{metric}_{name}', value)
+        self.extra = extra or None
+    
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Args:
+            data: Result dictionary of an extractor (see _empty_data)
+            
+        Returns:
+            PrinterReading: Reading with the same values
+        """
+        if isinstance(data, cls):
+            return data
+        slots = {}
+        extra = {}
+        for metric, values in data.items():
+            for name, value in values.items():
+                slot = f'{metric}_{name}'
+                if slot in _READING_SLOTS:
+                    slots[slot] = value
+                else:
+                    extra.setdefault(metric, {})[name] = value
+        return cls(extra=extra, **slots)
+    
+    def flatten(self):
+        """
+        Returns:
+            list: (ReadingField, value) pairs of the values present, in the
+                  order of READING_FIELDS followed by the extra values
+        """
+        pairs = [(field, value) for field in READING_FIELDS
+                 if (value := getattr(self, field.slot)) is not None]
+        if self.extra:
+            pairs.extend((reading_field(metric, name), value)
+                         for metric, values in self.extra.items() for name, value in values.items())
+        return pairs
+    
+    def as_dict(self):
+        """
+        Returns:
+            dict: Nested dictionary with the shape of the extractor results
+        """
+        data = _empty_data()
+        for field, value in self.flatten():
+            data.setdefault(field.metric, {})[field.name] = value
+        return data
+    
+    def __getitem__(self, metric):
+        if metric not in READING_SECTIONS and not (self.extra and metric in self.extra):
+            raise KeyError(metric)
+        return {field.name: value for field, value in self.flatten() if field.metric == metric}
+    
+    def __iter__(self):
+        yield from READING_SECTIONS
+        if self.extra:
+            yield from (metric for metric in self.extra if metric not in READING_SECTIONS)
+    
+    def __len__(self):
+        return sum(1 for _ in self)
+    
+    def __repr__(self):
+        return f"PrinterReading({self.as_dict()!r})"
+    
+    def to_json(self):
+        """
+        Returns:
+            str: JSON array with the slot values in READING_FIELDS order,
+                 plus the extra values as a last element when there are any
+        """
+        values = [getattr(self, field.slot) for field in READING_FIELDS]
+        if self.extra:
+            values.append(self.extra)
+        return json.dumps(values, separators=(',', ':'))
+    
+    @classmethod
+    def from_json(cls, text):
+        """
+        Inverse of to_json.
+        
+        Raises:
+            ValueError: If the text isn't a serialized reading
+        """
+        values = json.loads(text)
+        if not isinstance(values, list) or not len(READING_FIELDS) <= len(values) <= len(READING_FIELDS) + 1:
+            raise ValueError(f"Not a serialized reading: {text[:80]!r}")
+        extra = values[-1] if len(values) > len(READING_FIELDS) else None
+        if extra is not None and not isinstance(extra, dict):
+            raise ValueError(f"Invalid extra values: {extra!r}")
+        return cls(extra=extra, **dict(zip(_READING_SLOTS, values)))
+
+# Labels used by the printer web UI, per language. Consumable labels are
+# combined with every colour ("Toner" + "Cyan" -> "Toner Cyan (C)**"),
+# word order and colour codes like "(C)" or "(BK)" don't matter.
+LABEL_LANGUAGES = {
+    'en': {
+        'toner': ['Toner'],
+        'drum': ['Drum Unit'],
+        'belt_unit': ['Belt Unit'],
+        'fuser_unit': ['Fuser Unit'],
+        'colors': {'Cyan': 'cyan', 'Magenta': 'magenta', 'Yellow': 'yellow', 'Black': 'black'},
+        'life_remaining': ['Life Remaining'],
+        'total_pages': ['Total Pages Printed'],
+        'pages': {'Total': 'total', 'Colour': 'colour', 'Color': 'colour', 'B&W': 'bw'}
+    },
+    'es': {
+        'toner': ['Tóner'],
+        'drum': ['Unidad de tambor', 'Tambor'],
+        'belt_unit': ['Unidad de correa'],
+        'fuser_unit': ['Unidad de fusor'],
+        'colors': {'Cian': 'cyan', 'Magenta': 'magenta', 'Amarillo': 'yellow', 'Negro': 'black'},
+        'life_remaining': ['Vida restante'],
+        'total_pages': ['Total de páginas impresas'],
+        'pages': {'Total': 'total', 'Color': 'colour', 'ByN': 'bw'}
+    }
+}
+
+# Labels specific to a printer model family: {family: {label: (metric, color)}}
+LABEL_FAMILIES = {}
+
+# Footnote marker that the consumable lines must carry in the maintenance page
+LABEL_MARKERS = {
+    'toner': '**',
+    'drum': '*',
+    'belt_unit': '',
+    'fuser_unit': ''
+}
+
+LABEL_CODE_PATTERN = re.compile(r'\([A-Z]{1,2}\)')
+
+def normalize_label(text):
+    """
+    Returns the lookup key of a label: its words without footnote marks or
+    colour codes, ignoring case and order.
+    
+    Args:
+        text: Text of the <dt>
+        
+    Returns:
+        frozenset: Normalized words of the label
+    """
+    return frozenset(LABEL_CODE_PATTERN.sub(' ', text.replace('*', ' ')).casefold().split())
+
+def build_label_registry():
+    """
+    Builds the lookup tables from LABEL_LANGUAGES and LABEL_FAMILIES.
+    Must be called again after changing those tables.
+    """
+    registry = {None: {}}
+    contained = []
+    life_remaining = set()
+    total_pages = set()
+    page_labels = {}
+    
+    for table in LABEL_LANGUAGES.values():
+        labels = registry[None]
+        for metric in ('toner', 'drum'):
+            for phrase in table.get(metric, []):
+                for color_name, color in table.get('colors', {}).items():
+                    labels[normalize_label(f"{phrase} {color_name}")] = (metric, color)
+                    contained.append((normalize_label(f"{phrase} {color_name}"), (metric, color)))
+        for metric in ('belt_unit', 'fuser_unit'):
+            for phrase in table.get(metric, []):
+                labels[normalize_label(phrase)] = (metric, None)
+        life_remaining.update(phrase.casefold() for phrase in table.get('life_remaining', []))
+        total_pages.update(table.get('total_pages', []))
+        page_labels.update(table.get('pages', {}))
+    
+    for family, labels in LABEL_FAMILIES.items():
+        registry[family] = {
+            normalize_label(label): (metric, color) for label, (metric, color) in labels.items()
+        }
+    
+    LABEL_REGISTRY.clear()
+    LABEL_REGISTRY.update(registry)
+    # Longest phrases first: "Drum Unit Cyan" wins over a shorter phrase in the same label
+    LABEL_CONTAINMENT[:] = sorted(contained, key=lambda entry: -len(entry[0]))
+    LABEL_CONTAINMENT_CACHE.clear()
+    LIFE_REMAINING_LABELS[:] = sorted(life_remaining)
+    TOTAL_PAGES_HEADINGS[:] = sorted(total_pages)
+    PAGE_LABELS.clear()
+    PAGE_LABELS.update(page_labels)
+
+LABEL_REGISTRY = {}
+# Toner and drum labels as (words, (metric, color)) for labels with extra
+# words, like "Toner Cartridge Cyan (C)**"; the cache keeps every lookup
+LABEL_CONTAINMENT = []
+LABEL_CONTAINMENT_CACHE = {}
+LIFE_REMAINING_LABELS = []
+TOTAL_PAGES_HEADINGS = []
+PAGE_LABELS = {}
+build_label_registry()
+
+def load_label_file(path):
+    """
+    Adds languages and model families from a JSON file to the label tables.
+    
+    The file has the same shape as LABEL_LANGUAGES (one entry per language)
+    plus an optional "families" mapping of {family: {label: [metric, color]}}.
+    
+    Args:
+        path: Path of the JSON file
+    """
+    with open(path, encoding='utf-8') as file:
+        tables = json.load(file)
+    
+    for family, labels in tables.pop('families', {}).items():
+        LABEL_FAMILIES.setdefault(family, {}).update(
+            {label: tuple(value) for label, value in labels.items()}
+        )
+    for language, table in tables.items():
+        LABEL_LANGUAGES.setdefault(language, {}).update(table)
+    build_label_registry()
+
+def _classify_label(text, model_family=None):
+    """
+    Identifies the consumable described by a <dt> label.
+    
+    Args:
+        text: Stripped text of the <dt>
+        model_family: Printer model family with its own labels, or None
+        
+    Returns:
+        tuple: (metric, color) where metric is 'toner', 'drum', 'belt_unit',
+               'fuser_unit' or None, and color is only set for toner and drum
+    """
+    key = normalize_label(text)
+    entry = None
+    if model_family is not None:
+        entry = LABEL_REGISTRY.get(model_family, {}).get(key)
+    if entry is None:
+        entry = LABEL_REGISTRY[None].get(key)
+    if entry is None:
+        entry = _contained_label(key)
+    if entry is None or LABEL_MARKERS.get(entry[0], '') not in text:
+        return None, None
+    return entry
+
+def _contained_label(key):
+    """
+    Fallback of _classify_label for labels that are not in the registry:
+    a toner or drum label matches when all the words of its phrase and
+    colour are in the label (the label can have more words).
+    
+    Args:
+        key: Normalized words of the label (see normalize_label)
+        
+    Returns:
+        tuple: (metric, color) or None
+    """
+    if key not in LABEL_CONTAINMENT_CACHE:
+        LABEL_CONTAINMENT_CACHE[key] = next((entry for words, entry in LABEL_CONTAINMENT if words <= key), None)
+    return LABEL_CONTAINMENT_CACHE[key]
+
+def _is_life_remaining(text):
+    """Checks if a <dt> label is the "Life Remaining" line of a unit."""
+    text = text.casefold()
+    return any(label in text for label in LIFE_REMAINING_LABELS)
+
+def _is_total_pages_heading(text):
+    """Checks if an <h3> is the "Total Pages Printed" section."""
+    return any(heading in text for heading in TOTAL_PAGES_HEADINGS)
+
+def _apply_maintenance_label(data, text, value_text, next_label, model_family=None, unknown_labels=None):
+    """
+    Stores the value of a maintenance <dt>/<dd> pair in data.
+    
+    Args:
+        data: Result dictionary being filled
+        text: Stripped text of the <dt>
+        value_text: Stripped text of the following <dd>
+        next_label: Callable returning (text of the next <dt>, text of its <dd>),
+                    with None for the missing elements
+        model_family: Printer model family with its own labels, or None
+        unknown_labels: Set where consumable labels (marked with "*") that
+                        are not in the registry are added
+    """
+    metric, color = _classify_label(text, model_family)
+    
+    if metric is None and unknown_labels is not None and '*' in text:
+        unknown_labels.add(text)
+    
+    if metric in ('toner', 'drum'):
+        if color:
+            match = PERCENT_PATTERN.search(value_text)
+            if match:
+                data[metric][color] = int(match.group(1))
+    
+    # Belt and Fuser units: only the first time we find them
+    elif metric in ('belt_unit', 'fuser_unit') and not data[metric]:
+        match = NUMBER_PATTERN.search(value_text)
+        if match:
+            data[metric]['pages'] = int(match.group(1))
+        # Search for the percentage in the next element
+        next_text, next_value = next_label()
+        if next_text is not None and _is_life_remaining(next_text) and next_value is not None:
+            match_pct = PERCENT_PATTERN.search(next_value)
+            if match_pct:
+                data[metric]['percent'] = int(match_pct.group(1))
+
+def _apply_pages_label(data, text, is_subhead, span_text, value_text, found_total):
+    """
+    Stores the value of a <dt> of the "Total Pages Printed" list in data.
+    
+    Args:
+        data: Result dictionary being filled
+        text: Stripped text of the <dt>
+        is_subhead: True if the <dt> has the "subhead" class
+        span_text: Stripped text of the first <span> inside the <dt> or None
+        value_text: Text of the following <dd> or None
+        found_total: True if the "Total" line was already found
+        
+    Returns:
+        bool: Updated found_total
+    """
+    pages = data['pages_printed']
+    if PAGE_LABELS.get(text) == 'total':
+        if value_text is not None:
+            match = NUMBER_PATTERN.search(value_text)
+            if match:
+                pages['total'] = int(match.group(1))
+                found_total = True
+    
+    # Only extract Colour and B&W if we already found Total
+    # and they are the first subheads after Total
+    elif found_total and is_subhead and span_text is not None:
+        key = PAGE_LABELS.get(span_text)
+        if key in ('colour', 'bw') and key not in pages and value_text is not None:
+            match = NUMBER_PATTERN.search(value_text)
+            if match:
+                pages[key] = int(match.group(1))
+    
+    return found_total
+
+def extract_printer_data(html_content, model_family=None, unknown_labels=None):
+    """
+    Extracts all maintenance data from the HTML page.
+    
+    Args:
+        html_content: HTML content of the page
+        model_family: Printer model family with its own labels, or None
+        unknown_labels: Set where unknown consumable labels are added
+        
+    Returns:
+        dict: Dictionary with all extracted data
+    """
+    from bs4 import BeautifulSoup
+    
+    soup = BeautifulSoup(html_content, 'html.parser')
+    data = _empty_data()
+    
+    # Search for all dt elements
+    for dt in soup.find_all('dt'):
+        text = dt.get_text().strip()
+        dd = dt.find_next_sibling('dd')
+        if not dd:
+            continue
+        
+        def next_label(dt=dt):
+            next_dt = dt.find_next_sibling('dt')
+            if not next_dt:
+                return None, None
+            next_dd = next_dt.find_next_sibling('dd')
+            return next_dt.get_text(), next_dd.get_text() if next_dd else None
+        
+        _apply_maintenance_label(data, text, dd.get_text().strip(), next_label, model_family, unknown_labels)
+    
+    # Extract Total Pages Printed
+    # Search for the "Total Pages Printed" section that has the overall total
+    for h3 in soup.find_all('h3'):
+        if _is_total_pages_heading(h3.get_text()):
+            # Search for the next dl with items_info_1line class
+            dl = h3.find_next('dl', class_='items_info_1line')
+            if dl:
+                found_total = False
+                for dt in dl.find_all('dt'):
+                    span = dt.find('span')
+                    dd = dt.find_next_sibling('dd')
+                    found_total = _apply_pages_label(
+                        data,
+                        dt.get_text().strip(),
+                        bool(dt.get('class')) and 'subhead' in dt.get('class'),
+                        span.get_text().strip() if span else None,
+                        dd.get_text() if dd else None,
+                        found_total
+                    )
+                    
+                    # If we already have the three values, exit
+                    if len(data['pages_printed']) == 3:
+                        break
+            # We only need the first "Total Pages Printed" with the overall total
+            break
+    
+    return data
+
+# Elements that never have children (same list BeautifulSoup uses)
+VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link',
+    'menuitem', 'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound',
+    'command', 'frame', 'image', 'isindex', 'nextid', 'spacer'
+])
+
+class _Element:
+    """Lightweight copy of a <dt>, <dd>, <h3> or <span> kept by the fast extractor."""
+    __slots__ = ('tag', 'parent', 'text', 'subhead', 'span', 'next_dd', 'next_dt')
+    
+    def __init__(self, tag, parent, subhead=False):
+        self.tag = tag
+        self.parent = parent
+        self.text = []
+        self.subhead = subhead
+        self.span = None
+        self.next_dd = None
+        self.next_dt = None
+    
+    def get_text(self):
+        return ''.join(self.text)
+
+class MaintenanceParser(HTMLParser):
+    """
+    Single-pass extractor for the printer information page.
+    
+    Instead of building a full tree it only keeps the <dt>, <dd>, <h3> and
+    <span> elements and resolves each <dt> as soon as its parent is closed,
+    following the same rules (and the same tag nesting) as the BeautifulSoup
+    based extract_printer_data. Data can be fed in chunks; once every field
+    is filled the parser sets done and ignores the rest of the document.
+    
+    With stop_at_pages the parser is also done once the "Total Pages
+    Printed" list is closed and every <dt> before it is resolved, even if
+    the printer has no colour toners or belt unit (the maintenance lists
+    come before that section; labels after it are not read).
+    """
+    
+    def __init__(self, model_family=None, unknown_labels=None, stop_at_pages=False):
+        super().__init__(convert_charrefs=True)
+        self.data = _empty_data()
+        self.model_family = model_family
+        self.unknown_labels = unknown_labels
+        self.stop_at_pages = stop_at_pages
+        self.done = False
+        self._next_id = 0
+        # Open elements: (tag, id, tracked _Element or None, is items_info_1line dl)
+        self._stack = []
+        self._open = {0}
+        self._pending = collections.deque()
+        self._waiting_dd = {}
+        self._waiting_dt = {}
+        self._pages_heading = None
+        self._pages_dl = None
+        self._pages_dl_closed = False
+        self._lines_dls = []
+        self._lines_dl_dts = {}
+    
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        self._next_id += 1
+        element_id = self._next_id
+        parent = self._stack[-1][1] if self._stack else 0
+        classes = (dict(attrs).get('class') or '').split()
+        element = None
+        is_lines_dl = False
+        
+        if tag in ('dt', 'dd'):
+            element = _Element(tag, parent, 'subhead' in classes)
+            if tag == 'dd':
+                for dt in self._waiting_dd.pop(parent, ()):
+                    dt.next_dd = element
+            else:
+                for dt in self._waiting_dt.pop(parent, ()):
+                    dt.next_dt = element
+                self._waiting_dd.setdefault(parent, []).append(element)
+                self._waiting_dt.setdefault(parent, []).append(element)
+                self._pending.append(element)
+                for entry in self._stack:
+                    if entry[3]:
+                        self._lines_dl_dts[entry[1]].append(element)
+        elif tag == 'h3':
+            element = _Element(tag, parent)
+        elif tag == 'span':
+            # Only the first <span> of a <dt> is needed (Colour/B&W labels)
+            for entry in self._stack:
+                if entry[0] == 'dt' and entry[2].span is None:
+                    if element is None:
+                        element = _Element(tag, parent)
+                    entry[2].span = element
+        elif tag == 'dl' and 'items_info_1line' in classes:
+            is_lines_dl = True
+            self._lines_dls.append(element_id)
+            self._lines_dl_dts[element_id] = []
+            if self._pages_heading is not None and self._pages_dl is None:
+                self._pages_dl = element_id
+        
+        if tag not in VOID_ELEMENTS:
+            self._stack.append((tag, element_id, element, is_lines_dl))
+            self._open.add(element_id)
+    
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+    
+    def handle_endtag(self, tag):
+        if self.done or not any(entry[0] == tag for entry in self._stack):
+            return
+        while self._stack:
+            entry = self._stack.pop()
+            self._close(entry)
+            if entry[0] == tag:
+                break
+        self._resolve()
+    
+    def handle_data(self, data):
+        if self.done or (self._stack and self._stack[-1][0] in ('script', 'style')):
+            return
+        for entry in self._stack:
+            if entry[2] is not None:
+                entry[2].text.append(data)
+    
+    def close(self):
+        super().close()
+        while self._stack and not self.done:
+            self._close(self._stack.pop())
+        self._open.discard(0)
+        self._resolve()
+    
+    def _close(self, entry):
+        tag, element_id, element, is_lines_dl = entry
+        self._open.discard(element_id)
+        
+        if tag == 'h3' and self._pages_heading is None and _is_total_pages_heading(element.get_text()):
+            self._pages_heading = element_id
+            self._pages_dl = next((dl for dl in self._lines_dls if dl > element_id), None)
+            if self._pages_dl is not None and self._pages_dl not in self._open:
+                self._extract_pages()
+        elif is_lines_dl and element_id == self._pages_dl:
+            self._extract_pages()
+    
+    def _extract_pages(self):
+        found_total = False
+        for dt in self._lines_dl_dts[self._pages_dl]:
+            found_total = _apply_pages_label(
+                self.data,
+                dt.get_text().strip(),
+                dt.subhead,
+                dt.span.get_text().strip() if dt.span else None,
+                dt.next_dd.get_text() if dt.next_dd else None,
+                found_total
+            )
+            if len(self.data['pages_printed']) == 3:
+                break
+        self._pages_dl_closed = True
+    
+    def _resolve(self):
+        # A <dt> is final once its parent is closed: its <dd> and the next <dt> are known
+        while self._pending and self._pending[0].parent not in self._open:
+            dt = self._pending.popleft()
+            if dt.next_dd is None:
+                continue
+            
+            def next_label(dt=dt):
+                next_dt = dt.next_dt
+                if next_dt is None:
+                    return None, None
+                return next_dt.get_text(), next_dt.next_dd.get_text() if next_dt.next_dd else None
+            
+            _apply_maintenance_label(self.data, dt.get_text().strip(), dt.next_dd.get_text().strip(), next_label,
+                                     self.model_family, self.unknown_labels)
+        
+        data = self.data
+        if self._pages_dl_closed and self.stop_at_pages and not self._pending:
+            self.done = True
+        elif (self._pages_dl_closed and len(data['pages_printed']) == 3
+                and len(data['toner']) == 4 and len(data['drum']) == 4
+                and data['belt_unit'] and data['fuser_unit']):
+            self.done = True
+
+def extract_printer_data_fast(html_content, model_family=None, unknown_labels=None, chunk_size=16384):
+    """
+    Extracts all maintenance data from the HTML page in a single pass
+    without building a BeautifulSoup tree. Returns the same dictionary as
+    extract_printer_data.
+    
+    Args:
+        html_content: HTML content of the page
+        model_family: Printer model family with its own labels, or None
+        unknown_labels: Set where unknown consumable labels are added
+        chunk_size: Characters fed to the parser at a time
+        
+    Returns:
+        dict: Dictionary with all extracted data
+    """
+    parser = MaintenanceParser(model_family, unknown_labels)
+    for start in range(0, len(html_content), chunk_size):
+        parser.feed(html_content[start:start + chunk_size])
+        if parser.done:
+            return parser.data
+    parser.close()
+    return parser.data
+
+EXTRACTORS = {
+    'bs4': extract_printer_data,
+    'fast': extract_printer_data_fast
+}
+
+def compare_extractors(paths, repeat=20):
+    """
+    Checks that both extractors return the same data for saved pages and
+    compares their speed.
+    
+    Args:
+        paths: HTML files saved from printers (e.g. with --output)
+        repeat: Times each page is parsed by each extractor
+        
+    Returns:
+        bool: True if both extractors agree on every page
+    """
+    same = True
+    totals = dict.fromkeys(EXTRACTORS, 0.0)
+    
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            html_content = file.read()
+        
+        results = {}
+        timings = {}
+        for name, extractor in EXTRACTORS.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                results[name] = extractor(html_content)
+            timings[name] = (time.perf_counter() - start) / repeat
+            totals[name] += timings[name]
+        
+        if results['bs4'] == results['fast']:
+            status = "✓"
+        else:
+            status = "✗ DIFFERENT"
+            same = False
+        print(f"{status} {path}: bs4 {timings['bs4'] * 1000:.2f} ms, fast {timings['fast'] * 1000:.2f} ms")
+        if results['bs4'] != results['fast']:
+            print(f"    bs4:  {results['bs4']}")
+            print(f"    fast: {results['fast']}")
+    
+    print(f"\n{'='*60}")
+    print(f"Pages: {len(paths)}, parity: {'OK' if same else 'FAILED'}")
+    if totals['fast']:
+        print(f"Total: bs4 {totals['bs4'] * 1000:.2f} ms, fast {totals['fast'] * 1000:.2f} ms "
+              f"({totals['bs4'] / totals['fast']:.1f}x)")
+    print(f"{'='*60}")
+    return same
+
+# Header of the Zabbix sender protocol: "ZBXD" + protocol flags
+ZABBIX_HEADER = b'ZBXD'
+ZABBIX_FLAG_STANDARD = 0x01
+ZABBIX_FLAG_COMPRESSED = 0x02
+ZABBIX_FLAG_LARGE = 0x04
+
+# Same batch size that zabbix_sender uses when reading values from a file
+ZABBIX_BATCH_SIZE = 250
+
+# Seconds a zabbix_sender process may run before it is killed
+ZABBIX_SENDER_TIMEOUT = 30
+
+# Values per request when the spool is replayed after an outage
+SPOOL_REPLAY_BATCH_SIZE = 1000
+
+ZABBIX_INFO_PATTERN = re.compile(
+    r'processed:\s*(\d+);\s*failed:\s*(\d+);\s*total:\s*(\d+);\s*seconds spent:\s*([\d.]+)'
+)
+
+# Trapper item that receives the whole result in JSON mode (--zabbix-mode json)
+ZABBIX_MASTER_KEY = 'brother.json'
+
+ZABBIX_TEMPLATE_NAME = 'Brother Printer by JSON'
+
+# Trapper items sent with --self-monitoring: key, name, units, value type
+SELF_MONITORING_ITEMS = (
+    ('brother.poll.duration', 'Brother: poll duration', 's', 'FLOAT'),
+    ('brother.login.duration', 'Brother: login duration', 's', 'FLOAT'),
+    ('brother.parse.duration', 'Brother: parse duration', 's', 'FLOAT'),
+    ('brother.http.requests', 'Brother: HTTP requests per poll', '', 'UNSIGNED'),
+    ('brother.http.bytes', 'Brother: downloaded bytes per poll', 'B', 'UNSIGNED'),
+    ('brother.http.connections', 'Brother: new connections per poll', '', 'UNSIGNED'),
+    ('brother.tls.handshakes', 'Brother: full TLS handshakes per poll', '', 'UNSIGNED')
+)
+
+# Trapper item with the circuit breaker state (see BREAKER_STATES)
+BREAKER_ITEM_KEY = 'brother.breaker.state'
+
+def build_discovery(data):
+    """
+    Builds the low-level discovery rows for the consumables and counters
+    found in the printer.
+    
+    Args:
+        data: Dictionary with all extracted data (toner, drum, belt, fuser)
+        
+    Returns:
+        dict: LLD rows for 'consumables' ({#CONSUMABLE}, {#COLOR}), 'units'
+              ({#UNIT}) and 'counters' ({#COUNTER})
+    """
+    return {
+        'consumables': [
+            {'{#CONSUMABLE}': consumable, '{#COLOR}': color}
+            for consumable in ('toner', 'drum') for color in data.get(consumable, {})
+        ],
+        'units': [{'{#UNIT}': unit} for unit in ('belt_unit', 'fuser_unit') if data.get(unit)],
+        'counters': [{'{#COUNTER}': counter} for counter in data.get('pages_printed', {})]
+    }
+
+def build_master_value(data):
+    """
+    Returns the value of the JSON master item: the extracted data plus the
+    LLD rows, so that one value feeds both the discovery rules and every
+    dependent item.
+    
+    Args:
+        data: Dictionary with all extracted data (toner, drum, belt, fuser)
+        
+    Returns:
+        str: Compact JSON
+    """
+    master = dict(data)
+    master['discovery'] = build_discovery(data)
+    return json.dumps(master, separators=(',', ':'))
+
+def build_zabbix_template():
+    """
+    Builds a Zabbix 6.0 template export for the JSON mode: the trapper master
+    item and dependent discovery rules whose item prototypes read each value
+    with JSONPath preprocessing.
+    
+    Returns:
+        dict: Template export, ready to be saved as JSON and imported in Zabbix
+    """
+    import hashlib
+    
+    def uuid_for(name):
+        # Zabbix only imports version 4 UUIDs: derive them from the name so every export is the same
+        digest = hashlib.md5(f'brother_zabbix/{name}'.encode('utf-8'), usedforsecurity=False).digest()
+        return uuid.UUID(bytes=digest, version=4).hex
+    
+    master = {'key': ZABBIX_MASTER_KEY}
+    
+    def jsonpath(path, error_handler=None):
+        step = {'type': 'JSONPATH', 'parameters': [path]}
+        if error_handler:
+            step['error_handler'] = error_handler
+        return step
+    
+    def prototype(name, key, path, units=''):
+        item = {
+            'uuid': uuid_for(key),
+            'name': name,
+            'type': 'DEPENDENT',
+            'key': key,
+            'delay': '0',
+            'units': units,
+            'preprocessing': [jsonpath(path, 'DISCARD_VALUE')],
+            'master_item': master
+        }
+        if not units:
+            del item['units']
+        return item
+    
+    def discovery_rule(name, key, rows, prototypes, triggers=()):
+        rule = {
+            'uuid': uuid_for(key),
+            'name': name,
+            'type': 'DEPENDENT',
+            'key': key,
+            'delay': '0',
+            'lifetime': '7d',
+            'item_prototypes': prototypes,
+            'master_item': master,
+            'preprocessing': [jsonpath(f'$.discovery.{rows}')]
+        }
+        if triggers:
+            rule['trigger_prototypes'] = list(triggers)
+        return rule
+    
+    level_key = 'brother.level[{#CONSUMABLE},{#COLOR}]'
+    low_level = f'last(/{ZABBIX_TEMPLATE_NAME}/{level_key})<={{$BROTHER.LEVEL.WARN}}'
+    
+    template = {
+        'uuid': uuid_for('template'),
+        'template': ZABBIX_TEMPLATE_NAME,
+        'name': ZABBIX_TEMPLATE_NAME,
+        'description': 'Brother printer data sent by brother.py with --zabbix-mode json',
+        'groups': [{'name': 'Templates/Printers'}],
+        'items': [{
+            'uuid': uuid_for(ZABBIX_MASTER_KEY),
+            'name': 'Brother: raw data',
+            'type': 'TRAP',
+            'key': ZABBIX_MASTER_KEY,
+            'delay': '0',
+            'history': '1d',
+            'trends': '0',
+            'value_type': 'TEXT'
+        }] + [
+            {'uuid': uuid_for(key), 'name': name, 'type': 'TRAP', 'key': key, 'delay': '0', 'units': units,
+             'value_type': value_type}
+            for key, name, units, value_type in SELF_MONITORING_ITEMS
+        ] + [{
+            'uuid': uuid_for(BREAKER_ITEM_KEY),
+            'name': 'Brother: circuit breaker state',
+            'type': 'TRAP',
+            'key': BREAKER_ITEM_KEY,
+            'delay': '0',
+            'description': '0 closed, 1 open (printer not polled), 2 half-open (probing)'
+        }],
+        'discovery_rules': [
+            discovery_rule(
+                'Colour consumables discovery', 'brother.discovery.consumables', 'consumables',
+                [prototype('{#CONSUMABLE} {#COLOR} level', level_key, '$.{#CONSUMABLE}.{#COLOR}', '%')],
+                [{
+                    'uuid': uuid_for('trigger/' + level_key),
+                    'expression': low_level,
+                    'name': '{#CONSUMABLE} {#COLOR} is low (<={$BROTHER.LEVEL.WARN}%)',
+                    'priority': 'WARNING'
+                }]
+            ),
+            discovery_rule(
+                'Belt and fuser units discovery', 'brother.discovery.units', 'units',
+                [
+                    prototype('{#UNIT} remaining pages', 'brother.unit.pages[{#UNIT}]', '$.{#UNIT}.pages'),
+                    prototype('{#UNIT} remaining life', 'brother.unit.percent[{#UNIT}]', '$.{#UNIT}.percent', '%')
+                ]
+            ),
+            discovery_rule(
+                'Page counters discovery', 'brother.discovery.counters', 'counters',
+                [prototype('Pages printed: {#COUNTER}', 'brother.pages[{#COUNTER}]', '$.pages_printed.{#COUNTER}')]
+            )
+        ],
+        'macros': [{'macro': '{$BROTHER.LEVEL.WARN}', 'value': '10', 'description': 'Low consumable level (%)'}]
+    }
+    
+    return {
+        'zabbix_export': {
+            'version': '6.0',
+            'groups': [{'uuid': uuid_for('group'), 'name': 'Templates/Printers'}],
+            'templates': [template]
+        }
+    }
+
+def build_zabbix_items(hostname, data, zabbix_mode='items'):
+    """
+    Converts the extracted printer data into Zabbix trapper items.
+    
+    Args:
+        hostname: Host name in Zabbix
+        data: PrinterReading or dictionary with all extracted data (toner, drum, belt, fuser)
+        zabbix_mode: 'items' (one trapper item per value) or 'json' (a single
+                     master item with all the data, see build_master_value)
+        
+    Returns:
+        list: Dictionaries with 'host', 'key', 'value' and a human readable 'label'
+    """
+    if zabbix_mode == 'json':
+        values = sum(len(values) for values in data.values())
+        return [{
+            'host': hostname,
+            'key': ZABBIX_MASTER_KEY,
+            'value': build_master_value(data),
+            'label': f"JSON master item ({values} values)"
+        }]
+    
+    return [{'host': hostname, 'key': field.key, 'value': str(value), 'label': field.label.format(value)}
+            for field, value in PrinterReading.from_dict(data).flatten()]
+
+def parse_zabbix_info(info):
+    """
+    Parses the "info" string returned by the Zabbix trapper.
+    
+    Args:
+        info: String like "processed: 15; failed: 0; total: 15; seconds spent: 0.000123"
+        
+    Returns:
+        dict: processed, failed, total and seconds, or None if it can't be parsed
+    """
+    match = ZABBIX_INFO_PATTERN.search(info or '')
+    if not match:
+        return None
+    return {
+        'processed': int(match.group(1)),
+        'failed': int(match.group(2)),
+        'total': int(match.group(3)),
+        'seconds': float(match.group(4))
+    }
+
+class ZabbixResponseError(Exception):
+    """
+    The values were written to the Zabbix server but its answer is missing,
+    invalid or a rejection. The server may have stored them, so they must
+    not be sent again by another way.
+    """
+
+def _recv_exact(sock, size):
+    """Reads exactly size bytes from the socket."""
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Connection closed by Zabbix server")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def zabbix_sender_protocol(items, zabbix_server="127.0.0.1", zabbix_port=10051, timeout=10):
+    """
+    Sends a batch of items to Zabbix in a single connection using the
+    native sender protocol (ZBXD header + "sender data" JSON request).
+    
+    Args:
+        items: List of dictionaries with 'host', 'key' and 'value' (and optionally 'clock')
+        zabbix_server: Zabbix server address
+        zabbix_port: Zabbix server port
+        timeout: Socket timeout in seconds
+        
+    Returns:
+        dict: Server response with 'response', 'info' and the parsed counters
+        
+    Raises:
+        OSError: If the server can't be reached (nothing was sent)
+        ZabbixResponseError: If the values were sent but the answer is
+                             missing, not a valid Zabbix response or a rejection
+    """
+    import socket
+    import zlib
+    
+    fields = ('host', 'key', 'value', 'clock', 'ns')
+    request = {
+        'request': 'sender data',
+        'data': [{field: item[field] for field in fields if field in item} for item in items]
+    }
+    if any('clock' in item for item in items):
+        # Lets the server correct the values' clocks for the difference between both clocks
+        request['clock'] = int(time.time())
+    payload = json.dumps(request, separators=(',', ':')).encode('utf-8')
+    packet = ZABBIX_HEADER + struct.pack('<BII', ZABBIX_FLAG_STANDARD, len(payload), 0) + payload
+    
+    with socket.create_connection((zabbix_server, zabbix_port), timeout=timeout) as sock:
+        sock.sendall(packet)
+        # From here on the server may already have the values
+        try:
+            header = _recv_exact(sock, 5)
+            if header[:4] != ZABBIX_HEADER:
+                raise ValueError("Invalid response header from Zabbix server")
+            flags = header[4]
+            if flags & ZABBIX_FLAG_LARGE:
+                length, _ = struct.unpack('<QQ', _recv_exact(sock, 16))
+            else:
+                length, _ = struct.unpack('<II', _recv_exact(sock, 8))
+            body = _recv_exact(sock, length)
+            if flags & ZABBIX_FLAG_COMPRESSED:
+                body = zlib.decompress(body)
+            response = json.loads(body.decode('utf-8'))
+        except (OSError, ValueError, zlib.error) as e:
+            raise ZabbixResponseError(f"No valid answer after sending the values: {e}") from e
+    
+    if not isinstance(response, dict) or response.get('response') != 'success':
+        raise ZabbixResponseError(f"Zabbix server rejected the data: {response}")
+    
+    counters = parse_zabbix_info(response.get('info'))
+    if counters is None:
+        counters = {'processed': len(items), 'failed': 0, 'total': len(items), 'seconds': 0.0}
+    response.update(counters)
+    return response
+
+def zabbix_sender_binary(items, zabbix_server="127.0.0.1", zabbix_port=10051):
+    """
+    Sends a batch of items with a single zabbix_sender process, passing the
+    values through stdin (-i -). Used as a fallback for the native protocol.
+    
+    Args:
+        items: List of dictionaries with 'host', 'key' and 'value'
+        zabbix_server: Zabbix server address
+        zabbix_port: Zabbix server port
+        
+    Returns:
+        dict: Parsed counters (processed, failed, total, seconds)
+        
+    Raises:
+        FileNotFoundError: If zabbix_sender is not installed
+    """
+    # Values with their own clock (replayed from the spool) need -T
+    with_clock = any('clock' in item for item in items)
+    now = int(time.time())
+    lines = []
+    for item in items:
+        host = '"' + item['host'].replace('\\', '\\\\').replace('"', '\\"') + '"'
+        if with_clock:
+            lines.append(f"{host} {item['key']} {item.get('clock', now)} {item['value']}")
+        else:
+            lines.append(f"{host} {item['key']} {item['value']}")
+    
+    cmd = [
+        'zabbix_sender',
+        '-z', zabbix_server,
+        '-p', str(zabbix_port),
+        '-i', '-'
+    ]
+    if with_clock:
+        cmd.append('-T')
+    import subprocess
+    try:
+        result = subprocess.run(cmd, input='\n'.join(lines) + '\n', capture_output=True, text=True,
+                                timeout=ZABBIX_SENDER_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        print(f"  ✗ zabbix_sender didn't finish in {ZABBIX_SENDER_TIMEOUT}s")
+        return {'processed': 0, 'failed': len(items), 'total': len(items), 'seconds': float(ZABBIX_SENDER_TIMEOUT),
+                'unreachable': True}
+    
+    counters = parse_zabbix_info(result.stdout)
+    if counters is None:
+        # zabbix_sender couldn't talk to the server, nothing was processed
+        counters = {'processed': 0, 'failed': len(items), 'total': len(items), 'seconds': 0.0, 'unreachable': True}
+        print(f"  ✗ zabbix_sender error: {result.stderr.strip() or result.stdout.strip()}")
+    return counters
+
+class StateStore:
+    """
+    Local SQLite store with the last value sent for each host and item key.
+    
+    Used by the delta mode (--delta): values equal to the last one sent are
+    not sent again, except when the last send is older than the heartbeat,
+    so that nodata() triggers in Zabbix keep working.
+    """
+    
+    def __init__(self, path, heartbeat=3600):
+        """
+        Args:
+            path: SQLite file with the state
+            heartbeat: Seconds after which an unchanged value is sent again
+        """
+        self.path = path
+        self.heartbeat = heartbeat
+        self.stats = {'sent': 0, 'suppressed': 0}
+        import sqlite3
+        
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS last_values ('
+            'host TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, sent_at REAL NOT NULL, '
+            'PRIMARY KEY (host, key))'
+        )
+        self._db.commit()
+    
+    def filter(self, items, now=None):
+        """
+        Removes the items whose value didn't change since the last send.
+        
+        Args:
+            items: List of dictionaries with 'host', 'key' and 'value'
+            now: Current time (defaults to time.time())
+            
+        Returns:
+            list: Items that have to be sent
+        """
+        now = time.time() if now is None else now
+        changed = []
+        with self._lock:
+            for item in items:
+                row = self._db.execute(
+                    'SELECT value, sent_at FROM last_values WHERE host = ? AND key = ?',
+                    (item['host'], item['key'])
+                ).fetchone()
+                if row and row[0] == str(item['value']) and now - row[1] < self.heartbeat:
+                    self.stats['suppressed'] += 1
+                else:
+                    changed.append(item)
+        return changed
+    
+    def record(self, items, now=None):
+        """
+        Saves the values that Zabbix accepted.
+        
+        Args:
+            items: List of dictionaries with 'host', 'key' and 'value'
+            now: Time of the send (defaults to time.time())
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO last_values (host, key, value, sent_at) VALUES (?, ?, ?, ?)',
+                [(item['host'], item['key'], str(item['value']), now) for item in items]
+            )
+            self._db.commit()
+            self.stats['sent'] += len(items)
+    
+    def summary(self):
+        """
+        Returns:
+            str: Human readable sent/suppressed counters
+        """
+        return f"Delta mode: {self.stats['sent']} values sent, {self.stats['suppressed']} unchanged values suppressed"
+    
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._db.close()
+
+class Spool:
+    """
+    Append-only file with the values that couldn't be sent because the
+    Zabbix server or proxy was unreachable.
+    
+    Every value keeps the clock of its collection and is written as one JSON
+    line followed by an fsync, so the backlog survives crashes (a line torn
+    by a crash is skipped). When the server answers again the backlog is
+    replayed in large batches with the sender protocol's per-value clock,
+    and the file is rewritten atomically without the values sent. Values
+    older than max_age and the oldest values above max_bytes are dropped.
+    """
+    
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, max_age=7 * 86400):
+        """
+        Args:
+            path: Spool file (created if it doesn't exist)
+            max_bytes: Maximum size of the file
+            max_age: Seconds after which a spooled value is dropped
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.stats = {'spooled': 0, 'replayed': 0, 'dropped': 0}
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        """
+        Returns:
+            tuple: (valid and not expired entries of the file, expired count)
+        """
+        entries = []
+        expired = 0
+        oldest = time.time() - self.max_age
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Line torn by a crash while it was written
+                        continue
+                    if entry['item'].get('clock', 0) < oldest:
+                        expired += 1
+                        continue
+                    entries.append(entry)
+        except FileNotFoundError:
+            pass
+        return entries, expired
+    
+    def _rewrite(self, entries):
+        """Atomically replaces the file with entries."""
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            for entry in entries:
+                file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+    
+    def append(self, items, zabbix_server, zabbix_port):
+        """
+        Adds values to the spool, stamping the current time as their clock
+        if they don't have one.
+        
+        Args:
+            items: List of dictionaries with 'host', 'key' and 'value'
+            zabbix_server: Zabbix server the values are for
+            zabbix_port: Zabbix server port
+        """
+        now = int(time.time())
+        lines = ''.join(
+            json.dumps({
+                'server': zabbix_server,
+                'port': zabbix_port,
+                'item': {'host': item['host'], 'key': item['key'], 'value': str(item['value']),
+                         'clock': item.get('clock', now), 'ns': item.get('ns', 0)}
+            }, separators=(',', ':')) + '\n'
+            for item in items
+        )
+        with self._lock:
+            with open(self.path, 'a+', encoding='utf-8') as file:
+                if file.tell():
+                    file.seek(file.tell() - 1)
+                    if file.read(1) != '\n':
+                        # Ends the line torn by a crash so it doesn't swallow the first new value
+                        lines = '\n' + lines
+                file.write(lines)
+                file.flush()
+                os.fsync(file.fileno())
+            self.stats['spooled'] += len(items)
+            if os.path.getsize(self.path) > self.max_bytes:
+                self._trim()
+    
+    def _trim(self):
+        """Drops expired values and the oldest ones until the file fits in 90% of max_bytes."""
+        entries, expired = self._load()
+        sizes = [len(json.dumps(entry, separators=(',', ':'))) + 1 for entry in entries]
+        total = sum(sizes)
+        first = 0
+        while first < len(entries) and total > self.max_bytes * 0.9:
+            total -= sizes[first]
+            first += 1
+        self.stats['dropped'] += expired + first
+        if first:
+            print(f"⚠ Spool full, dropped the {first} oldest values")
+        self._rewrite(entries[first:])
+    
+    def pending(self, zabbix_server=None, zabbix_port=None):
+        """
+        Returns:
+            int: Number of spooled values (for one server, or for all)
+        """
+        with self._lock:
+            return sum(1 for entry in self._load()[0]
+                       if zabbix_server is None or (entry['server'], entry['port']) == (zabbix_server, zabbix_port))
+    
+    def replay(self, zabbix_server, zabbix_port, send, batch_size=SPOOL_REPLAY_BATCH_SIZE):
+        """
+        Sends the backlog of a server, oldest first, until it is empty or the
+        server stops answering.
+        
+        Args:
+            zabbix_server: Zabbix server address
+            zabbix_port: Zabbix server port
+            send: Callable sending a batch of items and returning its counters,
+                  with 'unreachable' set when the server didn't answer
+            batch_size: Values per request
+            
+        Returns:
+            int: Values accepted by the server
+        """
+        with self._lock:
+            entries, expired = self._load()
+            self.stats['dropped'] += expired
+            backlog = [entry for entry in entries if (entry['server'], entry['port']) == (zabbix_server, zabbix_port)]
+            if not backlog:
+                if expired:
+                    self._rewrite(entries)
+                return 0
+            
+            print(f"📦 Replaying {len(backlog)} spooled values to {zabbix_server}:{zabbix_port}...")
+            accepted = 0
+            done = 0
+            for start in range(0, len(backlog), batch_size):
+                batch = backlog[start:start + batch_size]
+                counters = send([entry['item'] for entry in batch])
+                if counters.get('unreachable'):
+                    break
+                # Values rejected by the server would be rejected again, they are dropped
+                accepted += counters['processed']
+                self.stats['dropped'] += counters['failed']
+                done += len(batch)
+            
+            sent = {id(entry) for entry in backlog[:done]}
+            self._rewrite([entry for entry in entries if id(entry) not in sent])
+            self.stats['replayed'] += accepted
+            print(f"  {accepted} replayed, {len(backlog) - done} still spooled")
+            return accepted
+    
+    def summary(self):
+        """
+        Returns:
+            str: Human readable spool counters
+        """
+        return (f"Spool: {self.stats['spooled']} values spooled, {self.stats['replayed']} replayed, "
+                f"{self.stats['dropped']} dropped, {self.pending()} pending")
+
+def _send_batch(batch, zabbix_server, zabbix_port, sender='auto', allow_missing_binary=False):
+    """
+    Sends one batch with the native protocol and/or zabbix_sender. In auto
+    mode zabbix_sender is only used when the native protocol couldn't send
+    anything; once the values were written a missing or invalid answer
+    counts the batch as failed.
+    
+    Args:
+        batch: List of dictionaries with 'host', 'key' and 'value'
+        zabbix_server: Zabbix server address
+        zabbix_port: Zabbix server port
+        sender: 'native', 'binary' or 'auto' (see send_items_to_zabbix)
+        allow_missing_binary: In auto mode, report the batch as unreachable
+                              instead of raising when zabbix_sender is missing
+        
+    Returns:
+        dict: Counters (processed, failed, total), with 'unreachable' set when
+              the values didn't reach the server
+    """
+    if sender in ('native', 'auto'):
+        try:
+            return zabbix_sender_protocol(batch, zabbix_server, zabbix_port)
+        except ZabbixResponseError as e:
+            # Sending again (or spooling) could store the values twice
+            print(f"  ✗ Error sending to {zabbix_server}:{zabbix_port}: {e}")
+            return {'processed': 0, 'failed': len(batch), 'total': len(batch)}
+        except (OSError, ValueError) as e:
+            print(f"  ✗ Error sending to {zabbix_server}:{zabbix_port}: {e}")
+            if sender == 'native':
+                return {'processed': 0, 'failed': len(batch), 'total': len(batch), 'unreachable': True}
+    
+    try:
+        return zabbix_sender_binary(batch, zabbix_server, zabbix_port)
+    except FileNotFoundError:
+        if sender == 'binary' or not allow_missing_binary:
+            raise
+        return {'processed': 0, 'failed': len(batch), 'total': len(batch), 'unreachable': True}
+
+def send_items_to_zabbix(items, zabbix_server="127.0.0.1", zabbix_port=10051, sender='auto', state_store=None,
+                         spool=None):
+    """
+    Sends items for one or many hosts to Zabbix in batches.
+    
+    Args:
+        items: List of dictionaries with 'host', 'key' and 'value'
+        zabbix_server: Zabbix server address
+        zabbix_port: Zabbix server port
+        sender: 'native' (sender protocol), 'binary' (zabbix_sender) or
+                'auto' (native protocol with zabbix_sender as fallback)
+        state_store: StateStore to send only changed values (delta mode), or None
+        spool: Spool where the values are kept when the server is
+               unreachable (and replayed from when it answers), or None
+        
+    Returns:
+        dict: Total counters (processed, failed, total, suppressed, spooled,
+              replayed) and per-item 'results', a list of (item, ok) tuples
+              where ok is True, False or None when the server reported
+              failures in the batch without saying which
+    """
+    summary = {'processed': 0, 'failed': 0, 'total': 0, 'suppressed': 0, 'spooled': 0, 'replayed': 0,
+               'results': []}
+    
+    if state_store:
+        changed = state_store.filter(items)
+        summary['suppressed'] = len(items) - len(changed)
+        items = changed
+    
+    reachable = True
+    for start in range(0, len(items), ZABBIX_BATCH_SIZE):
+        batch = items[start:start + ZABBIX_BATCH_SIZE]
+        counters = _send_batch(batch, zabbix_server, zabbix_port, sender, spool is not None)
+        
+        if counters.get('unreachable'):
+            reachable = False
+            if spool is not None:
+                spool.append(batch, zabbix_server, zabbix_port)
+                summary['spooled'] += len(batch)
+        
+        summary['processed'] += counters['processed']
+        summary['failed'] += counters['failed']
+        summary['total'] += len(batch)
+        
+        if counters['failed'] == 0:
+            status = True
+        elif counters['processed'] == 0:
+            status = False
+        else:
+            status = None
+        summary['results'].extend((item, status) for item in batch)
+        if state_store and status:
+            state_store.record(batch)
+    
+    if spool is not None and reachable:
+        summary['replayed'] = spool.replay(
+            zabbix_server, zabbix_port, lambda batch: _send_batch(batch, zabbix_server, zabbix_port, sender, True)
+        )
+    
+    return summary
+
+def send_to_zabbix(hostname, data, zabbix_server="127.0.0.1", zabbix_port=10051, sender='auto', state_store=None,
+                   zabbix_mode='items', extra_items=(), spool=None):
+    """
+    Sends all printer data to Zabbix in a single batch.
+    
+    Args:
+        hostname: Host name in Zabbix
+        data: Dictionary with all extracted data (toner, drum, belt, fuser)
+        zabbix_server: Zabbix server address
+        zabbix_port: Zabbix server port
+        sender: 'native', 'binary' or 'auto' (see send_items_to_zabbix)
+        state_store: StateStore to send only changed values (delta mode), or None
+        zabbix_mode: 'items' or 'json' (see build_zabbix_items)
+        extra_items: Items sent in the same batch (e.g. self-monitoring items)
+        spool: Spool for the values the server couldn't receive, or None
+        
+    Returns:
+        bool: True if sending was successful (or the values were spooled), False otherwise
+    """
+    try:
+        items = build_zabbix_items(hostname, data, zabbix_mode)
+        if not items:
+            print("No values to send")
+            return False
+        items += extra_items
+        
+        print(f"\n📊 Sending {len(items)} values...")
+        summary = send_items_to_zabbix(items, zabbix_server, zabbix_port, sender, state_store, spool)
+        
+        for item, ok in summary['results']:
+            if ok:
+                print(f"  ✓ {item['label']}")
+            elif ok is None:
+                print(f"  ? {item['label']} (batch had failures)")
+            else:
+                print(f"  ✗ {item['label']}")
+        
+        print(f"\n{'='*60}")
+        print(f"Summary: {summary['processed']} values sent successfully, {summary['failed']} errors")
+        if state_store:
+            print(f"Unchanged values suppressed: {summary['suppressed']}")
+        if spool:
+            print(f"Spooled until the server answers: {summary['spooled']}, replayed: {summary['replayed']}")
+        print(f"{'='*60}")
+        
+        return summary['failed'] == summary['spooled']
+        
+    except FileNotFoundError:
+        print("Error: zabbix_sender is not installed or not in PATH")
+        print("Install it with: sudo apt-get install zabbix-sender")
+        return False
+    except Exception as e:
+        print(f"Error sending data to Zabbix: {e}")
+        return False
+
+INFORMATION_PATH = "/general/information.html?kind=item"
+
+LOGIN_PAGE_MARKERS = ("Please Login", "Please login", "Iniciar sesión")
+
+def is_login_page(html_content):
+    """
+    Checks if the printer answered with its login page (English or Spanish).
+    
+    Args:
+        html_content: HTML returned by the printer
+        
+    Returns:
+        bool: True if the page asks for the password
+    """
+    return any(marker in html_content for marker in LOGIN_PAGE_MARKERS)
+
+class SessionCache:
+    """
+    On-disk cache of authenticated printer sessions.
+    
+    Stores the session cookies of each printer in its own JSON file, with
+    their domain, path, secure flag and expiry, so that the next poll can go
+    straight to the information page and only log in again when the printer
+    rejects the cookie or the entry is older than ttl.
+    """
+    
+    def __init__(self, directory, ttl=600):
+        """
+        Args:
+            directory: Folder where the cookies are stored
+            ttl: Maximum age of a cached session in seconds
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    
+    def _path(self, url_base):
+        import hashlib
+        
+        name = hashlib.sha256(url_base.rstrip('/').encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.directory, f"{name}.json")
+    
+    def _count(self, counter):
+        with self._lock:
+            self.stats[counter] += 1
+    
+    def load(self, url_base):
+        """
+        Returns the cached cookies of a printer.
+        
+        Args:
+            url_base: Base URL of the printer
+            
+        Returns:
+            list: Keyword arguments of RequestsCookieJar.set for every cookie,
+                  or None if there is no valid entry
+        """
+        try:
+            with open(self._path(url_base), encoding='utf-8') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+        
+        if time.time() - entry.get('saved', 0) > self.ttl:
+            self._count('expired')
+            self.discard(url_base)
+            return None
+        cookies = entry.get('cookies')
+        if not isinstance(cookies, list):
+            # Empty or written by a version that only kept names and values
+            self._count('misses')
+            return None
+        return cookies or None
+    
+    def save(self, url_base, cookies):
+        """
+        Stores the cookies of a printer after a successful login.
+        
+        Args:
+            url_base: Base URL of the printer
+            cookies: Cookie jar of the session (requests.Session.cookies)
+        """
+        cookies = [
+            {'name': cookie.name, 'value': cookie.value, 'domain': cookie.domain, 'path': cookie.path,
+             'secure': cookie.secure, 'expires': cookie.expires}
+            for cookie in cookies
+        ]
+        path = self._path(url_base)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            # The cookies are as good as the password, keep them private
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump({'url': url_base, 'saved': time.time(), 'cookies': cookies}, file)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"⚠ Warning: Could not save session cache: {e}")
+    
+    def discard(self, url_base):
+        """Removes the cached session of a printer."""
+        try:
+            os.remove(self._path(url_base))
+        except OSError:
+            pass
+    
+    def hit(self):
+        """Counts a poll that reused a cached session."""
+        self._count('hits')
+    
+    def reject(self, url_base):
+        """Counts and removes a cached session that the printer didn't accept."""
+        self._count('rejected')
+        self.discard(url_base)
+    
+    def summary(self):
+        """
+        Returns:
+            str: Human readable hit/miss counters
+        """
+        stats = self.stats
+        total = sum(stats.values())
+        ratio = stats['hits'] / total * 100 if total else 0.0
+        return (f"Session cache: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['expired']} expired, {stats['rejected']} rejected "
+                f"({ratio:.0f}% logins saved)")
+
+def _pooled_adapter(pool_size, counters, lock):
+    """
+    Builds a requests adapter whose HTTPS connections resume the TLS
+    session of the previous connection to the same printer.
+    
+    The printers' web servers run on weak embedded CPUs, where the full TLS
+    handshake is a large share of a poll. The adapter's SSL context keeps the
+    last session (ID or ticket) of every host and passes it to the next
+    handshake, which then only needs the abbreviated exchange.
+    
+    Args:
+        pool_size: Keep-alive connections kept per printer
+        counters: Dictionary where 'connections', 'handshakes' (full TLS
+                  handshakes) and 'resumed' (resumed TLS sessions) are counted
+        lock: Lock protecting counters
+        
+    Returns:
+        requests.adapters.HTTPAdapter: Adapter to mount on a session
+    """
+    import ssl
+    from requests.adapters import HTTPAdapter
+    from urllib3 import HTTPConnectionPool, HTTPSConnectionPool, PoolManager
+    
+    class ResumingSSLContext(ssl.SSLContext):
+        def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+            ssl_sock = super().wrap_socket(sock, *args, server_hostname=server_hostname,
+                                           session=session or self.sessions.get(server_hostname), **kwargs)
+            with lock:
+                counters['resumed' if ssl_sock.session_reused else 'handshakes'] += 1
+            return ssl_sock
+    
+    # The printers use self-signed certificates (verify=False)
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    context.sessions = {}
+    
+    class CountingHTTPConnectionPool(HTTPConnectionPool):
+        def _new_conn(self):
+            with lock:
+                counters['connections'] += 1
+            return super()._new_conn()
+    
+    class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        def _new_conn(self):
+            with lock:
+                counters['connections'] += 1
+            return super()._new_conn()
+    
+    class PooledAdapter(HTTPAdapter):
+        def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+            self.poolmanager = PoolManager(num_pools=connections, maxsize=maxsize, block=block,
+                                           ssl_context=context, **pool_kwargs)
+            self.poolmanager.pool_classes_by_scheme = {'http': CountingHTTPConnectionPool,
+                                                       'https': CountingHTTPSConnectionPool}
+        
+        def send(self, request, *args, **kwargs):
+            with lock:
+                counters['requests'] += 1
+            response = super().send(request, *args, **kwargs)
+            # A TLS 1.3 ticket only arrives after the handshake: once the
+            # answer headers are read the connection has the latest one
+            sock = getattr(response.raw.connection, 'sock', None)
+            if isinstance(sock, ssl.SSLSocket) and sock.session is not None:
+                context.sessions[sock.server_hostname] = sock.session
+            return response
+    
+    return PooledAdapter(pool_connections=1, pool_maxsize=pool_size)
+
+class ConnectionPool:
+    """
+    One requests session per printer with keep-alive connections and TLS
+    session resumption, kept for the life of the process.
+    
+    Consecutive requests of a poll share a connection, and the connections
+    of a printer idle for more than idle_timeout are closed before its next
+    poll (the printers drop idle connections on their own, and reusing one
+    they already closed fails the request). The TLS session survives the
+    idle connections, so even a new connection skips the full handshake.
+    """
+    
+    def __init__(self, pool_size=2, idle_timeout=30.0):
+        """
+        Args:
+            pool_size: Keep-alive connections kept per printer
+            idle_timeout: Seconds after which idle connections are closed
+        """
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.counters = {}
+        self._sessions = {}
+        self._last_used = {}
+        self._lock = threading.Lock()
+    
+    def session(self, key):
+        """
+        Returns the session of a printer, closing its connections first if
+        they have been idle for more than idle_timeout.
+        
+        Args:
+            key: Printer name
+            
+        Returns:
+            requests.Session: Session of the printer
+        """
+        import requests
+        
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                counters = self.counters.setdefault(
+                    key, {'requests': 0, 'connections': 0, 'handshakes': 0, 'resumed': 0}
+                )
+                session = self._sessions[key] = requests.Session()
+                adapter = _pooled_adapter(self.pool_size, counters, self._lock)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+            elif time.monotonic() - self._last_used[key] > self.idle_timeout:
+                # Closes the connections only, the cookies and TLS sessions are kept
+                for adapter in session.adapters.values():
+                    adapter.close()
+            self._last_used[key] = time.monotonic()
+        return session
+    
+    def snapshot(self, key):
+        """
+        Returns:
+            dict: Copy of the counters of a printer
+        """
+        with self._lock:
+            return dict(self.counters.get(key, {'requests': 0, 'connections': 0, 'handshakes': 0, 'resumed': 0}))
+    
+    def close(self, key=None):
+        """Closes the session of a printer (its counters are kept), or all of them."""
+        with self._lock:
+            keys = list(self._sessions) if key is None else [key]
+            sessions = [self._sessions.pop(name) for name in keys if name in self._sessions]
+        for session in sessions:
+            session.close()
+    
+    def summary(self):
+        """
+        Returns:
+            str: Human readable connection reuse and TLS resumption counters
+        """
+        with self._lock:
+            totals = {name: sum(counters[name] for counters in self.counters.values())
+                      for name in ('requests', 'connections', 'handshakes', 'resumed')}
+        reused = totals['requests'] - totals['connections']
+        reuse = reused / totals['requests'] * 100 if totals['requests'] else 0.0
+        tls = totals['handshakes'] + totals['resumed']
+        resumption = totals['resumed'] / tls * 100 if tls else 0.0
+        return (f"Connections: {totals['requests']} requests over {totals['connections']} connections "
+                f"({reuse:.0f}% reused), {totals['handshakes']} full TLS handshakes, "
+                f"{totals['resumed']} resumed ({resumption:.0f}% resumed)")
+
+# Bytes read from the socket at a time when an answer is streamed
+STREAM_CHUNK_SIZE = 2048
+
+class RetryPolicy:
+    """
+    Connect/read timeouts, capped retries with exponential backoff and an
+    overall deadline for the HTTP requests of one poll, so a powered-off or
+    hung printer can't block a poll for longer than the deadline.
+    """
+    
+    def __init__(self, connect_timeout=5.0, read_timeout=30.0, retries=2, backoff=0.5, deadline=None):
+        """
+        Args:
+            connect_timeout: Seconds to wait for the TCP connection
+            read_timeout: Seconds to wait for every read of the answer
+            retries: Times a request is repeated after a connection error,
+                     a timeout or an HTTP 5xx answer
+            backoff: Seconds before the first retry, doubled on every retry
+            deadline: Maximum seconds for the whole poll, or None
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self.expires = None
+        self.retried = 0
+    
+    def start(self, printer=None):
+        """
+        Returns a copy for one poll, whose deadline starts now. Printers of
+        the inventory can override 'connect_timeout', 'timeout' (read),
+        'retries' and 'deadline'.
+        """
+        printer = printer or {}
+        policy = RetryPolicy(
+            printer.get('connect_timeout', self.connect_timeout),
+            printer.get('timeout', self.read_timeout),
+            printer.get('retries', self.retries),
+            self.backoff,
+            printer.get('deadline', self.deadline)
+        )
+        if policy.deadline:
+            policy.expires = time.monotonic() + policy.deadline
+        return policy
+    
+    def remaining(self):
+        """
+        Returns:
+            float: Seconds left until the deadline, or None without deadline
+        """
+        if self.expires is None:
+            return None
+        return self.expires - time.monotonic()
+    
+    def timeout(self, limit=None):
+        """
+        Returns the timeout for the next request, shortened so that it ends
+        before the deadline.
+        
+        Args:
+            limit: Single timeout in seconds to use instead of connect/read
+            
+        Returns:
+            tuple or float: (connect, read) timeout, or a single float with limit
+            
+        Raises:
+            requests.exceptions.Timeout: If the deadline already passed
+        """
+        import requests
+        
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise requests.exceptions.Timeout(f"Poll deadline of {self.deadline}s exceeded")
+        if limit is not None:
+            return limit if remaining is None else min(limit, remaining)
+        if remaining is None:
+            return (self.connect_timeout, self.read_timeout)
+        return (min(self.connect_timeout, remaining), min(self.read_timeout, remaining))
+    
+    def read(self, response, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Iterates over the body of a streamed response. The socket timeouts
+        only bound each read, so the deadline is checked between chunks to
+        also cut off a printer that keeps sending bytes slowly.
+        
+        Args:
+            response: requests.Response made with stream=True
+            chunk_size: Bytes read at a time
+            
+        Yields:
+            bytes: Chunks of the body
+            
+        Raises:
+            requests.exceptions.Timeout: If the deadline passes before the body ends
+        """
+        import requests
+        
+        for chunk in response.iter_content(chunk_size):
+            remaining = self.remaining()
+            if remaining is not None and remaining <= 0:
+                response.close()
+                raise requests.exceptions.Timeout(f"Poll deadline of {self.deadline}s exceeded")
+            yield chunk
+    
+    def request(self, method, *args, stream=False, **kwargs):
+        """
+        Makes an HTTP request with method (session.get, session.post...),
+        retrying it with backoff while the deadline allows it. The body is
+        always read through read(), so the deadline covers the whole answer;
+        with stream=True reading it is left to the caller.
+        
+        Returns:
+            requests.Response: Last response (it can still be a 5xx)
+        """
+        import requests
+        
+        for attempt in range(self.retries + 1):
+            kwargs['timeout'] = self.timeout()
+            try:
+                response = method(*args, stream=True, **kwargs)
+                if response.status_code < 500 or attempt == self.retries:
+                    if not stream:
+                        # Same attributes requests sets when it reads the body itself
+                        response._content = b''.join(self.read(response))
+                        response._content_consumed = True
+                    return response
+                # A streamed response keeps its connection until it is closed
+                response.close()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.retries:
+                    raise
+            
+            delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            remaining = self.remaining()
+            if remaining is not None and delay >= remaining:
+                raise requests.exceptions.Timeout(f"Poll deadline of {self.deadline}s exceeded")
+            time.sleep(delay)
+            self.retried += 1
+
+# Stages of a poll that make up the login (brother.login.duration)
+LOGIN_STAGES = ('status_get', 'csrf_parse', 'login_post')
+
+class PollTimings:
+    """
+    Wall time and bytes of each stage of one poll ('session_get' with cached
+    cookies, 'status_get', 'csrf_parse', 'login_post', the fallback
+    'information_get', 'parse' and 'send'), plus the number of HTTP requests
+    and whether the information page had to be fetched after the login.
+    When the page is streamed into the parser (login_y_extraer_datos) the
+    parsing is measured inside the request stages and 'bytes' are the
+    bytes actually read before the connection was closed.
+    With a ConnectionPool, 'connections' has the new connections, full TLS
+    handshakes and resumed TLS sessions of the poll.
+    """
+    
+    def __init__(self, printer=None):
+        """
+        Args:
+            printer: Printer name used in the logs
+        """
+        self.printer = printer
+        self.stages = {}
+        self.http_requests = 0
+        self.downloaded = 0
+        self.fallback_fetch = False
+        self.retries = 0
+        self.connections = None
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+    
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Measures the wall time of the block as the given stage."""
+        entry = self.stages.setdefault(name, {'seconds': 0.0, 'bytes': 0})
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['seconds'] += time.perf_counter() - start
+    
+    def request(self, name, method, *args, consume=None, **kwargs):
+        """
+        Makes an HTTP request with method (session.get, session.post...)
+        measuring it as the given stage.
+        
+        Args:
+            consume: Callable that reads the streamed body of the response
+                     and returns the bytes it read (see stream_into_parser),
+                     or None to download the whole body
+        
+        Returns:
+            requests.Response: Response of the request
+        """
+        with self.stage(name) as entry:
+            if consume is None:
+                response = method(*args, **kwargs)
+                size = len(response.content)
+            else:
+                response = method(*args, stream=True, **kwargs)
+                size = consume(response)
+            self.http_requests += 1
+            entry['bytes'] += size
+            self.downloaded += size
+        return response
+    
+    def finish(self):
+        """Stops the poll clock (the 'send' stage can still be added later)."""
+        self.duration = time.perf_counter() - self._start
+        return self
+    
+    def seconds(self, *names):
+        """
+        Returns:
+            float: Total seconds spent in the given stages
+        """
+        return sum(self.stages[name]['seconds'] for name in names if name in self.stages)
+    
+    def as_dict(self, error=None):
+        """
+        Returns:
+            dict: JSON-serializable record of the poll
+        """
+        return {
+            'timestamp': round(self.started, 3),
+            'printer': self.printer,
+            'duration': round(self.duration if self.duration is not None else time.perf_counter() - self._start, 6),
+            'login_duration': round(self.seconds(*LOGIN_STAGES), 6),
+            'stages': {name: {'seconds': round(entry['seconds'], 6), 'bytes': entry['bytes']}
+                       for name, entry in self.stages.items()},
+            'http_requests': self.http_requests,
+            'downloaded_bytes': self.downloaded,
+            'retries': self.retries,
+            'fallback_fetch': self.fallback_fetch,
+            'connections': self.connections,
+            'error': error
+        }
+    
+    def summary(self):
+        """
+        Returns:
+            str: One line with the time of every stage
+        """
+        stages = ', '.join(f"{name} {entry['seconds'] * 1000:.1f}ms" for name, entry in self.stages.items())
+        connections = ''
+        if self.connections:
+            connections = (f", {self.connections['connections']} connections, "
+                           f"{self.connections['handshakes']} TLS handshakes")
+        return f"⏱ Timings: {stages} ({self.http_requests} HTTP requests, {self.downloaded} bytes{connections})"
+    
+    def zabbix_items(self, hostname):
+        """
+        Converts the timings into self-monitoring trapper items.
+        
+        Args:
+            hostname: Host name in Zabbix
+            
+        Returns:
+            list: Dictionaries with 'host', 'key', 'value' and 'label'
+        """
+        record = self.as_dict()
+        values = (
+            ('brother.poll.duration', f"{record['duration']:.6f}", f"Poll duration: {record['duration']:.3f}s"),
+            ('brother.login.duration', f"{record['login_duration']:.6f}",
+             f"Login duration: {record['login_duration']:.3f}s"),
+            ('brother.parse.duration', f"{self.seconds('parse'):.6f}", f"Parse duration: {self.seconds('parse'):.3f}s"),
+            ('brother.http.requests', str(self.http_requests), f"HTTP requests: {self.http_requests}"),
+            ('brother.http.bytes', str(self.downloaded), f"Downloaded bytes: {self.downloaded}")
+        )
+        if self.connections:
+            values += (
+                ('brother.http.connections', str(self.connections['connections']),
+                 f"New connections: {self.connections['connections']}"),
+                ('brother.tls.handshakes', str(self.connections['handshakes']),
+                 f"Full TLS handshakes: {self.connections['handshakes']}")
+            )
+        return [{'host': hostname, 'key': key, 'value': value, 'label': label} for key, value, label in values]
+
+class TimingLog:
+    """
+    Writes the timings of every poll as one JSON object per line (to a file
+    or to stderr). It can also be used as a daemon output backend.
+    """
+    
+    def __init__(self, path):
+        """
+        Args:
+            path: File where the lines are appended, or '-' for stderr
+        """
+        self.file = sys.stderr if path == '-' else open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+    
+    def write(self, timings, error=None):
+        """Logs the timings of one poll."""
+        line = json.dumps(timings.as_dict(error), separators=(',', ':')) + '\n'
+        with self._lock:
+            self.file.write(line)
+            self.file.flush()
+    
+    def add(self, result):
+        """Logs the timings of a poll_printer result."""
+        if result.get('timings'):
+            self.write(result['timings'], result['error'])
+    
+    def flush(self):
+        """Nothing to send: every line is written right away."""
+        return None
+    
+    def close(self):
+        """Closes the log file."""
+        if self.file is not sys.stderr:
+            self.file.close()
+
+def login_y_descargar_html(url_base, contrasena, ruta_destino="pagina_descargada.html", timeout=None, session_cache=None,
+                          session=None, timings=None, policy=None):
+    """
+    Logs into a website and downloads the HTML from a page.
+    
+    Args:
+        url_base: Base URL of the website
+        contrasena: Password to login
+        ruta_destino: Path where the downloaded HTML will be saved (None to not save it)
+        timeout: Timeout in seconds for each HTTP request (None waits forever)
+        session_cache: SessionCache to reuse the cookies of a previous login
+        session: requests.Session kept between polls (warm connection and
+                 cookies), or None to create a new one
+        timings: PollTimings where the HTTP stages are measured, or None
+        policy: RetryPolicy of this poll (timeouts, retries and deadline);
+                without it every request waits up to timeout, with no retries
+        
+    Returns:
+        str: Downloaded HTML content or None if there's an error
+    """
+    html_content = _fetch_information(url_base, contrasena, timeout, session_cache, session, timings, policy,
+                                      _read_html)
+    
+    # Save the downloaded HTML to a file
+    if html_content and ruta_destino:
+        with open(ruta_destino, "w", encoding="utf-8") as file:
+            file.write(html_content)
+        print(f"HTML downloaded and saved to '{ruta_destino}'")
+    return html_content
+
+def login_y_extraer_datos(url_base, contrasena, model_family=None, unknown_labels=None, timeout=None,
+                          session_cache=None, session=None, timings=None, policy=None):
+    """
+    Logs into a website and extracts the maintenance data while the
+    information page is downloaded: the body is streamed into a
+    MaintenanceParser and the connection is closed as soon as the
+    "Total Pages Printed" section has been read, so neither the rest of
+    the page nor the whole HTML is ever kept in memory or on disk.
+    
+    Args:
+        url_base: Base URL of the website
+        contrasena: Password to login
+        model_family: Printer model family with its own labels, or None
+        unknown_labels: Set where unknown consumable labels are added
+        timeout: Timeout in seconds for each HTTP request (None waits forever)
+        session_cache: SessionCache to reuse the cookies of a previous login
+        session: requests.Session kept between polls, or None to create a new one
+        timings: PollTimings where the HTTP stages are measured, or None
+        policy: RetryPolicy of this poll, or None for a single try with timeout
+        
+    Returns:
+        dict: Same dictionary as extract_printer_data or None if there's an error
+    """
+    def read(timings, policy, stage, method, *args, **kwargs):
+        parser = MaintenanceParser(model_family, unknown_labels, stop_at_pages=True)
+        login_page = []
+        
+        def consume(response):
+            if not response.ok:
+                response.close()
+                return 0
+            size, is_login = stream_into_parser(response, parser, policy=policy)
+            login_page.append(is_login)
+            return size
+        
+        response = timings.request(stage, policy.request, method, *args, consume=consume, verify=False, **kwargs)
+        response.raise_for_status()
+        parser.close()
+        if login_page[0]:
+            return None, 'login'
+        return parser.data, 'information' if any(parser.data.values()) else 'other'
+    
+    return _fetch_information(url_base, contrasena, timeout, session_cache, session, timings, policy, read)
+
+def _read_html(timings, policy, stage, method, *args, **kwargs):
+    """
+    Page reader of login_y_descargar_html: downloads the whole body.
+    
+    Returns:
+        tuple: (HTML, 'login', 'information' or 'other')
+    """
+    response = timings.request(stage, policy.request, method, *args, verify=False, **kwargs)
+    response.raise_for_status()
+    html_content = response.text
+    if is_login_page(html_content):
+        return html_content, 'login'
+    if "Tóner" in html_content or "toner" in html_content.lower():
+        return html_content, 'information'
+    return html_content, 'other'
+
+def stream_into_parser(response, parser, chunk_size=STREAM_CHUNK_SIZE, policy=None):
+    """
+    Feeds the body of a streamed response to a MaintenanceParser as it
+    arrives and closes the response as soon as the parser is done, so the
+    rest of the page is not downloaded.
+    
+    Args:
+        response: requests.Response made with stream=True
+        parser: MaintenanceParser (or any HTMLParser with a done attribute)
+        chunk_size: Bytes read from the socket at a time
+        policy: RetryPolicy whose deadline stops the read (see RetryPolicy.read), or None
+        
+    Returns:
+        tuple: (bytes read, True if the page is the login page)
+    """
+    import codecs
+    
+    try:
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    # Keep the end of the previous chunk so a marker split between two chunks is found
+    overlap = max(len(marker) for marker in LOGIN_PAGE_MARKERS) - 1
+    tail = ''
+    size = 0
+    login_page = False
+    chunks = policy.read(response, chunk_size) if policy else response.iter_content(chunk_size)
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            text = decoder.decode(chunk)
+            if not login_page:
+                login_page = is_login_page(tail + text)
+                tail = (tail + text)[-overlap:]
+            parser.feed(text)
+            if parser.done:
+                break
+        else:
+            parser.feed(decoder.decode(b'', final=True))
+    finally:
+        response.close()
+    return size, login_page
+
+def _fetch_information(url_base, contrasena, timeout, session_cache, session, timings, policy, read):
+    """
+    Login flow shared by login_y_descargar_html and login_y_extraer_datos:
+    the information page is tried with the cached cookies first and
+    otherwise read after a full login.
+    
+    Args:
+        read: Callable (timings, policy, stage, method, url, **kwargs)
+              making the request and returning (page, kind), where kind is
+              'login', 'information' or 'other'
+        (the rest as in login_y_descargar_html)
+        
+    Returns:
+        The page returned by read or None if there's an error
+    """
+    import requests
+    
+    # Create a session to maintain cookies
+    if session is None:
+        session = requests.Session()
+    if timings is None:
+        timings = PollTimings()
+    if policy is None:
+        policy = RetryPolicy(timeout, timeout, retries=0).start()
+
+    # Disable SSL verification (printer uses self-signed certificate)
+    import urllib3
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    
+    # Form data for login
+    login_data = {
+        "B1891": contrasena,
+        "loginurl": INFORMATION_PATH,
+        "pageid": "1"
+    }
+
+    # URL for login
+    login_url = f"{url_base}/home/status.html"
+    target_url = f"{url_base}{INFORMATION_PATH}"
+
+    try:
+        page = None
+
+        # Try the information page directly with the cookies of a previous
+        # login, kept by the pooled session or by the session cache
+        cached = False
+        if session_cache and not session.cookies:
+            cookies = session_cache.load(url_base)
+            if cookies:
+                for cookie in cookies:
+                    session.cookies.set(**cookie)
+                cached = True
+        if session.cookies:
+            try:
+                page, kind = read(timings, policy, 'session_get', session.get, target_url)
+            except requests.exceptions.HTTPError:
+                kind = 'login'
+            if kind != 'login':
+                if cached:
+                    print("Reusing cached session")
+                    session_cache.hit()
+            else:
+                page = None
+                if cached:
+                    session_cache.reject(url_base)
+                elif session_cache:
+                    session_cache.discard(url_base)
+                session.cookies.clear()
+
+        if page is None:
+            page = _login(session, login_url, target_url, login_data, policy, timings, read)
+            if page is None:
+                return None
+            if session_cache:
+                session_cache.save(url_base, session.cookies)
+        return page
+    
+    except requests.exceptions.RequestException as e:
+        print(f"Error during HTTP request: {e}")
+        return None
+
+class CsrfTokenParser(HTMLParser):
+    """Finds the value of the <input id="CSRFToken"> of the login form."""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.token = None
+    
+    def handle_starttag(self, tag, attrs):
+        if self.token is None and tag == 'input':
+            attrs = dict(attrs)
+            if attrs.get('id') == 'CSRFToken':
+                self.token = attrs.get('value') or ''
+
+def find_csrf_token(html_content):
+    """
+    Reads the CSRF token of the printer login page without building a tree.
+    
+    Args:
+        html_content: HTML of /home/status.html
+        
+    Returns:
+        str: Value of the CSRFToken input ('' if it has none) or None if the
+             page has no token
+    """
+    parser = CsrfTokenParser()
+    parser.feed(html_content)
+    parser.close()
+    return parser.token
+
+def _login(session, login_url, target_url, login_data, policy, timings, read):
+    """
+    Performs the full login flow and returns the information page.
+    
+    Args:
+        session: requests.Session used for the printer
+        login_url: URL of the status page with the login form
+        target_url: URL of the information page
+        login_data: Form data for the login POST
+        policy: RetryPolicy of the poll
+        timings: PollTimings where the HTTP stages are measured
+        read: Page reader (see _fetch_information)
+        
+    Returns:
+        The page returned by read or None if the login failed
+    """
+    # First, GET the login page to get the CSRF token and session cookie
+    print("Attempting to login...")
+    response_get = timings.request('status_get', policy.request, session.get, login_url, verify=False)
+    response_get.raise_for_status()
+
+    # Extract CSRF token if present
+    with timings.stage('csrf_parse'):
+        csrf_token = find_csrf_token(response_get.text)
+    if csrf_token is not None:
+        login_data['CSRFToken'] = csrf_token
+
+    # Perform the login POST
+    page, kind = read(timings, policy, 'login_post', session.post, login_url, data=login_data, allow_redirects=True)
+
+    # Verify if login was successful (check both English and Spanish)
+    if kind == 'login':
+        print("Error: Could not login. Check the password.")
+        return None
+
+    print("Login successful")
+
+    # The POST response already contains the target page after redirect
+    # But if not, fetch the information page explicitly
+    if kind != 'information':
+        print(f"Downloading content from {target_url}...")
+        timings.fallback_fetch = True
+        page, kind = read(timings, policy, 'information_get', session.get, target_url)
+
+    return page
+
+# BER tags used by the SNMP messages
+BER_INTEGER = 0x02
+BER_OCTET_STRING = 0x04
+BER_NULL = 0x05
+BER_OID = 0x06
+BER_SEQUENCE = 0x30
+SNMP_COUNTER32 = 0x41
+SNMP_GAUGE32 = 0x42
+SNMP_TIMETICKS = 0x43
+SNMP_COUNTER64 = 0x46
+SNMP_NO_SUCH_OBJECT = 0x80
+SNMP_NO_SUCH_INSTANCE = 0x81
+SNMP_END_OF_MIB_VIEW = 0x82
+
+SNMP_GET = 0xA0
+SNMP_GET_NEXT = 0xA1
+SNMP_RESPONSE = 0xA2
+SNMP_GET_BULK = 0xA5
+
+SNMP_VERSION_2C = 1
+SNMP_TOO_BIG = 1
+
+# Printer-MIB (RFC 3805): prtMarkerSuppliesTable columns and colorant names
+PRT_SUPPLIES_COLORANT = (1, 3, 6, 1, 2, 1, 43, 11, 1, 1, 3)
+PRT_SUPPLIES_TYPE = (1, 3, 6, 1, 2, 1, 43, 11, 1, 1, 5)
+PRT_SUPPLIES_DESCRIPTION = (1, 3, 6, 1, 2, 1, 43, 11, 1, 1, 6)
+PRT_SUPPLIES_UNIT = (1, 3, 6, 1, 2, 1, 43, 11, 1, 1, 7)
+PRT_SUPPLIES_MAX = (1, 3, 6, 1, 2, 1, 43, 11, 1, 1, 8)
+PRT_SUPPLIES_LEVEL = (1, 3, 6, 1, 2, 1, 43, 11, 1, 1, 9)
+PRT_COLORANT_VALUE = (1, 3, 6, 1, 2, 1, 43, 12, 1, 1, 4)
+PRT_MARKER_LIFE_COUNT = (1, 3, 6, 1, 2, 1, 43, 10, 2, 1, 4, 1, 1)
+
+# Brother private OIDs: blocks of 7-byte records (code, 0x01, 0x04, 32-bit value)
+BROTHER_MAINTENANCE = (1, 3, 6, 1, 4, 1, 2435, 2, 3, 9, 4, 2, 1, 5, 5, 8, 0)
+BROTHER_COUNTERS = (1, 3, 6, 1, 4, 1, 2435, 2, 3, 9, 4, 2, 1, 5, 5, 10, 0)
+
+# prtMarkerSuppliesType values and the result section they fill
+SUPPLY_TYPES = {3: 'toner', 21: 'toner', 9: 'drum', 20: 'belt_unit', 15: 'fuser_unit'}
+
+# prtMarkerSuppliesSupplyUnit values
+SUPPLY_UNIT_IMPRESSIONS = 7
+SUPPLY_UNIT_PERCENT = 19
+
+# Record codes of the Brother blocks (maintenance values are hundredths of %)
+BROTHER_COUNTER_CODES = {0x00: 'total', 0x01: 'bw', 0x02: 'colour'}
+BROTHER_MAINTENANCE_CODES = {0x69: 'belt_unit', 0x6a: 'fuser_unit'}
+
+SNMP_COLORS = ('cyan', 'magenta', 'yellow', 'black')
+
+# Seconds to wait for every SNMP answer (UDP: the request is repeated once)
+SNMP_TIMEOUT = 2.0
+
+# Where the printer data is read from: the web UI, SNMP, or SNMP with the
+# web UI filling the values the agent doesn't expose
+PRINTER_SOURCES = ('html', 'snmp', 'auto')
+
+def parse_oid(text):
+    """Converts a dotted OID ('1.3.6.1...') into a tuple of integers."""
+    return tuple(int(part) for part in text.strip('.').split('.'))
+
+def ber_encode(tag, payload):
+    """
+    Encodes a BER element.
+    
+    Args:
+        tag: BER tag
+        payload: Encoded contents (bytes)
+        
+    Returns:
+        bytes: Tag, definite length and contents
+    """
+    length = len(payload)
+    if length < 0x80:
+        return bytes((tag, length)) + payload
+    size = (length.bit_length() + 7) // 8
+    return bytes((tag, 0x80 | size)) + length.to_bytes(size, 'big') + payload
+
+def ber_encode_integer(value, tag=BER_INTEGER):
+    """Encodes a signed integer (or an unsigned SNMP counter with its tag)."""
+    size = max(1, (value.bit_length() + 8) // 8)
+    return ber_encode(tag, value.to_bytes(size, 'big', signed=True))
+
+def ber_encode_oid(oid):
+    """Encodes an OID given as a tuple of integers."""
+    payload = bytearray((40 * oid[0] + oid[1],))
+    for part in oid[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        payload.extend(reversed(chunk))
+    return ber_encode(BER_OID, bytes(payload))
+
+def ber_decode(buffer, offset=0):
+    """
+    Decodes the BER element starting at offset.
+    
+    Returns:
+        tuple: (tag, contents, offset of the next element)
+    """
+    try:
+        tag = buffer[offset]
+        length = buffer[offset + 1]
+        offset += 2
+        if length & 0x80:
+            size = length & 0x7F
+            length = int.from_bytes(buffer[offset:offset + size], 'big')
+            offset += size
+    except IndexError:
+        raise ValueError("Truncated BER element")
+    end = offset + length
+    if end > len(buffer):
+        raise ValueError("Truncated BER element")
+    return tag, buffer[offset:end], end
+
+def ber_decode_oid(payload):
+    """Decodes the contents of a BER OID into a tuple of integers."""
+    if not payload:
+        return ()
+    oid = [payload[0] // 40, payload[0] % 40]
+    value = 0
+    for byte in payload[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            oid.append(value)
+            value = 0
+    return tuple(oid)
+
+def snmp_value(tag, payload):
+    """
+    Converts an SNMP varbind value into a Python value.
+    
+    Returns:
+        int, bytes, tuple or None: Integers and counters as int, strings as
+        bytes, OIDs as tuple, and None for NULL and the noSuch*/endOfMibView
+        exceptions
+    """
+    if tag == BER_INTEGER:
+        return int.from_bytes(payload, 'big', signed=True)
+    if tag in (SNMP_COUNTER32, SNMP_GAUGE32, SNMP_TIMETICKS, SNMP_COUNTER64):
+        return int.from_bytes(payload, 'big')
+    if tag == BER_OID:
+        return ber_decode_oid(payload)
+    if tag in (BER_NULL, SNMP_NO_SUCH_OBJECT, SNMP_NO_SUCH_INSTANCE, SNMP_END_OF_MIB_VIEW):
+        return None
+    return bytes(payload)
+
+def build_snmp_message(community, pdu_type, request_id, varbinds, error_status=0, error_index=0):
+    """
+    Builds an SNMPv2c message. For GetBulk requests error_status and
+    error_index carry non-repeaters and max-repetitions.
+    
+    Args:
+        community: Community string
+        pdu_type: SNMP_GET, SNMP_GET_NEXT, SNMP_GET_BULK or SNMP_RESPONSE
+        request_id: Request identifier
+        varbinds: List of (oid, tag, contents); requests use (oid, BER_NULL, b'')
+        error_status: Error status (non-repeaters in GetBulk)
+        error_index: Error index (max-repetitions in GetBulk)
+        
+    Returns:
+        bytes: Encoded message
+    """
+    varbind_list = b''.join(
+        ber_encode(BER_SEQUENCE, ber_encode_oid(oid) + ber_encode(tag, payload))
+        for oid, tag, payload in varbinds
+    )
+    pdu = ber_encode(pdu_type, ber_encode_integer(request_id) + ber_encode_integer(error_status) +
+                     ber_encode_integer(error_index) + ber_encode(BER_SEQUENCE, varbind_list))
+    return ber_encode(BER_SEQUENCE, ber_encode_integer(SNMP_VERSION_2C) +
+                      ber_encode(BER_OCTET_STRING, community.encode('utf-8')) + pdu)
+
+def parse_snmp_message(packet):
+    """
+    Parses an SNMPv1/v2c message.
+    
+    Args:
+        packet: Received datagram
+        
+    Returns:
+        dict: 'version', 'community', 'pdu_type', 'request_id', 'error_status',
+              'error_index' and 'varbinds' as a list of (oid, tag, contents)
+    """
+    tag, message, _ = ber_decode(packet)
+    if tag != BER_SEQUENCE:
+        raise ValueError("Not an SNMP message")
+    _, version, offset = ber_decode(message)
+    _, community, offset = ber_decode(message, offset)
+    pdu_type, pdu, _ = ber_decode(message, offset)
+    
+    fields = []
+    offset = 0
+    for _ in range(3):
+        _, value, offset = ber_decode(pdu, offset)
+        fields.append(int.from_bytes(value, 'big', signed=True))
+    _, varbind_list, _ = ber_decode(pdu, offset)
+    
+    varbinds = []
+    offset = 0
+    while offset < len(varbind_list):
+        _, varbind, offset = ber_decode(varbind_list, offset)
+        _, oid, value_offset = ber_decode(varbind)
+        value_tag, value, _ = ber_decode(varbind, value_offset)
+        varbinds.append((ber_decode_oid(oid), value_tag, value))
+    
+    return {
+        'version': int.from_bytes(version, 'big'),
+        'community': community.decode('utf-8', errors='replace'),
+        'pdu_type': pdu_type,
+        'request_id': fields[0],
+        'error_status': fields[1],
+        'error_index': fields[2],
+        'varbinds': varbinds
+    }
+
+class SnmpClient:
+    """
+    Minimal SNMPv2c client over UDP (GET and GETBULK walks), enough to read
+    the Printer-MIB without external dependencies.
+    """
+    
+    def __init__(self, host, port=161, community='public', timeout=2.0, retries=1):
+        """
+        Args:
+            host: Printer address
+            port: SNMP port
+            community: Community string
+            timeout: Seconds to wait for every answer
+            retries: Times a request is repeated when there is no answer
+        """
+        import socket
+        
+        family, kind, proto, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+        self.address = address
+        self.community = community
+        self.retries = retries
+        self.requests = 0
+        self.received = 0
+        self.sock = socket.socket(family, kind, proto)
+        self.sock.settimeout(timeout)
+        self._request_id = random.randint(1, 0x3FFFFFFF)
+    
+    def close(self):
+        """Closes the UDP socket."""
+        self.sock.close()
+    
+    def _request(self, pdu_type, oids, error_status=0, error_index=0):
+        import socket
+        
+        self._request_id = (self._request_id + 1) & 0x7FFFFFFF
+        packet = build_snmp_message(self.community, pdu_type, self._request_id,
+                                    [(oid, BER_NULL, b'') for oid in oids], error_status, error_index)
+        for _ in range(self.retries + 1):
+            self.sock.sendto(packet, self.address)
+            self.requests += 1
+            try:
+                while True:
+                    answer = self.sock.recv(65535)
+                    self.received += len(answer)
+                    response = parse_snmp_message(answer)
+                    # Late answers to a previous attempt are ignored
+                    if response['request_id'] == self._request_id:
+                        return response
+            except socket.timeout:
+                continue
+        raise TimeoutError(f"No SNMP answer from {self.address[0]}:{self.address[1]}")
+    
+    def get(self, oids):
+        """
+        Reads scalar values.
+        
+        Args:
+            oids: List of OIDs (tuples)
+            
+        Returns:
+            dict: {oid: value} for the OIDs that exist in the agent
+        """
+        response = self._request(SNMP_GET, oids)
+        if response['error_status']:
+            raise ValueError(f"SNMP error status {response['error_status']}")
+        values = {oid: snmp_value(tag, payload) for oid, tag, payload in response['varbinds']}
+        return {oid: value for oid, value in values.items() if value is not None}
+    
+    def bulk_walk(self, roots, max_repetitions=10):
+        """
+        Walks several subtrees at the same time with GETBULK, so a table of
+        N columns costs the same number of requests as a single column.
+        
+        Args:
+            roots: List of OIDs (tuples) of the subtrees
+            max_repetitions: Rows asked for in every request
+            
+        Returns:
+            dict: {root: {oid: value}}
+        """
+        results = {root: {} for root in roots}
+        cursors = {root: root for root in roots}
+        while cursors:
+            walking = list(cursors)
+            response = self._request(SNMP_GET_BULK, [cursors[root] for root in walking], 0, max_repetitions)
+            if response['error_status'] == SNMP_TOO_BIG and max_repetitions > 1:
+                max_repetitions //= 2
+                continue
+            if response['error_status']:
+                raise ValueError(f"SNMP error status {response['error_status']}")
+            varbinds = response['varbinds']
+            if not varbinds:
+                break
+            # The answer has the next OID of every subtree, repetition after repetition
+            for position, (oid, tag, payload) in enumerate(varbinds):
+                root = walking[position % len(walking)]
+                if root not in cursors:
+                    continue
+                if tag == SNMP_END_OF_MIB_VIEW or oid[:len(root)] != root or oid <= cursors[root]:
+                    del cursors[root]
+                    continue
+                results[root][oid] = snmp_value(tag, payload)
+                cursors[root] = oid
+        return results
+
+def _brother_records(block):
+    """
+    Splits a Brother private OID value into {code: value}.
+    
+    Args:
+        block: Raw bytes of the OCTET STRING
+    """
+    records = {}
+    for offset in range(0, len(block) - 6, 7):
+        code = block[offset]
+        if code == 0xFF:
+            break
+        records[code] = int.from_bytes(block[offset + 3:offset + 7], 'big')
+    return records
+
+def _supply_color(colorant, description):
+    """Returns the colour of a supply from its colorant name or its description."""
+    for text in (colorant, description):
+        text = (text or '').lower()
+        for color in SNMP_COLORS:
+            if color in text:
+                return color
+    # Monochrome printers usually don't name the colour
+    return 'black'
+
+def collect_snmp_data(host, community='public', port=161, timeout=2.0, timings=None):
+    """
+    Reads the consumables and counters with a few SNMP requests (Printer-MIB
+    supplies table and Brother private counters) instead of the web UI.
+    
+    Args:
+        host: Printer address
+        community: SNMP community
+        port: SNMP port
+        timeout: Seconds to wait for every answer
+        timings: PollTimings where the 'snmp' stage is measured, or None
+        
+    Returns:
+        dict: Same structure as extract_printer_data; the values the agent
+              doesn't expose are missing
+    """
+    if timings is None:
+        timings = PollTimings()
+    data = _empty_data()
+    
+    client = SnmpClient(host, port, community, timeout)
+    try:
+        with timings.stage('snmp') as entry:
+            columns = (PRT_SUPPLIES_COLORANT, PRT_SUPPLIES_TYPE, PRT_SUPPLIES_DESCRIPTION, PRT_SUPPLIES_UNIT,
+                       PRT_SUPPLIES_MAX, PRT_SUPPLIES_LEVEL, PRT_COLORANT_VALUE)
+            tables = client.bulk_walk(columns)
+            scalars = client.get([PRT_MARKER_LIFE_COUNT, BROTHER_MAINTENANCE, BROTHER_COUNTERS])
+            entry['bytes'] += client.received
+    finally:
+        client.close()
+    
+    def column(root):
+        # {row index (device, supply): value}
+        return {oid[len(root):]: value for oid, value in tables[root].items()}
+    
+    colorants = {index[-1]: value.decode('utf-8', errors='replace')
+                 for index, value in column(PRT_COLORANT_VALUE).items() if isinstance(value, bytes)}
+    descriptions = column(PRT_SUPPLIES_DESCRIPTION)
+    units = column(PRT_SUPPLIES_UNIT)
+    maximums = column(PRT_SUPPLIES_MAX)
+    levels = column(PRT_SUPPLIES_LEVEL)
+    colorant_indexes = column(PRT_SUPPLIES_COLORANT)
+    
+    for index, supply_type in column(PRT_SUPPLIES_TYPE).items():
+        section = SUPPLY_TYPES.get(supply_type)
+        level = levels.get(index)
+        maximum = maximums.get(index)
+        # Negative levels mean "unknown" or "some remaining"
+        if section is None or level is None or level < 0:
+            continue
+        unit = units.get(index)
+        percent = None
+        if unit == SUPPLY_UNIT_PERCENT:
+            percent = level
+        elif maximum and maximum > 0:
+            percent = round(level * 100 / maximum)
+        
+        if section in ('toner', 'drum'):
+            description = descriptions.get(index, b'').decode('utf-8', errors='replace')
+            color = _supply_color(colorants.get(colorant_indexes.get(index)), description)
+            if percent is not None and color not in data[section]:
+                data[section][color] = percent
+        elif not data[section]:
+            if unit == SUPPLY_UNIT_IMPRESSIONS:
+                data[section]['pages'] = level
+            if percent is not None:
+                data[section]['percent'] = percent
+    
+    # Brother's own remaining life is the one shown in the web UI
+    maintenance = scalars.get(BROTHER_MAINTENANCE)
+    if isinstance(maintenance, bytes):
+        for code, value in _brother_records(maintenance).items():
+            section = BROTHER_MAINTENANCE_CODES.get(code)
+            if section:
+                data[section]['percent'] = value // 100
+    
+    counters = scalars.get(BROTHER_COUNTERS)
+    if isinstance(counters, bytes):
+        for code, value in _brother_records(counters).items():
+            counter = BROTHER_COUNTER_CODES.get(code)
+            if counter:
+                data['pages_printed'][counter] = value
+    if 'total' not in data['pages_printed'] and isinstance(scalars.get(PRT_MARKER_LIFE_COUNT), int):
+        data['pages_printed']['total'] = scalars[PRT_MARKER_LIFE_COUNT]
+    
+    return data
+
+def missing_printer_fields(data):
+    """
+    Lists the values a colour laser printer shows in its web UI that are
+    missing in data.
+    
+    Returns:
+        list: Names like 'toner', 'belt_unit.percent' or 'pages_printed.bw'
+    """
+    missing = [section for section in ('toner', 'drum') if not data.get(section)]
+    for section in ('belt_unit', 'fuser_unit'):
+        missing.extend(f'{section}.{field}' for field in ('pages', 'percent') if field not in data.get(section, {}))
+    missing.extend(f'pages_printed.{counter}' for counter in ('total', 'colour', 'bw')
+                   if counter not in data.get('pages_printed', {}))
+    return missing
+
+def merge_printer_data(primary, fallback):
+    """
+    Fills the values missing in primary with the ones of fallback.
+    
+    Returns:
+        dict: New result dictionary
+    """
+    merged = _empty_data()
+    for section in merged:
+        merged[section].update(fallback.get(section, {}))
+        merged[section].update(primary.get(section, {}))
+    return merged
+
+def load_inventory(path):
+    """
+    Loads the printer inventory for fleet mode.
+    
+    The file can be JSON, YAML (needs PyYAML) or CSV. JSON and YAML accept
+    either a list of printers or a mapping with a "printers" list. Each
+    printer needs 'url' and 'zabbix_hostname', a credential ('password',
+    'password_env' with an environment variable name or 'password_file')
+    and can override 'timeout', 'zabbix_server', 'zabbix_port',
+    'model_family', 'source' ('html', 'snmp' or 'auto'), 'snmp_community',
+    'snmp_port', and the RetryPolicy settings 'connect_timeout', 'retries'
+    and 'deadline'. Printers read only over SNMP don't need a credential.
+    
+    Args:
+        path: Path of the inventory file
+        
+    Returns:
+        list: One dictionary per printer
+        
+    Raises:
+        ValueError: If the file format is unknown or a printer is incomplete
+    """
+    import csv
+    
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as file:
+        if extension == '.csv':
+            printers = [
+                {key: value for key, value in row.items() if value not in (None, '')}
+                for row in csv.DictReader(file)
+            ]
+        elif extension in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is needed for YAML inventories (pip install pyyaml)")
+            printers = yaml.safe_load(file)
+        elif extension == '.json':
+            printers = json.load(file)
+        else:
+            raise ValueError(f"Unknown inventory format: {path}")
+    
+    if isinstance(printers, dict):
+        printers = printers.get('printers', [])
+    if printers is None:
+        # Empty YAML file
+        printers = []
+    if not isinstance(printers, list):
+        raise ValueError(f"{path} must contain a list of printers")
+    
+    for number, printer in enumerate(printers, 1):
+        if not isinstance(printer, dict):
+            raise ValueError(f"Printer #{number} in {path} is not a mapping")
+        for field in ('url', 'zabbix_hostname'):
+            if not printer.get(field):
+                raise ValueError(f"Printer #{number} in {path} has no '{field}'")
+        for field in ('timeout', 'connect_timeout', 'deadline', 'interval', 'min_interval', 'max_interval'):
+            if field in printer:
+                printer[field] = float(printer[field])
+        for field in ('zabbix_port', 'snmp_port', 'retries'):
+            if field in printer:
+                printer[field] = int(printer[field])
+        if printer.get('source', 'html') not in PRINTER_SOURCES:
+            raise ValueError(f"Printer #{number} in {path} has an unknown source: {printer['source']}")
+    
+    return printers
+
+def resolve_password(printer, default=None):
+    """
+    Returns the printer password from its credential reference.
+    
+    Args:
+        printer: Printer dictionary from the inventory
+        default: Password to use when the printer doesn't define one
+        
+    Returns:
+        str: Password or None if it can't be resolved
+    """
+    if printer.get('password'):
+        return printer['password']
+    if printer.get('password_env'):
+        return os.environ.get(printer['password_env'])
+    if printer.get('password_file'):
+        with open(printer['password_file'], encoding='utf-8') as file:
+            return file.read().strip()
+    return default
+
+class SnmpOnlyPrinters:
+    """
+    Printers whose web UI added nothing to their SNMP values, so that source
+    'auto' stops logging into them.
+    
+    A mark expires after ttl seconds and the next poll scrapes the page
+    again, so a firmware update or a new consumable that the agent doesn't
+    report is noticed.
+    """
+    
+    def __init__(self, ttl=6 * 3600):
+        """
+        Args:
+            ttl: Seconds a printer is read over SNMP only before the web UI
+                 is checked again
+        """
+        self.ttl = ttl
+        self._marked = {}
+        self._lock = threading.Lock()
+    
+    def __contains__(self, url):
+        with self._lock:
+            marked = self._marked.get(url)
+            if marked is not None and time.monotonic() - marked >= self.ttl:
+                del self._marked[url]
+                marked = None
+        return marked is not None
+    
+    def add(self, url):
+        """Marks a printer as read over SNMP only from now on."""
+        with self._lock:
+            self._marked[url] = time.monotonic()
+    
+    def discard(self, url):
+        """Forgets a printer (removed from the inventory or its page was useful)."""
+        with self._lock:
+            self._marked.pop(url, None)
+
+def _scrape_printer(printer, default_password, policy, session_cache, extractor, session, timings, unknown_labels,
+                    archive_dir=None):
+    """
+    Logs into the web UI of a printer and extracts its data, keeping the
+    page in archive_dir (see archive_snapshot) when it is given. With the
+    'fast' extractor and no archive the page is streamed into the parser
+    and only read up to the "Total Pages Printed" section.
+    
+    Returns:
+        tuple: (data, None) or (None, error message)
+    """
+    password = resolve_password(printer, default_password)
+    if password is None:
+        return None, "No password available"
+    
+    if extractor == 'fast' and not archive_dir:
+        data = login_y_extraer_datos(
+            printer['url'], password, printer.get('model_family'), unknown_labels, session_cache=session_cache,
+            session=session, timings=timings, policy=policy
+        )
+        if data is None:
+            return None, "Could not download printer content"
+        if not any(data.values()):
+            return None, "No data found in the printer page"
+        return data, None
+    
+    html_content = login_y_descargar_html(
+        printer['url'], password, None, session_cache=session_cache, session=session, timings=timings,
+        policy=policy
+    )
+    if not html_content:
+        return None, "Could not download printer content"
+    
+    if archive_dir:
+        try:
+            with timings.stage('archive'):
+                archive_snapshot(archive_dir, printer['zabbix_hostname'], html_content, timings.started)
+        except OSError as e:
+            print(f"⚠ Could not archive the page: {e}")
+    
+    with timings.stage('parse') as entry:
+        entry['bytes'] = len(html_content)
+        data = EXTRACTORS[extractor](html_content, printer.get('model_family'), unknown_labels)
+    if not any(data.values()):
+        return None, "No data found in the printer page"
+    return data, None
+
+def poll_printer(printer, default_password=None, timeout=30, session_cache=None, extractor='bs4', session=None,
+                 source='html', snmp_community='public', policy=None, archive_dir=None, snmp_only=None):
+    """
+    Reads the data of one printer from the inventory, from its web UI or
+    over SNMP.
+    
+    With source 'auto' the printer is read over SNMP and the web UI is only
+    scraped when the agent doesn't answer or misses some value, which is
+    then filled from the page. Printers whose page adds nothing are
+    remembered in snmp_only and read over SNMP only until the mark expires.
+    
+    Args:
+        printer: Printer dictionary from the inventory
+        default_password: Password for printers without their own credential
+        timeout: Default timeout in seconds for each HTTP request
+        session_cache: SessionCache to reuse the cookies of previous logins
+        extractor: Name of the extractor in EXTRACTORS ('bs4' or 'fast')
+        session: requests.Session kept between polls, or None
+        source: Default source, one of PRINTER_SOURCES ('html', 'snmp', 'auto')
+        snmp_community: Default SNMP community
+        policy: RetryPolicy with the timeouts, retries and deadline of every
+                poll, or None for a single try with the given timeout
+        archive_dir: Folder where the downloaded pages are archived, or None
+        snmp_only: SnmpOnlyPrinters kept between polls, or None to scrape
+                   every time SNMP misses a value
+        
+    Returns:
+        dict: 'printer', extracted 'data' (PrinterReading, None on failure), 'latency', 'error',
+              'unknown_labels' found in the page and the PollTimings in 'timings'
+    """
+    from urllib.parse import urlsplit
+    
+    start = time.monotonic()
+    timings = PollTimings(printer.get('zabbix_hostname'))
+    result = {'printer': printer, 'data': None, 'latency': 0.0, 'error': None, 'unknown_labels': set(),
+              'timings': timings}
+    source = printer.get('source', source)
+    policy = (policy or RetryPolicy(timeout, timeout, retries=0)).start(printer)
+    try:
+        data = None
+        if source in ('snmp', 'auto'):
+            try:
+                data = collect_snmp_data(
+                    urlsplit(printer['url']).hostname, printer.get('snmp_community', snmp_community),
+                    printer.get('snmp_port', 161), policy.timeout(min(policy.read_timeout, SNMP_TIMEOUT)), timings
+                )
+                if not any(data.values()):
+                    data = None
+                    error = "No data found in the SNMP agent"
+            except (OSError, ValueError) as e:
+                error = f"SNMP: {e}"
+            if data is None:
+                if source == 'snmp':
+                    result['error'] = error
+                    return result
+                print(f"⚠ {error}, reading the web UI")
+        
+        if source == 'html' or (source == 'auto' and (data is None or (
+                missing_printer_fields(data) and (snmp_only is None or printer['url'] not in snmp_only)))):
+            html_data, error = _scrape_printer(printer, default_password, policy, session_cache, extractor,
+                                               session, timings, result['unknown_labels'], archive_dir)
+            if html_data is None and data is None:
+                result['error'] = error
+                return result
+            if html_data is None:
+                print(f"⚠ {error}, using the SNMP values only")
+            elif data is None:
+                data = html_data
+            else:
+                merged = merge_printer_data(data, html_data)
+                if snmp_only is not None:
+                    if merged == data:
+                        snmp_only.add(printer['url'])
+                    else:
+                        snmp_only.discard(printer['url'])
+                data = merged
+        result['data'] = PrinterReading.from_dict(data)
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        result['latency'] = time.monotonic() - start
+        timings.retries = policy.retried
+        timings.finish()
+    return result
+
+# Value of the circuit breaker state in brother.breaker.state and the metrics
+BREAKER_STATES = {'closed': 0, 'open': 1, 'half_open': 2}
+
+class CircuitBreaker:
+    """
+    Per-printer circuit breaker: after 'failures' consecutive failed polls
+    the printer is not polled again until 'cooldown' seconds have passed,
+    then a single probe poll decides whether it closes again or waits
+    another cool-down. The state can be saved to a JSON file so it also
+    works across cron runs.
+    """
+    
+    def __init__(self, failures=3, cooldown=300, path=None):
+        """
+        Args:
+            failures: Consecutive failures that open the breaker
+            cooldown: Seconds the breaker stays open before the probe
+            path: JSON file where the state is kept between runs, or None
+        """
+        self.failures = failures
+        self.cooldown = cooldown
+        self.path = path
+        self.printers = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as file:
+                    self.printers = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"⚠ Could not read the circuit breaker state, starting closed: {e}")
+    
+    def state(self, key):
+        """
+        Returns:
+            str: 'closed', 'open' or 'half_open'
+        """
+        with self._lock:
+            entry = self.printers.get(key)
+            if entry is None or entry['opened'] is None:
+                return 'closed'
+            if time.time() - entry['opened'] >= self.cooldown:
+                return 'half_open'
+            return 'open'
+    
+    def allow(self, key):
+        """
+        Returns:
+            bool: False while the breaker of the printer is open
+        """
+        return self.state(key) != 'open'
+    
+    def record(self, key, ok):
+        """
+        Records the result of a poll.
+        
+        Returns:
+            str: New state of the breaker
+        """
+        with self._lock:
+            entry = self.printers.setdefault(key, {'failures': 0, 'opened': None})
+            if ok:
+                if entry['opened'] is not None:
+                    print(f"✓ {key}: circuit closed, the printer answers again")
+                entry['failures'] = 0
+                entry['opened'] = None
+            else:
+                entry['failures'] += 1
+                if entry['opened'] is not None or entry['failures'] >= self.failures:
+                    if entry['opened'] is None:
+                        print(f"⚠ {key}: circuit open after {entry['failures']} failures, "
+                              f"retrying in {self.cooldown}s")
+                    # A failed probe keeps it open for another cool-down
+                    entry['opened'] = time.time()
+        return self.state(key)
+    
+    def save(self):
+        """Writes the state to the JSON file (if any)."""
+        if not self.path:
+            return
+        with self._lock:
+            state = json.dumps(self.printers)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write(state)
+        os.replace(temporary, self.path)
+    
+    def summary(self):
+        """Returns a one-line summary of the open breakers."""
+        states = [self.state(key) for key in list(self.printers)]
+        return (f"Circuit breakers: {states.count('open')} open, {states.count('half_open')} waiting for a probe, "
+                f"{states.count('closed')} closed")
+
+def poll_with_breaker(printer, breaker, *args, **kwargs):
+    """
+    Polls a printer (see poll_printer) unless its circuit breaker is open.
+    
+    Args:
+        printer: Printer dictionary from the inventory
+        breaker: CircuitBreaker, or None to always poll
+        
+    Returns:
+        dict: Result of poll_printer plus the 'breaker' state (None without
+              breaker); skipped printers have 'skipped' True
+    """
+    key = printer['zabbix_hostname']
+    if breaker is not None and not breaker.allow(key):
+        return {'printer': printer, 'data': None, 'latency': 0.0, 'error': "Circuit open, not polled",
+                'unknown_labels': set(), 'timings': None, 'breaker': 'open', 'skipped': True}
+    result = poll_printer(printer, *args, **kwargs)
+    result['breaker'] = breaker.record(key, result['data'] is not None) if breaker is not None else None
+    result['skipped'] = False
+    return result
+
+def poll_pooled(printer, connection_pool, breaker, *args, **kwargs):
+    """
+    Polls a printer (see poll_with_breaker) with its session of the
+    connection pool.
+    
+    Args:
+        printer: Printer dictionary from the inventory
+        connection_pool: ConnectionPool with the printer sessions
+        breaker: CircuitBreaker, or None to always poll
+        
+    Returns:
+        dict: Result of poll_with_breaker, with the connections and TLS
+              handshakes of the poll in its timings
+    """
+    key = printer['zabbix_hostname']
+    before = connection_pool.snapshot(key)
+    result = poll_with_breaker(printer, breaker, *args, session=connection_pool.session(key), **kwargs)
+    if result['timings'] is not None:
+        after = connection_pool.snapshot(key)
+        result['timings'].connections = {name: after[name] - before[name] for name in after}
+    return result
+
+class ZabbixOutput:
+    """
+    Output backend that sends the readings to Zabbix trapper items, in a
+    single batch per Zabbix server every time it is flushed.
+    """
+    
+    def __init__(self, zabbix_server, zabbix_port=10051, sender='auto', state_store=None, zabbix_mode='items',
+                 self_monitoring=False, spool=None):
+        """
+        Args:
+            zabbix_server: Default Zabbix server address (printers can override it)
+            zabbix_port: Default Zabbix server port
+            sender: 'native', 'binary' or 'auto' (see send_items_to_zabbix)
+            state_store: StateStore to send only changed values (delta mode), or None
+            zabbix_mode: 'items' or 'json' (see build_zabbix_items)
+            self_monitoring: Also send the poll timings (SELF_MONITORING_ITEMS)
+            spool: Spool for the values the server couldn't receive, or None
+        """
+        self.zabbix_server = zabbix_server
+        self.zabbix_port = zabbix_port
+        self.sender = sender
+        self.state_store = state_store
+        self.zabbix_mode = zabbix_mode
+        self.self_monitoring = self_monitoring
+        self.spool = spool
+        self._pending = {}
+        self._lock = threading.Lock()
+    
+    def add(self, result):
+        """
+        Queues the values of a poll until the next flush.
+        
+        Args:
+            result: Dictionary returned by poll_printer
+        """
+        printer = result['printer']
+        hostname = printer['zabbix_hostname']
+        server = (printer.get('zabbix_server', self.zabbix_server), printer.get('zabbix_port', self.zabbix_port))
+        items = []
+        if result['data'] is not None:
+            items = build_zabbix_items(hostname, result['data'], self.zabbix_mode)
+            if self.self_monitoring and result.get('timings'):
+                items += result['timings'].zabbix_items(hostname)
+        if result.get('breaker') is not None:
+            # Sent for failed and skipped polls too, so Zabbix sees the open breaker
+            items.append({'host': hostname, 'key': BREAKER_ITEM_KEY, 'value': str(BREAKER_STATES[result['breaker']]),
+                          'label': f"Circuit breaker: {result['breaker']}"})
+        if not items:
+            return
+        if self.spool is not None:
+            # Spooled values must keep the time of the poll, not the time of the replay
+            clock = int(time.time())
+            for item in items:
+                item.setdefault('clock', clock)
+        with self._lock:
+            self._pending.setdefault(server, []).extend(items)
+    
+    def flush(self):
+        """
+        Sends all the queued values, one batch per Zabbix server.
+        
+        Returns:
+            dict: Total 'processed', 'failed', 'suppressed' and 'spooled' values
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        
+        totals = {'processed': 0, 'failed': 0, 'suppressed': 0, 'spooled': 0}
+        for (server, port), items in pending.items():
+            print(f"\n📊 Sending {len(items)} values to {server}:{port}...")
+            try:
+                summary = send_items_to_zabbix(items, server, port, self.sender, self.state_store, self.spool)
+            except FileNotFoundError:
+                print("Error: zabbix_sender is not installed or not in PATH")
+                summary = {'processed': 0, 'failed': len(items), 'suppressed': 0, 'spooled': 0}
+            print(f"  {summary['processed']} processed, {summary['failed']} errors, "
+                  f"{summary['suppressed']} unchanged" + (f", {summary['spooled']} spooled" if self.spool else ''))
+            for counter in totals:
+                totals[counter] += summary[counter]
+        return totals
+    
+    def close(self):
+        """Sends the values still queued."""
+        self.flush()
+        if self.state_store:
+            print(self.state_store.summary())
+        if self.spool:
+            print(self.spool.summary())
+
+class PrometheusOutput:
+    """
+    Output backend that serves the latest reading of every printer on
+    /metrics in the Prometheus text format (or OpenMetrics when the scraper
+    asks for it).
+    
+    Scrapes only read the cached readings: the printers are polled in the
+    background by PrinterScheduler at their own interval, so scraping often
+    or from several Prometheus servers never causes extra logins.
+    """
+    
+    GAUGES = (
+        ('brother_toner_level_percent', 'Remaining toner (%)'),
+        ('brother_drum_level_percent', 'Remaining drum unit life (%)'),
+        ('brother_unit_remaining_pages', 'Remaining pages of the belt and fuser units'),
+        ('brother_unit_remaining_life_percent', 'Remaining life of the belt and fuser units (%)'),
+        ('brother_pages_printed', 'Pages printed by the printer'),
+        ('brother_up', 'Whether the last poll of the printer succeeded'),
+        ('brother_last_poll_timestamp_seconds', 'Time of the last poll of the printer'),
+        ('brother_last_success_timestamp_seconds', 'Time of the last successful poll of the printer'),
+        ('brother_poll_duration_seconds', 'Duration of the last poll of the printer'),
+        ('brother_circuit_breaker_state', 'Circuit breaker of the printer (0 closed, 1 open, 2 half-open)'),
+        ('brother_poll_interval_seconds', 'Seconds until the next poll of the printer (--adaptive)')
+    )
+    
+    def __init__(self, port=9101, address=''):
+        """
+        Args:
+            port: Port where /metrics is served (0 for any free port)
+            address: Address to listen on (all interfaces by default)
+        """
+        self.port = port
+        self.address = address
+        self.readings = {}
+        self._lock = threading.Lock()
+        self._server = None
+    
+    def start(self):
+        """Starts serving /metrics in a background thread."""
+        import http.server
+        
+        output = self
+        
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+            
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                openmetrics = 'application/openmetrics-text' in (self.headers.get('Accept') or '')
+                body = output.render(openmetrics).encode('utf-8')
+                self.send_response(200)
+                if openmetrics:
+                    self.send_header('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+                else:
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        
+        self._server = http.server.ThreadingHTTPServer((self.address, self.port), Handler)
+        self._server.daemon_threads = True
+        # Port 0 picks a free port
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"Serving metrics on http://{self.address or '0.0.0.0'}:{self.port}/metrics")
+        return self
+    
+    def add(self, result):
+        """
+        Stores the result of a poll. A failed poll keeps the last good data
+        and sets brother_up to 0.
+        
+        Args:
+            result: Dictionary returned by poll_printer
+        """
+        hostname = result['printer']['zabbix_hostname']
+        now = time.time()
+        with self._lock:
+            reading = self.readings.setdefault(hostname, {'data': None, 'success': None})
+            reading['up'] = result['data'] is not None
+            reading['polled'] = now
+            reading['latency'] = result['latency']
+            reading['breaker'] = result.get('breaker')
+            reading['interval'] = result.get('interval')
+            if result['data'] is not None:
+                reading['data'] = result['data']
+                reading['success'] = now
+    
+    def render(self, openmetrics=False):
+        """
+        Returns:
+            str: Metrics of every printer in the Prometheus text format, or
+                 OpenMetrics if openmetrics is True
+        """
+        def escape(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        
+        samples = {name: [] for name, _ in self.GAUGES}
+        
+        def add(name, value, **labels):
+            label_text = ','.join(f'{key}="{escape(label)}"' for key, label in labels.items())
+            samples[name].append(f'{name}{{{label_text}}} {value}')
+        
+        with self._lock:
+            readings = sorted(self.readings.items())
+        
+        for printer, reading in readings:
+            add('brother_up', int(reading['up']), printer=printer)
+            add('brother_last_poll_timestamp_seconds', f"{reading['polled']:.3f}", printer=printer)
+            add('brother_poll_duration_seconds', f"{reading['latency']:.3f}", printer=printer)
+            if reading['success'] is not None:
+                add('brother_last_success_timestamp_seconds', f"{reading['success']:.3f}", printer=printer)
+            if reading['breaker'] is not None:
+                add('brother_circuit_breaker_state', BREAKER_STATES[reading['breaker']], printer=printer)
+            if reading['interval'] is not None:
+                add('brother_poll_interval_seconds', f"{reading['interval']:.0f}", printer=printer)
+            data = reading['data']
+            if not data:
+                continue
+            for field, value in PrinterReading.from_dict(data).flatten():
+                if field.metric in ('toner', 'drum'):
+                    add(f'brother_{field.metric}_level_percent', value, printer=printer, color=field.name)
+                elif field.metric in ('belt_unit', 'fuser_unit'):
+                    unit = field.metric.split('_')[0]
+                    if field.name == 'pages':
+                        add('brother_unit_remaining_pages', value, printer=printer, unit=unit)
+                    else:
+                        add('brother_unit_remaining_life_percent', value, printer=printer, unit=unit)
+                elif field.metric == 'pages_printed':
+                    add('brother_pages_printed', value, printer=printer, type=field.name)
+        
+        lines = []
+        for name, help_text in self.GAUGES:
+            if samples[name]:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} gauge')
+                lines.extend(samples[name])
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+    
+    def flush(self):
+        """Nothing to send: the readings are served on scrape."""
+        return None
+    
+    def close(self):
+        """Stops the HTTP server."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+def run_fleet(printers, zabbix_server, zabbix_port=10051, sender='auto', workers=20, timeout=30, default_password=None,
+              session_cache=None, extractor='bs4', state_store=None, zabbix_mode='items', self_monitoring=False,
+              timing_log=None, source='html', snmp_community='public', policy=None, breaker=None, spool=None,
+              connection_pool=None, archive_dir=None):
     """
-    Extracts all maintenance data from the HTML page.
+    Polls every printer of the inventory concurrently and sends all the
+    results to Zabbix in a single batch per server.
     
     Args:
-        html_content: HTML content of the page
+        printers: List of printers returned by load_inventory
+        zabbix_server: Default Zabbix server address
+        zabbix_port: Default Zabbix server port
+        sender: 'native', 'binary' or 'auto' (see send_items_to_zabbix)
+        workers: Maximum number of printers polled at the same time
+        timeout: Default timeout in seconds for each HTTP request
+        default_password: Password for printers without their own credential
+        session_cache: SessionCache to reuse the cookies of previous logins
+        extractor: Name of the extractor in EXTRACTORS ('bs4' or 'fast')
+        state_store: StateStore to send only changed values (delta mode), or None
+        zabbix_mode: 'items' or 'json' (see build_zabbix_items)
+        self_monitoring: Also send the poll timings (SELF_MONITORING_ITEMS)
+        timing_log: TimingLog where the timings of every poll are written, or None
+        source: Default source of the printer data (see poll_printer)
+        snmp_community: Default SNMP community
+        policy: RetryPolicy with the timeouts, retries and deadline of every poll
+        breaker: CircuitBreaker that skips the printers that keep failing, or None
+        spool: Spool for the values the server couldn't receive, or None
+        connection_pool: ConnectionPool with the printer sessions (a new one if None)
+        archive_dir: Folder where the downloaded pages are archived, or None
         
     Returns:
-        dict: Dictionary with all extracted data
+        bool: True if every printer was polled and sent (or spooled) successfully
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
-    data = {
-        'toner': {},
-        'drum': {},
-        'belt_unit': {},
-        'fuser_unit': {},
-        'pages_printed': {}
-    }
+    import concurrent.futures
     
-    # Search for all dt elements
-    for dt in soup.find_all('dt'):
-        text = dt.get_text().strip()
-        dd = dt.find_next_sibling('dd')
-        if not dd:
+    if connection_pool is None:
+        connection_pool = ConnectionPool()
+    start = time.monotonic()
+    
+    print(f"Polling {len(printers)} printers with {workers} workers...")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda printer: poll_pooled(printer, connection_pool, breaker, default_password, timeout, session_cache,
+                                        extractor, source=source, snmp_community=snmp_community, policy=policy,
+                                        archive_dir=archive_dir),
+            printers
+        ))
+    connection_pool.close()
+    poll_time = time.monotonic() - start
+    
+    # A single batch per Zabbix server with the values of every printer
+    output = ZabbixOutput(zabbix_server, zabbix_port, sender, state_store, zabbix_mode, self_monitoring, spool)
+    for result in results:
+        output.add(result)
+        if timing_log:
+            timing_log.add(result)
+    totals = output.flush()
+    sent = totals['processed']
+    send_errors = totals['failed'] - totals['spooled']
+    
+    wall_time = time.monotonic() - start
+    failures = [result for result in results if result['error']]
+    latencies = sorted(result['latency'] for result in results)
+    
+    print(f"\n{'='*60}")
+    print("FLEET SUMMARY")
+    print(f"{'='*60}")
+    for result in sorted(results, key=lambda result: result['latency'], reverse=True):
+        status = f"✗ {result['error']}" if result['error'] else "✓"
+        print(f"  {result['printer']['zabbix_hostname']}: {result['latency']:.2f}s {status}")
+    if latencies:
+        print(f"\nPrinter latency: min {latencies[0]:.2f}s, "
+              f"median {latencies[len(latencies) // 2]:.2f}s, max {latencies[-1]:.2f}s")
+    stages = {}
+    for result in results:
+        if result['timings'] is None:
             continue
-            
-        value_text = dd.get_text().strip()
-        
-        # Extract Toner levels (Spanish: Tóner)
-        if ('Toner' in text or 'Tóner' in text) and '**' in text:
-            color = None
-            if 'Cyan' in text or 'Cian' in text:
-                color = 'cyan'
-            elif 'Magenta' in text:
-                color = 'magenta'
-            elif 'Yellow' in text or 'Amarillo' in text:
-                color = 'yellow'
-            elif 'Black' in text or 'Negro' in text:
-                color = 'black'
-            
-            if color:
-                match = re.search(r'(\d+)%', value_text)
-                if match:
-                    data['toner'][color] = int(match.group(1))
-        
-        # Extract Drum Unit levels (Spanish: Unidad de tambor)
-        elif ('Drum Unit' in text or 'Unidad de tambor' in text or 'tambor' in text) and '*' in text:
-            color = None
-            if 'Cyan' in text or 'Cian' in text:
-                color = 'cyan'
-            elif 'Magenta' in text:
-                color = 'magenta'
-            elif 'Yellow' in text or 'Amarillo' in text:
-                color = 'yellow'
-            elif 'Black' in text or 'Negro' in text:
-                color = 'black'
-            
-            if color:
-                match = re.search(r'(\d+)%', value_text)
-                if match:
-                    data['drum'][color] = int(match.group(1))
-        
-        # Extract Belt Unit (only the first time we find it) (Spanish: Unidad de correa)
-        elif ('Belt Unit' == text or 'Unidad de correa' == text) and not data['belt_unit']:
-            match = re.search(r'(\d+)', value_text)
-            if match:
-                data['belt_unit']['pages'] = int(match.group(1))
-            # Search for the percentage in the next element
-            next_dt = dt.find_next_sibling('dt')
-            if next_dt:
-                next_text = next_dt.get_text()
-                if 'Life Remaining' in next_text or 'vida restante' in next_text.lower():
-                    next_dd = next_dt.find_next_sibling('dd')
-                    if next_dd:
-                        match_pct = re.search(r'(\d+)%', next_dd.get_text())
-                        if match_pct:
-                            data['belt_unit']['percent'] = int(match_pct.group(1))
-        
-        # Extract Fuser Unit (only the first time we find it) (Spanish: Unidad de fusor)
-        elif ('Fuser Unit' == text or 'Unidad de fusor' == text) and not data['fuser_unit']:
-            match = re.search(r'(\d+)', value_text)
-            if match:
-                data['fuser_unit']['pages'] = int(match.group(1))
-            # Search for the percentage in the next element
-            next_dt = dt.find_next_sibling('dt')
-            if next_dt:
-                next_text = next_dt.get_text()
-                if 'Life Remaining' in next_text or 'vida restante' in next_text.lower():
-                    next_dd = next_dt.find_next_sibling('dd')
-                    if next_dd:
-                        match_pct = re.search(r'(\d+)%', next_dd.get_text())
-                        if match_pct:
-                            data['fuser_unit']['percent'] = int(match_pct.group(1))
-    
-    # Extract Total Pages Printed (Spanish: Total de páginas impresas)
-    # Search for the "Total Pages Printed" section that has the overall total
-    for h3 in soup.find_all('h3'):
-        h3_text = h3.get_text()
-        if 'Total Pages Printed' in h3_text or 'Total de páginas impresas' in h3_text:
-            # Search for the next dl with items_info_1line class
-            dl = h3.find_next('dl', class_='items_info_1line')
-            if dl:
-                found_total = False
-                # Search for the dt with "Total"
-                for dt in dl.find_all('dt'):
-                    text_dt = dt.get_text().strip()
-                    
-                    if text_dt == 'Total':
-                        dd = dt.find_next_sibling('dd')
-                        if dd:
-                            match = re.search(r'(\d+)', dd.get_text())
-                            if match:
-                                data['pages_printed']['total'] = int(match.group(1))
-                                found_total = True
-                    
-                    # Only extract Colour and B&W if we already found Total
-                    # and they are the first subheads after Total
-                    elif found_total and dt.get('class') and 'subhead' in dt.get('class'):
-                        span = dt.find('span')
-                        if span:
-                            span_text = span.get_text().strip()
-                            # Spanish: "Color" instead of "Colour", "ByN" instead of "B&W"
-                            if (span_text in ['Colour', 'Color']) and 'colour' not in data['pages_printed']:
-                                dd = dt.find_next_sibling('dd')
-                                if dd:
-                                    match = re.search(r'(\d+)', dd.get_text())
-                                    if match:
-                                        data['pages_printed']['colour'] = int(match.group(1))
-                            elif (span_text in ['B&W', 'ByN']) and 'bw' not in data['pages_printed']:
-                                dd = dt.find_next_sibling('dd')
-                                if dd:
-                                    match = re.search(r'(\d+)', dd.get_text())
-                                    if match:
-                                        data['pages_printed']['bw'] = int(match.group(1))
-                        
-                        # If we already have the three values, exit
-                        if len(data['pages_printed']) == 3:
-                            break
-                # We only need the first "Total Pages Printed" with the overall total
-                break
+        for name, entry in result['timings'].stages.items():
+            stages[name] = stages.get(name, 0.0) + entry['seconds']
+    if stages:
+        print("Time per stage (all printers): " +
+              ', '.join(f"{name} {seconds:.2f}s" for name, seconds in stages.items()))
+    skipped = sum(1 for result in results if result.get('skipped'))
+    print(f"Printers: {len(results) - len(failures)} ok, {len(failures) - skipped} failed, "
+          f"{skipped} skipped (circuit open)")
+    unknown_labels = set().union(*(result['unknown_labels'] for result in results))
+    if unknown_labels:
+        print(f"⚠ Unknown labels (add them to the label registry): {', '.join(sorted(unknown_labels))}")
+    print(f"Values: {sent} sent, {send_errors} errors" + (f", {totals['spooled']} spooled" if spool else ''))
+    print(f"Wall time: {wall_time:.2f}s (polling {poll_time:.2f}s)")
+    print(connection_pool.summary())
+    if session_cache:
+        print(session_cache.summary())
+    if state_store:
+        print(state_store.summary())
+    if breaker:
+        print(breaker.summary())
+        breaker.save()
+    if spool:
+        print(spool.summary())
+    print(f"{'='*60}")
     
-    return data
+    return not failures and send_errors == 0
 
-def send_to_zabbix(hostname, data, zabbix_server="127.0.0.1", zabbix_port=10051):
+class AdaptivePolling:
     """
-    Sends all printer data to Zabbix using zabbix_sender.
+    Per-printer poll intervals for the daemon (--adaptive) that follow how
+    fast each printer prints and uses its consumables.
     
-    Args:
-        hostname: Host name in Zabbix
-        data: Dictionary with all extracted data (toner, drum, belt, fuser)
-        zabbix_server: Zabbix server address
-        zabbix_port: Zabbix server port
-        
-    Returns:
-        bool: True if sending was successful, False otherwise
+    After every poll the page counter delta and the drop of the toner,
+    drum, belt and fuser levels since the previous poll give the activity
+    of the printer. Idle printers stretch their interval by 'growth' on
+    every poll up to max_interval; busy ones shrink it so that a poll sees
+    about target_pages pages or a target_drop point drop of a level. Below
+    low_level percent, the lowest consumable caps the interval, down to
+    min_interval as it reaches 0. Printers can override 'min_interval' and
+    'max_interval' in the inventory.
     """
-    try:
-        sent = 0
-        errors = 0
-        
-        # Mapping for Toner levels
-        if 'toner' in data:
-            print("\n📊 Sending Toner levels...")
-            for color, level in data['toner'].items():
-                item_key = f'{color}.toner.level'
-                cmd = [
-                    'zabbix_sender',
-                    '-z', zabbix_server,
-                    '-p', str(zabbix_port),
-                    '-s', hostname,
-                    '-k', item_key,
-                    '-o', str(level)
-                ]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    print(f"  ✓ Toner {color.capitalize()}: {level}%")
-                    sent += 1
-                else:
-                    print(f"  ✗ Error sending Toner {color}: {result.stderr}")
-                    errors += 1
-        
-        # Mapping for Drum Units
-        if 'drum' in data:
-            print("\n🥁 Sending Drum Unit levels...")
-            for color, level in data['drum'].items():
-                item_key = f'{color}.drum.level'
-                cmd = [
-                    'zabbix_sender',
-                    '-z', zabbix_server,
-                    '-p', str(zabbix_port),
-                    '-s', hostname,
-                    '-k', item_key,
-                    '-o', str(level)
-                ]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    print(f"  ✓ Drum {color.capitalize()}: {level}%")
-                    sent += 1
-                else:
-                    print(f"  ✗ Error sending Drum {color}: {result.stderr}")
-                    errors += 1
+    
+    def __init__(self, min_interval=60, max_interval=3600, low_level=10, target_pages=100, target_drop=1.0,
+                 growth=1.5):
+        """
+        Args:
+            min_interval: Shortest interval in seconds
+            max_interval: Longest interval in seconds
+            low_level: Level (%) below which a consumable shortens the interval
+            target_pages: Pages printed between two polls of a busy printer
+            target_drop: Level points (%) used between two polls of a busy printer
+            growth: Factor the interval of an idle printer grows by on every poll
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.low_level = low_level
+        self.target_pages = target_pages
+        self.target_drop = target_drop
+        self.growth = growth
+        self._state = {}
+        self._lock = threading.Lock()
+    
+    def interval(self, key, base):
+        """
+        Returns:
+            float: Current interval of a printer, base before its first poll
+        """
+        with self._lock:
+            state = self._state.get(key)
+        return state['interval'] if state else base
+    
+    def update(self, printer, result, base, now=None):
+        """
+        Computes the next interval of a printer from the result of a poll.
         
-        # Belt Unit
-        if 'belt_unit' in data and data['belt_unit']:
-            print("\n🔧 Sending Belt Unit data...")
-            
-            if 'pages' in data['belt_unit']:
-                cmd = [
-                    'zabbix_sender',
-                    '-z', zabbix_server,
-                    '-p', str(zabbix_port),
-                    '-s', hostname,
-                    '-k', 'brother.belt.pages',
-                    '-o', str(data['belt_unit']['pages'])
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0:
-                    print(f"  ✓ Belt Unit pages: {data['belt_unit']['pages']}")
-                    sent += 1
-                else:
-                    print(f"  ✗ Error sending Belt Unit pages: {result.stderr}")
-                    errors += 1
+        Args:
+            printer: Printer dictionary from the inventory
+            result: Dictionary returned by poll_printer (data is a PrinterReading)
+            base: Configured interval of the printer
+            now: Time of the poll (default: now)
             
-            if 'percent' in data['belt_unit']:
-                cmd = [
-                    'zabbix_sender',
-                    '-z', zabbix_server,
-                    '-p', str(zabbix_port),
-                    '-s', hostname,
-                    '-k', 'brother.belt.percent',
-                    '-o', str(data['belt_unit']['percent'])
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0:
-                    print(f"  ✓ Belt Unit remaining life: {data['belt_unit']['percent']}%")
-                    sent += 1
-                else:
-                    print(f"  ✗ Error sending Belt Unit percentage: {result.stderr}")
-                    errors += 1
+        Returns:
+            tuple: (interval in seconds, reason)
+        """
+        now = time.time() if now is None else now
+        key = printer['zabbix_hostname']
+        lowest_allowed = float(printer.get('min_interval', self.min_interval))
+        highest_allowed = float(printer.get('max_interval', self.max_interval))
+        with self._lock:
+            state = self._state.get(key)
+        previous = state['interval'] if state else base
+        reading = result['data']
         
-        # Fuser Unit
-        if 'fuser_unit' in data and data['fuser_unit']:
-            print("\n🔥 Sending Fuser Unit data...")
-            
-            if 'pages' in data['fuser_unit']:
-                cmd = [
-                    'zabbix_sender',
-                    '-z', zabbix_server,
-                    '-p', str(zabbix_port),
-                    '-s', hostname,
-                    '-k', 'brother.fuser.pages',
-                    '-o', str(data['fuser_unit']['pages'])
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0:
-                    print(f"  ✓ Fuser Unit pages: {data['fuser_unit']['pages']}")
-                    sent += 1
+        if reading is None:
+            # Failures are the circuit breaker's business, just don't wait longer than usual
+            interval, reason = min(previous, base), 'poll failed'
+            if state is None:
+                # Nothing stored, so the next successful poll is still the first one
+                return min(max(interval, lowest_allowed), highest_allowed), reason
+            levels, pages, clock = state['levels'], state['pages'], state['clock']
+        else:
+            levels = {field.key: value for field, value in reading.flatten()
+                      if field.metric in ('toner', 'drum') or field.name == 'percent'}
+            pages = reading.pages_printed_total
+            clock = now
+            if state is None:
+                interval, reason = base, 'first poll'
+            else:
+                elapsed = max(now - state['clock'], 1.0)
+                printed = pages - state['pages'] if pages is not None and state['pages'] is not None else None
+                if printed is not None and printed < 0:
+                    # Counter reset (board replaced)
+                    printed = None
+                drop = max([state['levels'][name] - level for name, level in levels.items()
+                            if name in state['levels']] + [0])
+                if not printed and drop <= 0:
+                    interval, reason = previous * self.growth, 'idle'
                 else:
-                    print(f"  ✗ Error sending Fuser Unit pages: {result.stderr}")
-                    errors += 1
+                    candidates = []
+                    if printed:
+                        candidates.append(elapsed * self.target_pages / printed)
+                    if drop > 0:
+                        candidates.append(elapsed * self.target_drop / drop)
+                    interval = min(min(candidates), previous * self.growth)
+                    activity = ([f"{printed} pages"] if printed else []) + ([f"-{drop}%"] if drop > 0 else [])
+                    reason = f"busy ({', '.join(activity)} in {elapsed:.0f}s)"
             
-            if 'percent' in data['fuser_unit']:
-                cmd = [
-                    'zabbix_sender',
-                    '-z', zabbix_server,
-                    '-p', str(zabbix_port),
-                    '-s', hostname,
-                    '-k', 'brother.fuser.percent',
-                    '-o', str(data['fuser_unit']['percent'])
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0:
-                    print(f"  ✓ Fuser Unit remaining life: {data['fuser_unit']['percent']}%")
-                    sent += 1
-                else:
-                    print(f"  ✗ Error sending Fuser Unit percentage: {result.stderr}")
-                    errors += 1
+            if levels:
+                name, level = min(levels.items(), key=lambda entry: entry[1])
+                if level < self.low_level:
+                    cap = lowest_allowed + (base - lowest_allowed) * level / self.low_level
+                    if cap < interval:
+                        interval, reason = cap, f"{name} at {level}%"
         
-        # Pages printed
-        if 'pages_printed' in data and data['pages_printed']:
-            print("\n📄 Sending printed pages data...")
-            
-            if 'total' in data['pages_printed']:
-                cmd = [
-                    'zabbix_sender',
-                    '-z', zabbix_server,
-                    '-p', str(zabbix_port),
-                    '-s', hostname,
-                    '-k', 'brother.pages.total',
-                    '-o', str(data['pages_printed']['total'])
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0:
-                    print(f"  ✓ Total pages: {data['pages_printed']['total']}")
-                    sent += 1
-                else:
-                    print(f"  ✗ Error sending total pages: {result.stderr}")
-                    errors += 1
-            
-            if 'colour' in data['pages_printed']:
-                cmd = [
-                    'zabbix_sender',
-                    '-z', zabbix_server,
-                    '-p', str(zabbix_port),
-                    '-s', hostname,
-                    '-k', 'brother.pages.colour',
-                    '-o', str(data['pages_printed']['colour'])
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0:
-                    print(f"  ✓ Colour pages: {data['pages_printed']['colour']}")
-                    sent += 1
-                else:
-                    print(f"  ✗ Error sending colour pages: {result.stderr}")
-                    errors += 1
+        interval = min(max(interval, lowest_allowed), highest_allowed)
+        with self._lock:
+            self._state[key] = {'clock': clock, 'levels': levels, 'pages': pages, 'interval': interval, 'base': base}
+        return interval, reason
+    
+    def forget(self, key):
+        """Drops the state of a printer removed from the inventory."""
+        with self._lock:
+            self._state.pop(key, None)
+    
+    def summary(self):
+        """
+        Returns:
+            str: Human readable distribution of the current intervals
+        """
+        with self._lock:
+            states = list(self._state.values())
+        if not states:
+            return "Adaptive polling: no printer polled yet"
+        intervals = sorted(state['interval'] for state in states)
+        # Polls per unit of time compared with every printer at its configured interval
+        polls = sum(1 / state['interval'] for state in states) / sum(1 / state['base'] for state in states) * 100
+        return (f"Adaptive polling: intervals min {intervals[0]:.0f}s, median {intervals[len(intervals) // 2]:.0f}s, "
+                f"max {intervals[-1]:.0f}s ({polls:.0f}% of the polls at the configured intervals)")
+
+class PrinterScheduler:
+    """
+    Long-running poller for fleet mode (--daemon).
+    
+    Each printer is scheduled on its own interval with some jitter in a
+    priority queue, keeping its session and connections (ConnectionPool)
+    between polls. At most
+    'workers' printers are polled at the same time and every result is
+    handed to the outputs (ZabbixOutput, PrometheusOutput), which are
+    flushed every send_interval seconds. A CircuitBreaker skips the printers
+    that keep failing until their cool-down ends. SIGHUP reloads the
+    inventory and SIGTERM/SIGINT stop the daemon after the in-flight polls
+    finish and the outputs are flushed.
+    """
+    
+    def __init__(self, inventory_path, outputs, workers=20, timeout=30, default_password=None, session_cache=None,
+                 extractor='bs4', interval=300, jitter=0.1, send_interval=10, source='html', snmp_community='public',
+                 policy=None, breaker=None, connection_pool=None, archive_dir=None, adaptive=None):
+        """
+        Args:
+            inventory_path: Inventory file (see load_inventory); printers can
+                            override 'interval' and 'priority' (lower first)
+            outputs: List of output backends receiving the poll results
+            workers: Maximum number of printers polled at the same time
+            timeout: Default timeout in seconds for each HTTP request
+            default_password: Password for printers without their own credential
+            session_cache: SessionCache to reuse the cookies of previous logins
+            extractor: Name of the extractor in EXTRACTORS ('bs4' or 'fast')
+            interval: Default seconds between two polls of a printer
+            jitter: Random fraction added to or removed from every interval
+            send_interval: Seconds between two flushes of the outputs
+            source: Default source of the printer data (see poll_printer)
+            snmp_community: Default SNMP community
+            policy: RetryPolicy with the timeouts, retries and deadline of every poll
+            breaker: CircuitBreaker for the printers that keep failing, or None
+            connection_pool: ConnectionPool with the printer sessions (a new one if None)
+            archive_dir: Folder where the downloaded pages are archived, or None
+            adaptive: AdaptivePolling that sets the interval of every printer
+                      after each poll, or None for fixed intervals
+        """
+        self.inventory_path = inventory_path
+        self.outputs = outputs
+        self.workers = workers
+        self.timeout = timeout
+        self.default_password = default_password
+        self.session_cache = session_cache
+        self.extractor = extractor
+        self.interval = interval
+        self.jitter = jitter
+        self.send_interval = send_interval
+        self.source = source
+        self.snmp_community = snmp_community
+        self.policy = policy
+        self.breaker = breaker
+        self.connection_pool = connection_pool if connection_pool is not None else ConnectionPool()
+        self.archive_dir = archive_dir
+        self.adaptive = adaptive
+        self.snmp_only = SnmpOnlyPrinters()
+        
+        self.printers = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        # Sequence number of the only valid queue entry of each printer
+        self._scheduled = {}
+        self._in_flight = set()
+        self._rescheduled = collections.deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = False
+        self._reload = False
+    
+    def _printer_interval(self, printer):
+        return float(printer.get('interval', self.interval))
+    
+    def _schedule(self, key, delay):
+        printer = self.printers[key]
+        sequence = next(self._sequence)
+        self._scheduled[key] = sequence
+        heapq.heappush(self._queue, (time.monotonic() + delay, int(printer.get('priority', 0)), sequence, key))
+    
+    def _pop_due(self, now):
+        """
+        Pops the next printer whose poll is due, skipping the entries
+        replaced by a later _schedule or left by removed printers.
+        
+        Returns:
+            str: Key of the printer or None if no poll is due
+        """
+        while self._queue and self._queue[0][0] <= now:
+            _, _, sequence, key = heapq.heappop(self._queue)
+            if self._scheduled.get(key) == sequence:
+                del self._scheduled[key]
+                return key
+        return None
+    
+    def _next_delay(self, printer):
+        interval = self._printer_interval(printer)
+        if self.adaptive:
+            interval = self.adaptive.interval(printer['zabbix_hostname'], interval)
+        return max(1.0, interval * (1 + random.uniform(-self.jitter, self.jitter)))
+    
+    def load(self):
+        """
+        (Re)loads the inventory. New printers are scheduled at a random
+        point of their first interval so they don't all start together,
+        removed printers are dropped and their sessions closed.
+        
+        Returns:
+            bool: True if the inventory was loaded
+        """
+        try:
+            printers = {printer['zabbix_hostname']: printer for printer in load_inventory(self.inventory_path)}
+        except (OSError, ValueError) as e:
+            print(f"✗ Could not load inventory, keeping the previous one: {e}")
+            return False
+        
+        added = [key for key in printers if key not in self.printers]
+        removed = [key for key in self.printers if key not in printers]
+        for key in removed:
+            self._scheduled.pop(key, None)
+            self.connection_pool.close(key)
+            self.snmp_only.discard(self.printers[key]['url'])
+            if self.adaptive:
+                self.adaptive.forget(key)
+        self.printers = printers
+        for key in added:
+            self._schedule(key, random.uniform(0, self._printer_interval(printers[key])))
+        
+        print(f"Inventory loaded: {len(printers)} printers ({len(added)} added, {len(removed)} removed)")
+        return True
+    
+    def _poll(self, key, printer):
+        try:
+            result = poll_pooled(printer, self.connection_pool, self.breaker, self.default_password, self.timeout,
+                                 self.session_cache, self.extractor, source=self.source,
+                                 snmp_community=self.snmp_community, policy=self.policy,
+                                 archive_dir=self.archive_dir, snmp_only=self.snmp_only)
             
-            if 'bw' in data['pages_printed']:
-                cmd = [
-                    'zabbix_sender',
-                    '-z', zabbix_server,
-                    '-p', str(zabbix_port),
-                    '-s', hostname,
-                    '-k', 'brother.pages.bw',
-                    '-o', str(data['pages_printed']['bw'])
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0:
-                    print(f"  ✓ B&W pages: {data['pages_printed']['bw']}")
-                    sent += 1
-                else:
-                    print(f"  ✗ Error sending B&W pages: {result.stderr}")
-                    errors += 1
+            next_poll = ''
+            if self.adaptive:
+                result['interval'], reason = self.adaptive.update(printer, result, self._printer_interval(printer))
+                next_poll = f", next in {result['interval']:.0f}s ({reason})"
+            if result['skipped']:
+                print(f"  ⏸ {key}: circuit open, not polled{next_poll}")
+            elif result['error']:
+                print(f"  ✗ {key}: {result['error']} ({result['latency']:.2f}s){next_poll}")
+            else:
+                print(f"  ✓ {key}: {result['latency']:.2f}s{next_poll}")
+            for output in self.outputs:
+                output.add(result)
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+                if self.adaptive:
+                    # The next poll is scheduled from the main loop once the interval is known
+                    self._rescheduled.append(key)
+            self._wakeup.set()
+    
+    def flush(self):
+        """Flushes every output (sends the pending values to Zabbix)."""
+        for output in self.outputs:
+            output.flush()
+    
+    def _handle_signal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self._reload = True
+        else:
+            self._stop = True
+        self._wakeup.set()
+    
+    def run(self):
+        """
+        Polls the printers until SIGTERM or SIGINT.
         
-        print(f"\n{'='*60}")
-        print(f"Summary: {sent} values sent successfully, {errors} errors")
-        print(f"{'='*60}")
+        Returns:
+            bool: False if the inventory couldn't be loaded
+        """
+        import concurrent.futures
         
-        return errors == 0
+        if not self.load():
+            return False
         
-    except FileNotFoundError:
-        print("Error: zabbix_sender is not installed or not in PATH")
-        print("Install it with: sudo apt-get install zabbix-sender")
-        return False
-    except Exception as e:
-        print(f"Error sending data to Zabbix: {e}")
-        return False
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._handle_signal)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self._handle_signal)
+        
+        print(f"Daemon started: {len(self.printers)} printers, max {self.workers} in flight")
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        next_send = time.monotonic() + self.send_interval
+        
+        try:
+            while not self._stop:
+                # Cleared before looking at the queue: a poll finishing from
+                # here on sets it again and the wait below returns at once
+                self._wakeup.clear()
+                if self._reload:
+                    self._reload = False
+                    print("SIGHUP received, reloading inventory...")
+                    self.load()
+                
+                while self._rescheduled:
+                    key = self._rescheduled.popleft()
+                    if key in self.printers:
+                        self._schedule(key, self._next_delay(self.printers[key]))
+                
+                now = time.monotonic()
+                while len(self._in_flight) < self.workers:
+                    key = self._pop_due(now)
+                    if key is None:
+                        break
+                    printer = self.printers[key]
+                    if not self.adaptive:
+                        self._schedule(key, self._next_delay(printer))
+                    if key in self._in_flight:
+                        # Still polling the previous round, skip this one
+                        continue
+                    with self._lock:
+                        self._in_flight.add(key)
+                    executor.submit(self._poll, key, printer)
+                
+                if now >= next_send:
+                    self.flush()
+                    next_send = now + self.send_interval
+                
+                wait = next_send - now
+                if self._queue and len(self._in_flight) < self.workers:
+                    wait = min(wait, self._queue[0][0] - now)
+                self._wakeup.wait(max(0.0, wait))
+        finally:
+            print("Stopping daemon, waiting for the polls in flight...")
+            executor.shutdown(wait=True)
+            for output in self.outputs:
+                output.close()
+            self.connection_pool.close()
+            print(self.connection_pool.summary())
+            if self.session_cache:
+                print(self.session_cache.summary())
+            if self.breaker:
+                print(self.breaker.summary())
+                self.breaker.save()
+            if self.adaptive:
+                print(self.adaptive.summary())
+            print("Daemon stopped")
+        return True
 
-def login_y_descargar_html(url_base, contrasena, ruta_destino="pagina_descargada.html"):
+# Name of the archived snapshots: UTC time of the download
+SNAPSHOT_TIME_FORMAT = '%Y%m%dT%H%M%SZ'
+
+def archive_snapshot(archive_dir, hostname, html_content, clock=None):
     """
-    Logs into a website and downloads the HTML from a page.
+    Keeps a downloaded information page as archive_dir/<hostname>/<UTC time>.html.gz
+    so it can be parsed again later (see run_backfill).
     
     Args:
-        url_base: Base URL of the website
-        contrasena: Password to login
-        ruta_destino: Path where the downloaded HTML will be saved
+        archive_dir: Archive folder
+        hostname: Host name in Zabbix of the printer
+        html_content: Downloaded page
+        clock: Time of the download (default: now)
         
     Returns:
-        str: Downloaded HTML content or None if there's an error
+        str: Path of the snapshot
     """
-    # Create a session to maintain cookies
-    session = requests.Session()
-
-    # Disable SSL verification (printer uses self-signed certificate)
-    import urllib3
-    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    import gzip
     
-    # Form data for login
-    login_data = {
-        "B1891": contrasena,
-        "loginurl": "/general/information.html?kind=item",
-        "pageid": "1"
-    }
+    clock = time.time() if clock is None else clock
+    directory = os.path.join(archive_dir, hostname.replace(os.sep, '_'))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, time.strftime(SNAPSHOT_TIME_FORMAT, time.gmtime(clock)) + '.html.gz')
+    with gzip.open(path, 'wt', encoding='utf-8') as file:
+        file.write(html_content)
+    return path
 
-    # URL for login
-    login_url = f"{url_base}/home/status.html"
+def find_snapshots(archive_dir):
+    """
+    Lists the snapshots of an archive written by archive_snapshot.
+    
+    Args:
+        archive_dir: Archive folder
+        
+    Returns:
+        list: (hostname, clock, path) tuples sorted by printer and time; files
+              whose name isn't a snapshot time use their modification time
+    """
+    import calendar
+    
+    snapshots = []
+    for hostname in sorted(os.listdir(archive_dir)):
+        directory = os.path.join(archive_dir, hostname)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if not name.endswith(('.html', '.html.gz')):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                clock = calendar.timegm(time.strptime(name.split('.')[0], SNAPSHOT_TIME_FORMAT))
+            except ValueError:
+                clock = int(os.path.getmtime(path))
+            snapshots.append((hostname, clock, path))
+    snapshots.sort()
+    return snapshots
 
+def _parse_snapshot(task):
+    """
+    Parses one archived snapshot (runs in the backfill worker processes).
+    
+    Args:
+        task: (hostname, clock, path, extractor, model_family) tuple
+        
+    Returns:
+        tuple: (hostname, clock, {item key: value} or None, unknown labels, error)
+    """
+    import gzip
+    
+    hostname, clock, path, extractor, model_family = task
     try:
-        # First, GET the login page to get the CSRF token and session cookie
-        print("Attempting to login...")
-        response_get = session.get(login_url, verify=False)
-        response_get.raise_for_status()
-
-        # Extract CSRF token if present
-        soup = BeautifulSoup(response_get.text, 'html.parser')
-        csrf_input = soup.find('input', id='CSRFToken')
-        if csrf_input:
-            login_data['CSRFToken'] = csrf_input.get('value', '')
-
-        # Perform the login POST
-        response_login = session.post(login_url, data=login_data, verify=False, allow_redirects=True)
-        response_login.raise_for_status()
-
-        # Verify if login was successful (check both English and Spanish)
-        if "Please Login" in response_login.text or "Iniciar sesión" in response_login.text or "Please login" in response_login.text:
-            print("Error: Could not login. Check the password.")
-            return None
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', errors='replace') as file:
+            html_content = file.read()
+        unknown_labels = set()
+        data = EXTRACTORS[extractor](html_content, model_family, unknown_labels)
+    except (OSError, EOFError) as e:
+        return hostname, clock, None, set(), str(e)
+    if not any(data.values()):
+        return hostname, clock, None, unknown_labels, "No data found in the page"
+    values = {field.key: str(value) for field, value in PrinterReading.from_dict(data).flatten()}
+    return hostname, clock, values, unknown_labels, None
 
-        print("Login successful")
+def write_history(path, rows):
+    """
+    Writes the history of a printer as a CSV file with a 'clock' column
+    (Unix time) and one column per item key, oldest row first.
+    
+    Args:
+        path: CSV file
+        rows: List of (clock, {item key: value}) tuples
+    """
+    import csv
+    
+    columns = {}
+    for _, values in rows:
+        columns.update(dict.fromkeys(values))
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['clock', *columns])
+        for clock, values in sorted(rows, key=lambda row: row[0]):
+            writer.writerow([clock, *(values.get(key, '') for key in columns)])
 
-        # The POST response already contains the target page after redirect
-        # But if not, fetch the information page explicitly
-        html_content = response_login.text
+def run_backfill(archive_dir, output_dir, workers=None, extractor='bs4', model_family=None, labels=None):
+    """
+    Parses every snapshot of the archive across a process pool and writes
+    one history CSV per printer (see write_history).
+    
+    Args:
+        archive_dir: Archive folder written by archive_snapshot
+        output_dir: Folder where the <hostname>.csv files are written
+        workers: Worker processes (default: one per CPU)
+        extractor: Name of the extractor in EXTRACTORS ('bs4' or 'fast')
+        model_family: Printer model family whose specific labels should be used
+        labels: JSON file with extra label languages or model families
+        
+    Returns:
+        list: Paths of the history files written
+    """
+    import concurrent.futures
+    
+    snapshots = find_snapshots(archive_dir)
+    tasks = [(hostname, clock, path, extractor, model_family) for hostname, clock, path in snapshots]
+    print(f"Parsing {len(tasks)} snapshots of {len({task[0] for task in tasks})} printers...")
+    
+    start = time.monotonic()
+    histories = {}
+    failed = 0
+    unknown_labels = set()
+    # The workers load the extra labels themselves when they are spawned instead of forked
+    initializer, initargs = (load_label_file, (labels,)) if labels else (None, ())
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=initializer, initargs=initargs) as executor:
+        for hostname, clock, values, labels_found, error in executor.map(_parse_snapshot, tasks, chunksize=64):
+            unknown_labels |= labels_found
+            if values is None:
+                failed += 1
+                print(f"  ✗ {hostname} {time.strftime(SNAPSHOT_TIME_FORMAT, time.gmtime(clock))}: {error}")
+                continue
+            histories.setdefault(hostname, []).append((clock, values))
+    
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for hostname, rows in histories.items():
+        path = os.path.join(output_dir, f"{hostname}.csv")
+        write_history(path, rows)
+        paths.append(path)
+    
+    elapsed = time.monotonic() - start
+    print(f"✓ {len(tasks) - failed} snapshots parsed ({failed} failed) in {elapsed:.2f}s "
+          f"({len(tasks) / elapsed if elapsed else 0:.0f} pages/s), {len(paths)} history files in '{output_dir}'")
+    if unknown_labels:
+        print(f"⚠ Unknown labels (add them to the label registry): {', '.join(sorted(unknown_labels))}")
+    return paths
 
-        # If the POST didn't redirect to the info page, fetch it directly
-        if "Toner" not in html_content and "Tóner" not in html_content and "toner" not in html_content.lower():
-            target_url = f"{url_base}/general/information.html?kind=item"
-            print(f"Downloading content from {target_url}...")
-            response_download = session.get(target_url, verify=False)
-            response_download.raise_for_status()
-            html_content = response_download.text
+def import_history(paths, zabbix_server, zabbix_port=10051, sender='auto', batch_size=SPOOL_REPLAY_BATCH_SIZE):
+    """
+    Sends history CSV files (see write_history) to Zabbix with the clock of
+    every row, in batches of batch_size values. The host name is the name
+    of the file.
+    
+    Args:
+        paths: History CSV files
+        zabbix_server: Zabbix server address
+        zabbix_port: Zabbix server port
+        sender: 'native', 'binary' or 'auto' (see send_items_to_zabbix)
+        batch_size: Values per batch
+        
+    Returns:
+        dict: Total 'processed' and 'failed' values
+    """
+    import csv
+    
+    totals = {'processed': 0, 'failed': 0}
+    
+    def send(batch):
+        # One request per batch: send_items_to_zabbix would split it again in ZABBIX_BATCH_SIZE values
+        counters = _send_batch(batch, zabbix_server, zabbix_port, sender)
+        totals['processed'] += counters['processed']
+        totals['failed'] += counters['failed']
+    
+    for path in paths:
+        hostname = os.path.splitext(os.path.basename(path))[0]
+        print(f"\n📊 Importing '{path}' as {hostname} to {zabbix_server}:{zabbix_port}...")
+        batch = []
+        with open(path, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                clock = int(row.pop('clock'))
+                for key, value in row.items():
+                    if value == '':
+                        continue
+                    # A row can be split between two batches, none goes over batch_size
+                    batch.append({'host': hostname, 'key': key, 'value': value, 'clock': clock})
+                    if len(batch) >= batch_size:
+                        send(batch)
+                        batch = []
+        if batch:
+            send(batch)
+        print(f"  {totals['processed']} processed, {totals['failed']} errors so far")
+    return totals
 
-        # Save the downloaded HTML to a file
-        with open(ruta_destino, "w", encoding="utf-8") as file:
-            file.write(html_content)
+def print_printer_data(datos):
+    """
+    Shows the extracted data.
+    
+    Args:
+        datos: Dictionary with all extracted data (toner, drum, belt, fuser)
+    """
+    print("\n📊 EXTRACTED DATA:")
+    print("="*60)
+    
+    if datos['toner']:
+        print("\n🖨️  Toner Levels:")
+        for color, nivel in datos['toner'].items():
+            print(f"  - {color.capitalize()}: {nivel}%")
+    
+    if datos['drum']:
+        print("\n🥁 Drum Units:")
+        for color, nivel in datos['drum'].items():
+            print(f"  - {color.capitalize()}: {nivel}%")
+    
+    if datos['belt_unit']:
+        print("\n🔧 Belt Unit:")
+        if 'pages' in datos['belt_unit']:
+            print(f"  - Remaining pages: {datos['belt_unit']['pages']}")
+        if 'percent' in datos['belt_unit']:
+            print(f"  - Remaining life: {datos['belt_unit']['percent']}%")
+    
+    if datos['fuser_unit']:
+        print("\n🔥 Fuser Unit:")
+        if 'pages' in datos['fuser_unit']:
+            print(f"  - Remaining pages: {datos['fuser_unit']['pages']}")
+        if 'percent' in datos['fuser_unit']:
+            print(f"  - Remaining life: {datos['fuser_unit']['percent']}%")
+    
+    if datos['pages_printed']:
+        print("\n📄 Printed Pages:")
+        if 'total' in datos['pages_printed']:
+            print(f"  - Total: {datos['pages_printed']['total']} pages")
+        if 'colour' in datos['pages_printed']:
+            print(f"  - Colour: {datos['pages_printed']['colour']} pages")
+        if 'bw' in datos['pages_printed']:
+            print(f"  - B&W: {datos['pages_printed']['bw']} pages")
 
-        print(f"HTML downloaded and saved to '{ruta_destino}'")
-        return html_content
+SUBCOMMANDS = ('fetch', 'parse', 'send', 'backfill', 'import')
+
+def run_subcommand(argv):
+    """
+    Runs a single stage of the poll, loading only the modules it needs:
     
-    except requests.exceptions.RequestException as e:
-        print(f"Error during HTTP request: {e}")
-        return None
+        fetch: downloads the information page (HTML to a file or stdout)
+        parse: extracts the data of a saved page and prints it as JSON
+        send:  reads that JSON from stdin and sends it to Zabbix
+        backfill: parses the archived pages (--archive-dir) into history CSVs
+        import: sends those history CSVs to Zabbix with their original clock
+    
+    e.g. brother.py fetch --url ... | brother.py parse --parser fast | brother.py send ...
+    
+    Args:
+        argv: Command line arguments starting with the subcommand
+        
+    Returns:
+        int: Exit code
+    """
+    parser = argparse.ArgumentParser(prog='brother.py', description='Run a single stage of the Brother printer poll')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    fetch = commands.add_parser('fetch', help='Download the printer information page')
+    fetch.add_argument('--url', required=True, help='Brother printer URL (e.g.: http://172.23.36.16)')
+    fetch.add_argument('--password', required=True, help='Printer password')
+    fetch.add_argument('--output', default='-', help='File where to save the HTML (default: stdout)')
+    fetch.add_argument('--timeout', type=float, default=30, help='Timeout in seconds for each HTTP request (default: 30)')
+    fetch.add_argument('--session-cache', help='Folder where printer session cookies are cached between runs')
+    fetch.add_argument('--session-ttl', type=int, default=600, help='Maximum age in seconds of a cached session (default: 600)')
+    
+    parse = commands.add_parser('parse', help='Extract the data of a saved page and print it as JSON')
+    parse.add_argument('html', nargs='?', default='-', help='HTML file (default: stdin)')
+    parse.add_argument('--parser', choices=sorted(EXTRACTORS), default='bs4', help='HTML extractor (default: bs4, use fast to avoid loading BeautifulSoup)')
+    parse.add_argument('--labels', help='JSON file with extra label languages or model families')
+    parse.add_argument('--model-family', help='Printer model family whose specific labels should be used')
+    
+    send = commands.add_parser('send', help='Send the JSON printed by parse (read from stdin) to Zabbix')
+    send.add_argument('--zabbix-server', required=True, help='Zabbix server IP (e.g.: 172.23.36.6)')
+    send.add_argument('--zabbix-port', type=int, default=10051, help='Zabbix server port (default: 10051)')
+    send.add_argument('--zabbix-hostname', required=True, help='Hostname of the host in Zabbix (e.g.: imp-secretaria)')
+    send.add_argument('--sender', choices=['auto', 'native', 'binary'], default='auto', help='How to send values (default: auto)')
+    send.add_argument('--zabbix-mode', choices=['items', 'json'], default='items', help='One trapper item per value or a single JSON master item (default: items)')
+    send.add_argument('--delta', action='store_true', help='Send only the values that changed since the last send')
+    send.add_argument('--state-file', default='brother_state.db', help='Delta mode: SQLite file with the last values sent')
+    send.add_argument('--heartbeat', type=float, default=60, help='Delta mode: minutes after which unchanged values are sent again')
+    send.add_argument('--spool', metavar='FILE', help='Keep the values in FILE while Zabbix is unreachable and replay them later')
+    
+    backfill = commands.add_parser('backfill', help='Parse the archived pages in parallel into one history CSV per printer')
+    backfill.add_argument('archive', help='Archive folder written with --archive-dir')
+    backfill.add_argument('--output-dir', default='history', help='Folder for the <hostname>.csv files (default: history)')
+    backfill.add_argument('--workers', type=int, help='Worker processes (default: one per CPU)')
+    backfill.add_argument('--parser', choices=sorted(EXTRACTORS), default='fast', help='HTML extractor (default: fast)')
+    backfill.add_argument('--labels', help='JSON file with extra label languages or model families')
+    backfill.add_argument('--model-family', help='Printer model family whose specific labels should be used')
+    
+    history = commands.add_parser('import', help='Send history CSV files to Zabbix with the time of every row')
+    history.add_argument('csv', nargs='+', help='History CSV files written by backfill (the file name is the Zabbix host)')
+    history.add_argument('--zabbix-server', required=True, help='Zabbix server IP (e.g.: 172.23.36.6)')
+    history.add_argument('--zabbix-port', type=int, default=10051, help='Zabbix server port (default: 10051)')
+    history.add_argument('--sender', choices=['auto', 'native', 'binary'], default='auto', help='How to send values (default: auto)')
+    history.add_argument('--batch-size', type=int, default=SPOOL_REPLAY_BATCH_SIZE, help=f'Values per batch (default: {SPOOL_REPLAY_BATCH_SIZE})')
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == 'fetch':
+        session_cache = SessionCache(args.session_cache, args.session_ttl) if args.session_cache else None
+        # Progress messages go to stderr so stdout only has the HTML
+        with contextlib.redirect_stdout(sys.stderr):
+            html_content = login_y_descargar_html(args.url, args.password, None, timeout=args.timeout,
+                                                  session_cache=session_cache)
+        if not html_content:
+            return 1
+        if args.output == '-':
+            sys.stdout.write(html_content)
+        else:
+            with open(args.output, 'w', encoding='utf-8') as file:
+                file.write(html_content)
+        return 0
+    
+    if args.command == 'parse':
+        if args.labels:
+            load_label_file(args.labels)
+        if args.html == '-':
+            html_content = sys.stdin.read()
+        else:
+            with open(args.html, encoding='utf-8', errors='replace') as file:
+                html_content = file.read()
+        unknown_labels = set()
+        data = EXTRACTORS[args.parser](html_content, args.model_family, unknown_labels)
+        if unknown_labels:
+            print(f"⚠ Unknown labels: {', '.join(sorted(unknown_labels))}", file=sys.stderr)
+        json.dump(data, sys.stdout, ensure_ascii=False)
+        sys.stdout.write('\n')
+        return 0 if any(data.values()) else 1
+    
+    if args.command == 'backfill':
+        if args.labels:
+            load_label_file(args.labels)
+        paths = run_backfill(args.archive, args.output_dir, args.workers, args.parser, args.model_family, args.labels)
+        return 0 if paths else 1
+    
+    if args.command == 'import':
+        try:
+            totals = import_history(args.csv, args.zabbix_server, args.zabbix_port, args.sender, args.batch_size)
+        except FileNotFoundError:
+            print("Error: zabbix_sender is not installed or not in PATH")
+            return 1
+        print(f"\n✓ {totals['processed']} values imported, {totals['failed']} errors")
+        return 0 if totals['failed'] == 0 else 1
+    
+    # send
+    try:
+        data = json.load(sys.stdin)
+    except ValueError as e:
+        print(f"Error: invalid JSON on stdin: {e}", file=sys.stderr)
+        return 1
+    state_store = StateStore(args.state_file, args.heartbeat * 60) if args.delta else None
+    spool = Spool(args.spool) if args.spool else None
+    ok = send_to_zabbix(args.zabbix_hostname, data, args.zabbix_server, args.zabbix_port, args.sender, state_store,
+                        args.zabbix_mode, spool=spool)
+    return 0 if ok else 1
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        sys.exit(run_subcommand(sys.argv[1:]))
+    
     # Configure argument parser
     parser = argparse.ArgumentParser(description='Script to extract Brother printer data and send it to Zabbix')
-    parser.add_argument('--url', required=True, help='Brother printer URL (e.g.: http://172.23.36.16)')
-    parser.add_argument('--password', required=True, help='Printer password')
-    parser.add_argument('--zabbix-server', required=True, help='Zabbix server IP (e.g.: 172.23.36.6)')
+    parser.add_argument('--url', help='Brother printer URL (e.g.: http://172.23.36.16)')
+    parser.add_argument('--password', help='Printer password (default password in fleet mode)')
+    parser.add_argument('--zabbix-server', help='Zabbix server IP (e.g.: 172.23.36.6)')
     parser.add_argument('--zabbix-port', type=int, default=10051, help='Zabbix server port (default: 10051)')
-    parser.add_argument('--zabbix-hostname', required=True, help='Hostname of the host in Zabbix (e.g.: imp-secretaria)')
-    parser.add_argument('--output', default='pagina_descargada.html', help='File where to save the downloaded HTML (default: pagina_descargada.html)')
+    parser.add_argument('--zabbix-hostname', help='Hostname of the host in Zabbix (e.g.: imp-secretaria)')
+    parser.add_argument('--output', help='Keep the downloaded HTML in this file for debugging (default: not saved; without it --parser fast streams the page)')
+    parser.add_argument('--archive-dir', help='Keep every downloaded page as <dir>/<hostname>/<UTC time>.html.gz for the backfill subcommand')
+    parser.add_argument('--zabbix-mode', choices=['items', 'json'], default='items', help='One trapper item per value or a single JSON master item for dependent items and LLD (default: items)')
+    parser.add_argument('--export-template', metavar='FILE', help='Write the Zabbix template for --zabbix-mode json to FILE (- for stdout) and exit')
+    parser.add_argument('--delta', action='store_true', help='Send only the values that changed since the last send (plus the heartbeat)')
+    parser.add_argument('--state-file', default='brother_state.db', help='Delta mode: SQLite file with the last values sent (default: brother_state.db)')
+    parser.add_argument('--heartbeat', type=float, default=60, help='Delta mode: minutes after which unchanged values are sent again (default: 60)')
+    parser.add_argument('--spool', metavar='FILE', help='Keep the values in FILE while Zabbix is unreachable and replay them with their original time when it answers')
+    parser.add_argument('--spool-max-mb', type=float, default=50, help='Maximum size of the spool file in MB, the oldest values are dropped (default: 50)')
+    parser.add_argument('--spool-max-age', type=float, default=168, help='Hours after which spooled values are dropped (default: 168)')
+    parser.add_argument('--sender', choices=['auto', 'native', 'binary'], default='auto', help='How to send values: native sender protocol, zabbix_sender binary, or native with binary fallback (default: auto)')
+    parser.add_argument('--inventory', help='Fleet mode: JSON/YAML/CSV file with the printers to poll concurrently')
+    parser.add_argument('--workers', type=int, default=20, help='Fleet mode: maximum printers polled at the same time (default: 20)')
+    parser.add_argument('--daemon', action='store_true', help='Fleet mode: keep running and poll each printer on its own interval')
+    parser.add_argument('--interval', type=float, default=300, help='Daemon mode: default seconds between polls of a printer (default: 300)')
+    parser.add_argument('--jitter', type=float, default=0.1, help='Daemon mode: random fraction added to each interval (default: 0.1)')
+    parser.add_argument('--adaptive', action='store_true', help='Daemon mode: stretch the interval of idle printers and shrink it for busy ones or low consumables')
+    parser.add_argument('--min-interval', type=float, default=60, help='Adaptive mode: shortest seconds between polls of a printer (default: 60)')
+    parser.add_argument('--max-interval', type=float, default=3600, help='Adaptive mode: longest seconds between polls of a printer (default: 3600)')
+    parser.add_argument('--low-level', type=float, default=10, help='Adaptive mode: consumable level (%%) below which polls get closer (default: 10)')
+    parser.add_argument('--send-interval', type=float, default=10, help='Daemon mode: seconds between batches sent to Zabbix (default: 10)')
+    parser.add_argument('--exporter-port', type=int, help='Daemon mode: serve the latest readings on /metrics for Prometheus on this port (--zabbix-server becomes optional)')
+    parser.add_argument('--exporter-address', default='', help='Address where the /metrics endpoint listens (default: all interfaces)')
+    parser.add_argument('--parser', choices=sorted(EXTRACTORS), default='bs4', help='HTML extractor: BeautifulSoup tree or single-pass fast parser (default: bs4)')
+    parser.add_argument('--labels', help='JSON file with extra label languages or model families for the label registry')
+    parser.add_argument('--model-family', help='Printer model family whose specific labels should be used')
+    parser.add_argument('--compare-parsers', nargs='+', metavar='HTML', help='Check that both extractors return the same data for saved pages and benchmark them')
+    parser.add_argument('--session-cache', help='Folder where printer session cookies are cached between runs to skip the login')
+    parser.add_argument('--session-ttl', type=int, default=600, help='Maximum age in seconds of a cached session (default: 600)')
+    parser.add_argument('--pool-size', type=int, default=2, help='Keep-alive connections kept per printer (default: 2)')
+    parser.add_argument('--idle-timeout', type=float, default=30, help='Seconds after which the idle connections of a printer are closed; its TLS session is still resumed (default: 30)')
+    parser.add_argument('--timeout', type=float, default=30, help='Read timeout in seconds for each HTTP request to the printer (default: 30)')
+    parser.add_argument('--connect-timeout', type=float, default=5, help='Seconds to wait for the connection to the printer (default: 5)')
+    parser.add_argument('--retries', type=int, default=2, help='Retries of a request after a connection error, timeout or HTTP 5xx (default: 2)')
+    parser.add_argument('--retry-backoff', type=float, default=0.5, help='Seconds before the first retry, doubled on every retry (default: 0.5)')
+    parser.add_argument('--deadline', type=float, default=90, help='Maximum seconds for the whole poll of a printer, 0 for no limit (default: 90)')
+    parser.add_argument('--breaker-failures', type=int, default=3, help='Fleet mode: consecutive failures after which a printer is not polled for a cool-down, 0 to disable (default: 3)')
+    parser.add_argument('--breaker-cooldown', type=float, default=300, help='Fleet mode: seconds before a failing printer is probed again (default: 300)')
+    parser.add_argument('--breaker-file', help='Fleet mode: JSON file where the circuit breaker state is kept between runs')
+    parser.add_argument('--source', choices=PRINTER_SOURCES, default='html', help='Read the printer from its web UI, over SNMP (Printer-MIB), or over SNMP with the web UI filling the missing values (default: html)')
+    parser.add_argument('--snmp-community', default='public', help='SNMP community for --source snmp/auto (default: public)')
+    parser.add_argument('--timing-log', metavar='FILE', help='Append the time and bytes of every stage of each poll as JSON lines to FILE (- for stderr)')
+    parser.add_argument('--self-monitoring', action='store_true', help='Also send the poll timings to Zabbix (brother.poll.duration, brother.login.duration...)')
+    parser.add_argument('--profile', metavar='FILE', help='Save a cProfile of the run to FILE and print the slowest functions (main thread only)')
     
     args = parser.parse_args()
     
+    if args.profile:
+        import atexit
+        import cProfile
+        import pstats
+        
+        profiler = cProfile.Profile()
+        
+        def dump_profile():
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"\n⏱ Profile saved to '{args.profile}' (slowest functions by cumulative time):")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+        
+        atexit.register(dump_profile)
+        profiler.enable()
+    
+    if args.labels:
+        try:
+            load_label_file(args.labels)
+        except (OSError, ValueError) as e:
+            parser.error(f"Could not load labels: {e}")
+    
+    if args.export_template:
+        template = json.dumps(build_zabbix_template(), indent=4, ensure_ascii=False)
+        if args.export_template == '-':
+            print(template)
+        else:
+            with open(args.export_template, 'w', encoding='utf-8') as file:
+                file.write(template + '\n')
+            print(f"✓ Template written to '{args.export_template}'")
+        sys.exit(0)
+    
+    if args.compare_parsers:
+        sys.exit(0 if compare_extractors(args.compare_parsers) else 1)
+    
+    session_cache = SessionCache(args.session_cache, args.session_ttl) if args.session_cache else None
+    state_store = StateStore(args.state_file, args.heartbeat * 60) if args.delta else None
+    timing_log = TimingLog(args.timing_log) if args.timing_log else None
+    spool = Spool(args.spool, int(args.spool_max_mb * 1024 * 1024), args.spool_max_age * 3600) if args.spool else None
+    connection_pool = ConnectionPool(args.pool_size, args.idle_timeout)
+    policy = RetryPolicy(args.connect_timeout, args.timeout, args.retries, args.retry_backoff, args.deadline or None)
+    breaker = None
+    if args.breaker_failures > 0 and args.inventory:
+        breaker = CircuitBreaker(args.breaker_failures, args.breaker_cooldown, args.breaker_file)
+    
+    if args.adaptive and not (args.daemon or args.exporter_port):
+        parser.error("--adaptive requires --daemon or --exporter-port")
+    
+    if args.daemon or args.exporter_port:
+        if not args.inventory:
+            parser.error("--daemon and --exporter-port require --inventory")
+        if not args.zabbix_server and not args.exporter_port:
+            parser.error("--zabbix-server is required")
+        outputs = []
+        if args.zabbix_server:
+            outputs.append(ZabbixOutput(args.zabbix_server, args.zabbix_port, args.sender, state_store,
+                                        args.zabbix_mode, args.self_monitoring, spool))
+        if timing_log:
+            outputs.append(timing_log)
+        if args.exporter_port:
+            try:
+                outputs.append(PrometheusOutput(args.exporter_port, args.exporter_address).start())
+            except OSError as e:
+                parser.error(f"Could not start the metrics endpoint: {e}")
+        scheduler = PrinterScheduler(
+            args.inventory, outputs, args.workers, args.timeout, args.password, session_cache, args.parser,
+            args.interval, args.jitter, args.send_interval, args.source, args.snmp_community, policy, breaker,
+            connection_pool, args.archive_dir,
+            AdaptivePolling(args.min_interval, args.max_interval, args.low_level) if args.adaptive else None
+        )
+        sys.exit(0 if scheduler.run() else 1)
+    
+    if not args.zabbix_server:
+        parser.error("--zabbix-server is required")
+    
+    if args.inventory:
+        try:
+            printers = load_inventory(args.inventory)
+        except (OSError, ValueError) as e:
+            parser.error(f"Could not load inventory: {e}")
+        ok = run_fleet(printers, args.zabbix_server, args.zabbix_port, args.sender,
+                       args.workers, args.timeout, args.password, session_cache, args.parser, state_store,
+                       args.zabbix_mode, args.self_monitoring, timing_log, args.source, args.snmp_community, policy,
+                       breaker, spool, connection_pool, args.archive_dir)
+        sys.exit(0 if ok else 1)
+    
+    for option in ('url', 'password', 'zabbix_hostname'):
+        if not getattr(args, option) and (option != 'password' or args.source == 'html'):
+            parser.error(f"--{option.replace('_', '-')} is required without --inventory")
+    
     # Configuration from parameters
     URL_BASE = args.url
     PASSWORD = args.password
@@ -453,71 +4519,86 @@ if __name__ == "__main__":
     ZABBIX_PORT = args.zabbix_port
     ZABBIX_HOSTNAME = args.zabbix_hostname
     
-    # Download the HTML
-    print("\n" + "="*60)
-    print("STEP 1: Downloading printer information")
-    print("="*60)
-    html_content = login_y_descargar_html(URL_BASE, PASSWORD, RUTA_DESTINO)
-    
-    if html_content:
-        # Extract all maintenance data
+    datos = None
+    if args.source == 'html':
+        # Download the HTML
         print("\n" + "="*60)
-        print("STEP 2: Extracting maintenance data")
+        print("STEP 1: Downloading printer information")
         print("="*60)
-        datos = extract_printer_data(html_content)
+        timings = PollTimings(ZABBIX_HOSTNAME)
+        poll_policy = policy.start()
+        unknown_labels = set()
+        html_content = None
+        if args.parser == 'fast' and not RUTA_DESTINO and not args.archive_dir:
+            # Nothing to keep: extract the data while the page is downloaded
+            datos = login_y_extraer_datos(URL_BASE, PASSWORD, args.model_family, unknown_labels,
+                                          session_cache=session_cache, session=connection_pool.session(ZABBIX_HOSTNAME),
+                                          timings=timings, policy=poll_policy)
+        else:
+            html_content = login_y_descargar_html(URL_BASE, PASSWORD, RUTA_DESTINO, session_cache=session_cache,
+                                                  session=connection_pool.session(ZABBIX_HOSTNAME), timings=timings,
+                                                  policy=poll_policy)
+        timings.retries = poll_policy.retried
+        timings.connections = connection_pool.snapshot(ZABBIX_HOSTNAME)
+        if session_cache:
+            print(session_cache.summary())
         
-        # Delete the temporary HTML file
-        try:
-            if os.path.exists(RUTA_DESTINO):
-                os.remove(RUTA_DESTINO)
-                print(f"✓ Temporary file '{RUTA_DESTINO}' deleted")
-        except Exception as e:
-            print(f"⚠ Warning: Could not delete temporary file: {e}")
-        
-        if datos:
-            # Show extracted data
-            print("\n📊 EXTRACTED DATA:")
-            print("="*60)
-            
-            if datos['toner']:
-                print("\n🖨️  Toner Levels:")
-                for color, nivel in datos['toner'].items():
-                    print(f"  - {color.capitalize()}: {nivel}%")
-            
-            if datos['drum']:
-                print("\n🥁 Drum Units:")
-                for color, nivel in datos['drum'].items():
-                    print(f"  - {color.capitalize()}: {nivel}%")
-            
-            if datos['belt_unit']:
-                print("\n🔧 Belt Unit:")
-                if 'pages' in datos['belt_unit']:
-                    print(f"  - Remaining pages: {datos['belt_unit']['pages']}")
-                if 'percent' in datos['belt_unit']:
-                    print(f"  - Remaining life: {datos['belt_unit']['percent']}%")
-            
-            if datos['fuser_unit']:
-                print("\n🔥 Fuser Unit:")
-                if 'pages' in datos['fuser_unit']:
-                    print(f"  - Remaining pages: {datos['fuser_unit']['pages']}")
-                if 'percent' in datos['fuser_unit']:
-                    print(f"  - Remaining life: {datos['fuser_unit']['percent']}%")
-            
-            if datos['pages_printed']:
-                print("\n📄 Printed Pages:")
-                if 'total' in datos['pages_printed']:
-                    print(f"  - Total: {datos['pages_printed']['total']} pages")
-                if 'colour' in datos['pages_printed']:
-                    print(f"  - Colour: {datos['pages_printed']['colour']} pages")
-                if 'bw' in datos['pages_printed']:
-                    print(f"  - B&W: {datos['pages_printed']['bw']} pages")
-            
-            # Send to Zabbix
+        if html_content and args.archive_dir:
+            try:
+                with timings.stage('archive'):
+                    path = archive_snapshot(args.archive_dir, ZABBIX_HOSTNAME, html_content, timings.started)
+                print(f"✓ Page archived to '{path}'")
+            except OSError as e:
+                print(f"⚠ Could not archive the page: {e}")
+
+        if html_content:
+            # Extract all maintenance data
             print("\n" + "="*60)
-            print("STEP 3: Sending data to Zabbix")
+            print("STEP 2: Extracting maintenance data")
             print("="*60)
-            send_to_zabbix(ZABBIX_HOSTNAME, datos, ZABBIX_SERVER, ZABBIX_PORT)
+            with timings.stage('parse') as entry:
+                entry['bytes'] = len(html_content)
+                datos = EXTRACTORS[args.parser](html_content, args.model_family, unknown_labels)
+        timings.finish()
+        if unknown_labels:
+            print(f"⚠ Unknown labels (add them to the label registry): {', '.join(sorted(unknown_labels))}")
+        if html_content or datos is not None:
+            error = "Could not extract data from HTML"
         else:
-            print("Could not extract data from HTML")
+            error = "Could not download printer content"
+    else:
+        # Read the printer over SNMP (and the web UI for the missing values in auto)
+        print("\n" + "="*60)
+        print(f"STEP 1: Reading printer information ({'SNMP' if args.source == 'snmp' else 'SNMP + web UI'})")
+        print("="*60)
+        printer = {'url': URL_BASE, 'zabbix_hostname': ZABBIX_HOSTNAME, 'password': PASSWORD,
+                   'model_family': args.model_family}
+        result = poll_pooled(printer, connection_pool, None, None, args.timeout, session_cache, args.parser,
+                             source=args.source, snmp_community=args.snmp_community, policy=policy,
+                             archive_dir=args.archive_dir)
+        timings = result['timings']
+        datos = result['data']
+        error = result['error']
+        if session_cache:
+            print(session_cache.summary())
+        if result['unknown_labels']:
+            print(f"⚠ Unknown labels (add them to the label registry): {', '.join(sorted(result['unknown_labels']))}")
+    
+    if datos:
+        print_printer_data(datos)
+        
+        # Send to Zabbix
+        print("\n" + "="*60)
+        print("STEP 3: Sending data to Zabbix")
+        print("="*60)
+        extra_items = timings.zabbix_items(ZABBIX_HOSTNAME) if args.self_monitoring else ()
+        with timings.stage('send'):
+            send_to_zabbix(ZABBIX_HOSTNAME, datos, ZABBIX_SERVER, ZABBIX_PORT, args.sender, state_store,
+                           args.zabbix_mode, extra_items, spool)
+        print(timings.summary())
+        if timing_log:
+            timing_log.write(timings)
     else:
-        print("Could not download printer content")
+        print(error)
+        if timing_log:
+            timing_log.write(timings.finish(), error)
@@ -0,0 +1,86 @@
+"""
+Tests of the per-printer sessions (ConnectionPool) against the printer
+emulator over HTTP and HTTPS.
+"""
+import contextlib
+import io
+import unittest
+
+import benchmark
+import brother
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    https = False
+    
+    def setUp(self):
+        self.emulator = benchmark.PrinterEmulator(printers=1, https=self.https).start()
+        self.addCleanup(self.emulator.stop)
+        self.printer = {'url': self.emulator.url(0), 'zabbix_hostname': 'printer-1', 'password': 'initpass'}
+    
+    def pool(self, **options):
+        pool = brother.ConnectionPool(**options)
+        self.addCleanup(pool.close)
+        return pool
+    
+    def poll(self, pool):
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = brother.poll_pooled(self.printer, pool, None, None, 5)
+        self.assertIsNone(result['error'])
+        self.assertEqual(result['data'], self.emulator.printers[0]['values'])
+        return result['timings'].connections
+
+class KeepAliveTest(ConnectionPoolTestCase):
+    def test_requests_of_a_poll_share_a_connection(self):
+        connections = self.poll(self.pool())
+        
+        self.assertEqual(connections, {'requests': 3, 'connections': 1, 'handshakes': 0, 'resumed': 0})
+    
+    def test_next_poll_reuses_the_connection(self):
+        pool = self.pool()
+        self.poll(pool)
+        
+        # The cookies of the first login are kept too: a single request
+        self.assertEqual(self.poll(pool), {'requests': 1, 'connections': 0, 'handshakes': 0, 'resumed': 0})
+    
+    def test_idle_connections_are_closed(self):
+        pool = self.pool(idle_timeout=0)
+        self.poll(pool)
+        
+        self.assertEqual(self.poll(pool)['connections'], 1)
+    
+    def test_counters_survive_closing_the_session(self):
+        pool = self.pool()
+        self.poll(pool)
+        pool.close('printer-1')
+        self.poll(pool)
+        
+        self.assertEqual(pool.snapshot('printer-1'), {'requests': 6, 'connections': 2, 'handshakes': 0, 'resumed': 0})
+        self.assertTrue(pool.summary().startswith('Connections: 6 requests over 2 connections (67% reused)'))
+
+class TlsResumptionTest(ConnectionPoolTestCase):
+    https = True
+    
+    def test_first_poll_makes_a_full_handshake(self):
+        connections = self.poll(self.pool())
+        
+        self.assertEqual((connections['connections'], connections['handshakes'], connections['resumed']), (1, 1, 0))
+    
+    def test_new_connection_resumes_the_tls_session(self):
+        pool = self.pool(idle_timeout=0)
+        self.poll(pool)
+        
+        for _ in range(2):
+            connections = self.poll(pool)
+            self.assertEqual((connections['connections'], connections['handshakes'], connections['resumed']),
+                             (1, 0, 1))
+        self.assertIn('1 full TLS handshakes, 2 resumed', pool.summary())
+    
+    def test_sessions_are_not_shared_between_printers(self):
+        pool = self.pool(idle_timeout=0)
+        self.poll(pool)
+        self.printer = dict(self.printer, zabbix_hostname='printer-2')
+        
+        self.assertEqual(self.poll(pool)['handshakes'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
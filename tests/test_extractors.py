@@ -0,0 +1,89 @@
+"""
+Parity of the BeautifulSoup and single-pass extractors on saved pages.
+
+tests/pages has pages rendered by the emulator (benchmark.py) in English
+and Spanish plus edge cases: unclosed <dt>/<dd>, nested <span>s, the
+"Total Pages Printed" heading after other lists, a mono printer and
+labels with more words than the registry phrases.
+"""
+import contextlib
+import glob
+import io
+import os
+import unittest
+
+import brother
+
+PAGES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'pages', '*.html')))
+
+def _read(path):
+    with open(path, encoding='utf-8') as file:
+        return file.read()
+
+def _parse_in_chunks(html_content, chunk_size, stop_at_pages):
+    """Feeds the page like stream_into_parser does, stopping when the parser is done."""
+    parser = brother.MaintenanceParser(stop_at_pages=stop_at_pages, unknown_labels=set())
+    for start in range(0, len(html_content), chunk_size):
+        parser.feed(html_content[start:start + chunk_size])
+        if parser.done:
+            break
+    parser.close()
+    return parser
+
+class ExtractorParityTest(unittest.TestCase):
+    def test_corpus_is_present(self):
+        self.assertGreaterEqual(len(PAGES), 6)
+    
+    def test_fast_extractor_matches_bs4(self):
+        for path in PAGES:
+            with self.subTest(page=os.path.basename(path)):
+                html_content = _read(path)
+                bs4_labels, fast_labels = set(), set()
+                expected = brother.extract_printer_data(html_content, unknown_labels=bs4_labels)
+                
+                self.assertEqual(brother.extract_printer_data_fast(html_content, unknown_labels=fast_labels), expected)
+                self.assertEqual(fast_labels, bs4_labels)
+    
+    def test_chunked_parser_matches_bs4(self):
+        for path in PAGES:
+            html_content = _read(path)
+            expected = brother.extract_printer_data(html_content)
+            for stop_at_pages in (False, True):
+                for chunk_size in (1, 7, 2048):
+                    with self.subTest(page=os.path.basename(path), stop_at_pages=stop_at_pages, chunk_size=chunk_size):
+                        self.assertEqual(_parse_in_chunks(html_content, chunk_size, stop_at_pages).data, expected)
+    
+    def test_stop_at_pages_ends_before_the_end_of_the_page(self):
+        html_content = _read(os.path.join(os.path.dirname(__file__), 'pages', 'mono.html'))
+        
+        self.assertFalse(_parse_in_chunks(html_content, 64, False).done)
+        self.assertTrue(_parse_in_chunks(html_content, 64, True).done)
+    
+    def test_compare_parsers_reports_parity(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(brother.compare_extractors(PAGES, repeat=1))
+
+class LabelContainmentTest(unittest.TestCase):
+    """Labels with more words than the registry phrase are still recognized."""
+    
+    def test_labels_with_extra_words(self):
+        unknown_labels = set()
+        html_content = _read(os.path.join(os.path.dirname(__file__), 'pages', 'extra_words.html'))
+        data = brother.extract_printer_data_fast(html_content, unknown_labels=unknown_labels)
+        
+        self.assertEqual(data['toner'], {'cyan': 40, 'magenta': 41, 'yellow': 42, 'black': 43})
+        self.assertEqual(data['drum'], {'black': 90})
+        self.assertEqual(unknown_labels, {'Waste Toner Box*'})
+    
+    def test_exact_labels_keep_their_entry(self):
+        self.assertEqual(brother._classify_label('Drum Unit Cyan (C)*'), ('drum', 'cyan'))
+        self.assertEqual(brother._classify_label('Unidad de tambor Negro (BK)*'), ('drum', 'black'))
+    
+    def test_longest_phrase_wins(self):
+        self.assertEqual(brother._classify_label('Drum Unit Cyan Toner (C)**'), ('drum', 'cyan'))
+    
+    def test_footnote_marker_is_still_required(self):
+        self.assertEqual(brother._classify_label('Toner Cartridge Cyan (C)'), (None, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Tests of the inventory loader and the fleet mode against the printer emulator.
+"""
+import contextlib
+import io
+import json
+import os
+import socket
+import tempfile
+import unittest
+
+import benchmark
+import brother
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+def _closed_port():
+    """Returns a local port where nothing is listening."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class LoadInventoryTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+    
+    def write(self, name, content):
+        path = os.path.join(self.folder, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+    
+    def test_csv(self):
+        path = self.write('inventory.csv', 'url,zabbix_hostname,password,timeout,zabbix_port,source\n'
+                                           'http://10.0.0.1,p1,secret,5,10052,\n'
+                                           'http://10.0.0.2,p2,,,,snmp\n')
+        
+        self.assertEqual(brother.load_inventory(path), [
+            {'url': 'http://10.0.0.1', 'zabbix_hostname': 'p1', 'password': 'secret', 'timeout': 5.0,
+             'zabbix_port': 10052},
+            {'url': 'http://10.0.0.2', 'zabbix_hostname': 'p2', 'source': 'snmp'},
+        ])
+    
+    def test_json_list_and_mapping(self):
+        printer = {'url': 'http://10.0.0.1', 'zabbix_hostname': 'p1', 'password_env': 'P1', 'retries': '3'}
+        for content in ([printer], {'printers': [printer]}):
+            with self.subTest(content=type(content).__name__):
+                path = self.write('inventory.json', json.dumps(content))
+                
+                self.assertEqual(brother.load_inventory(path), [dict(printer, retries=3)])
+    
+    @unittest.skipIf(yaml is None, "PyYAML is not installed")
+    def test_yaml(self):
+        path = self.write('inventory.yaml', 'printers:\n'
+                                            '  - url: http://10.0.0.1\n'
+                                            '    zabbix_hostname: p1\n'
+                                            '    deadline: 20\n')
+        
+        self.assertEqual(brother.load_inventory(path),
+                         [{'url': 'http://10.0.0.1', 'zabbix_hostname': 'p1', 'deadline': 20.0}])
+    
+    @unittest.skipIf(yaml is None, "PyYAML is not installed")
+    def test_empty_yaml(self):
+        self.assertEqual(brother.load_inventory(self.write('inventory.yml', '')), [])
+    
+    def test_not_a_list(self):
+        for name, content in (('inventory.json', '"printer"'), ('inventory.json', '{"printers": 3}'),
+                              ('inventory.json', '["http://10.0.0.1"]')):
+            with self.subTest(content=content):
+                with self.assertRaises(ValueError):
+                    brother.load_inventory(self.write(name, content))
+    
+    def test_missing_fields(self):
+        for field in ('url', 'zabbix_hostname'):
+            with self.subTest(field=field):
+                printer = {'url': 'http://10.0.0.1', 'zabbix_hostname': 'p1'}
+                del printer[field]
+                path = self.write('inventory.json', json.dumps([{'url': 'http://10.0.0.2', 'zabbix_hostname': 'p2'},
+                                                                printer]))
+                
+                with self.assertRaisesRegex(ValueError, f"#2 .* has no '{field}'"):
+                    brother.load_inventory(path)
+    
+    def test_missing_field_in_csv(self):
+        path = self.write('inventory.csv', 'url,zabbix_hostname\nhttp://10.0.0.1,\n')
+        
+        with self.assertRaisesRegex(ValueError, "#1 .* has no 'zabbix_hostname'"):
+            brother.load_inventory(path)
+    
+    def test_unknown_source_and_format(self):
+        with self.assertRaisesRegex(ValueError, 'unknown source'):
+            brother.load_inventory(self.write('inventory.json', json.dumps(
+                [{'url': 'http://10.0.0.1', 'zabbix_hostname': 'p1', 'source': 'ftp'}])))
+        with self.assertRaisesRegex(ValueError, 'Unknown inventory format'):
+            brother.load_inventory(self.write('inventory.txt', ''))
+
+class RunFleetTest(unittest.TestCase):
+    def setUp(self):
+        self.emulator = benchmark.PrinterEmulator(printers=2).start()
+        self.addCleanup(self.emulator.stop)
+        self.trapper = benchmark.FakeTrapper().start()
+        self.addCleanup(self.trapper.stop)
+    
+    def test_one_dead_printer(self):
+        printers = [
+            {'url': self.emulator.url(0), 'zabbix_hostname': 'alive-0'},
+            {'url': f'http://127.0.0.1:{_closed_port()}', 'zabbix_hostname': 'dead'},
+            {'url': self.emulator.url(1), 'zabbix_hostname': 'alive-1'},
+        ]
+        host, port = self.trapper.address
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            ok = brother.run_fleet(printers, host, port, sender='native', workers=3, default_password='initpass',
+                                   policy=brother.RetryPolicy(connect_timeout=1, read_timeout=5, retries=0))
+        
+        self.assertFalse(ok)
+        self.assertIn('Printers: 2 ok, 1 failed', output.getvalue())
+        self.assertRegex(output.getvalue(), r'dead: [\d.]+s ✗')
+        hosts = {item['host'] for item in self.trapper.items}
+        self.assertEqual(hosts, {'alive-0', 'alive-1'})
+        for number in (0, 1):
+            expected = {item['key']: item['value'] for item in brother.build_zabbix_items(
+                f'alive-{number}', self.emulator.printers[number]['values'])}
+            sent = {item['key']: item['value'] for item in self.trapper.items if item['host'] == f'alive-{number}'}
+            self.assertEqual(sent, expected)
+
+if __name__ == '__main__':
+    unittest.main()
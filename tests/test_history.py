@@ -0,0 +1,58 @@
+"""
+Tests of the history import (import subcommand) against a fake trapper.
+"""
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+import benchmark
+import brother
+
+ROWS = 200
+KEYS = [f'brother.test[{number}]' for number in range(10)]
+
+class ImportHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.trapper = benchmark.FakeTrapper().start()
+        self.addCleanup(self.trapper.stop)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, 'printer.csv')
+        brother.write_history(self.path, [(1700000000 + row * 300, {key: str(row) for key in KEYS})
+                                          for row in range(ROWS)])
+    
+    def run_import(self, batch_size):
+        host, port = self.trapper.address
+        with contextlib.redirect_stdout(io.StringIO()):
+            return brother.import_history([self.path], host, port, 'native', batch_size)
+    
+    def test_one_connection_per_batch(self):
+        # 7 and 15 don't divide the 10 values of a row: rows are split between batches
+        for batch_size, connections in ((1000, 2), (100, 20), (15, 134), (7, 286)):
+            with self.subTest(batch_size=batch_size):
+                self.trapper.connections = 0
+                totals = self.run_import(batch_size)
+                
+                self.assertEqual(totals, {'processed': ROWS * len(KEYS), 'failed': 0})
+                self.assertEqual(self.trapper.connections, connections)
+    
+    def test_values_keep_their_clock(self):
+        self.run_import(1000)
+        
+        with open(self.path, newline='', encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(self.trapper.items), ROWS * len(KEYS))
+        self.assertEqual({item['host'] for item in self.trapper.items}, {'printer'})
+        self.assertEqual(sorted({item['clock'] for item in self.trapper.items}), [int(row['clock']) for row in rows])
+    
+    def test_split_rows_keep_every_value_once(self):
+        self.run_import(7)
+        
+        values = sorted((item['clock'], item['key'], item['value']) for item in self.trapper.items)
+        self.assertEqual(values, sorted((1700000000 + row * 300, key, str(row)) for row in range(ROWS) for key in KEYS))
+
+if __name__ == '__main__':
+    unittest.main()
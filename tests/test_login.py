@@ -0,0 +1,72 @@
+"""
+Tests of the login flow against the printer emulator.
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import unittest
+
+import benchmark
+import brother
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class CsrfTokenTest(unittest.TestCase):
+    def test_token_of_the_emulator_login_page(self):
+        html_content = benchmark.LOGIN_PAGE.format(login='Please Login', csrf='csrf7')
+        
+        self.assertEqual(brother.find_csrf_token(html_content), 'csrf7')
+    
+    def test_attribute_order_and_entities(self):
+        html_content = '<form><input value="a&amp;b" type="hidden" name="CSRFToken" id="CSRFToken"/></form>'
+        
+        self.assertEqual(brother.find_csrf_token(html_content), 'a&b')
+    
+    def test_first_token_wins(self):
+        html_content = '<input id="CSRFToken" value="one"><input id="CSRFToken" value="two">'
+        
+        self.assertEqual(brother.find_csrf_token(html_content), 'one')
+    
+    def test_input_without_value(self):
+        self.assertEqual(brother.find_csrf_token('<input id="CSRFToken">'), '')
+    
+    def test_page_without_token(self):
+        self.assertIsNone(brother.find_csrf_token('<input id="LogBox" name="B1891">'))
+
+class LoginTest(unittest.TestCase):
+    def setUp(self):
+        self.emulator = benchmark.PrinterEmulator(printers=1, language='es').start()
+        self.addCleanup(self.emulator.stop)
+        self.expected = self.emulator.printers[0]['values']
+    
+    def test_streamed_login_extracts_the_data(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            data = brother.login_y_extraer_datos(self.emulator.url(0), 'initpass', timeout=5)
+        
+        self.assertEqual(data, self.expected)
+    
+    def test_wrong_password(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            data = brother.login_y_extraer_datos(self.emulator.url(0), 'wrong', timeout=5)
+        
+        self.assertIsNone(data)
+        self.assertIn('Could not login', output.getvalue())
+    
+    def test_login_paths_do_not_load_bs4(self):
+        code = (
+            "import contextlib, io, sys, benchmark, brother\n"
+            "emulator = benchmark.PrinterEmulator().start()\n"
+            "with contextlib.redirect_stdout(io.StringIO()):\n"
+            "    html_content = brother.login_y_descargar_html(emulator.url(0), 'initpass', None, timeout=5)\n"
+            "    data = brother.login_y_extraer_datos(emulator.url(0), 'initpass', timeout=5)\n"
+            "emulator.stop()\n"
+            "print(bool(html_content), bool(data), 'bs4' in sys.modules)\n"
+        )
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+        
+        self.assertEqual(result.stdout.split(), ['True', 'True', 'False'], result.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Tests of the Prometheus exporter, scraped over HTTP.
+"""
+import contextlib
+import io
+import random
+import unittest
+import urllib.error
+import urllib.request
+
+import benchmark
+import brother
+
+class PrometheusOutputTest(unittest.TestCase):
+    def setUp(self):
+        self.output = brother.PrometheusOutput(port=0, address='127.0.0.1')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.output.start()
+        self.addCleanup(self.output.close)
+        self.values = benchmark.random_printer_values(random.Random(0))
+    
+    def scrape(self, accept=None):
+        request = urllib.request.Request(f'http://127.0.0.1:{self.output.port}/metrics')
+        if accept:
+            request.add_header('Accept', accept)
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.headers['Content-Type'], response.read().decode('utf-8')
+    
+    def add(self, hostname, data, latency=0.5):
+        self.output.add({'printer': {'zabbix_hostname': hostname}, 'data': data, 'latency': latency})
+    
+    def test_content_type(self):
+        self.assertEqual(self.scrape()[0], 'text/plain; version=0.0.4; charset=utf-8')
+    
+    def test_openmetrics_content_type(self):
+        content_type, body = self.scrape('application/openmetrics-text; version=1.0.0')
+        
+        self.assertEqual(content_type, 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+        self.assertTrue(body.endswith('# EOF\n'))
+    
+    def test_families_of_a_reading(self):
+        self.add('printer-1', brother.PrinterReading.from_dict(self.values))
+        
+        body = self.scrape()[1]
+        
+        for name, _ in brother.PrometheusOutput.GAUGES[:8]:
+            self.assertIn(f'# TYPE {name} gauge\n', body)
+        self.assertIn(f'brother_toner_level_percent{{printer="printer-1",color="black"}} '
+                      f'{self.values["toner"]["black"]}\n', body)
+        self.assertIn(f'brother_drum_level_percent{{printer="printer-1",color="cyan"}} '
+                      f'{self.values["drum"]["cyan"]}\n', body)
+        self.assertIn(f'brother_unit_remaining_pages{{printer="printer-1",unit="fuser"}} '
+                      f'{self.values["fuser_unit"]["pages"]}\n', body)
+        self.assertIn(f'brother_unit_remaining_life_percent{{printer="printer-1",unit="belt"}} '
+                      f'{self.values["belt_unit"]["percent"]}\n', body)
+        self.assertIn(f'brother_pages_printed{{printer="printer-1",type="total"}} '
+                      f'{self.values["pages_printed"]["total"]}\n', body)
+        self.assertIn('brother_up{printer="printer-1"} 1\n', body)
+    
+    def test_label_values_are_escaped(self):
+        self.add('a"b\\c\nd', self.values)
+        
+        body = self.scrape()[1]
+        
+        self.assertIn('brother_up{printer="a\\"b\\\\c\\nd"} 1\n', body)
+        # Every sample stays on a single line
+        for line in body.splitlines():
+            self.assertTrue(line.startswith(('# HELP ', '# TYPE ', 'brother_')), line)
+    
+    def test_failed_poll_keeps_the_last_reading(self):
+        self.add('printer-1', self.values)
+        self.add('printer-1', None)
+        
+        body = self.scrape()[1]
+        
+        self.assertIn('brother_up{printer="printer-1"} 0\n', body)
+        self.assertIn('brother_toner_level_percent{printer="printer-1",color="black"}', body)
+    
+    def test_other_paths_are_not_found(self):
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f'http://127.0.0.1:{self.output.port}/', timeout=5)
+        error.exception.close()
+        
+        self.assertEqual(error.exception.code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Tests of PrinterReading: round-trips and rejection of invalid values.
+"""
+import copy
+import json
+import pickle
+import random
+import unittest
+
+import benchmark
+import brother
+
+class PrinterReadingTest(unittest.TestCase):
+    def setUp(self):
+        self.values = benchmark.random_printer_values(random.Random(0))
+    
+    def test_round_trips(self):
+        reading = brother.PrinterReading.from_dict(self.values)
+        
+        self.assertEqual(reading.as_dict(), self.values)
+        self.assertEqual(reading, self.values)
+        self.assertEqual(brother.PrinterReading.from_json(reading.to_json()).as_dict(), self.values)
+        self.assertEqual(pickle.loads(pickle.dumps(reading)).as_dict(), self.values)
+    
+    def test_missing_and_extra_values_round_trip(self):
+        values = copy.deepcopy(self.values)
+        del values['pages_printed']['colour']
+        values['toner']['light_cyan'] = 12
+        values['waste_toner'] = {'percent': 0}
+        reading = brother.PrinterReading.from_dict(values)
+        
+        self.assertIsNone(reading.pages_printed_colour)
+        self.assertEqual(reading.extra, {'toner': {'light_cyan': 12}, 'waste_toner': {'percent': 0}})
+        self.assertEqual(reading.as_dict(), values)
+        self.assertEqual(brother.PrinterReading.from_json(reading.to_json()).as_dict(), values)
+    
+    def test_empty_reading(self):
+        reading = brother.PrinterReading.from_dict(brother._empty_data())
+        
+        self.assertEqual(reading.flatten(), [])
+        self.assertEqual(brother.PrinterReading.from_json(reading.to_json()).flatten(), [])
+    
+    def test_large_counters(self):
+        self.values['pages_printed']['total'] = 2 ** 40
+        reading = brother.PrinterReading.from_dict(self.values)
+        
+        self.assertEqual(brother.PrinterReading.from_json(reading.to_json()).pages_printed_total, 2 ** 40)
+    
+    def test_invalid_values_are_rejected(self):
+        for value in (12.5, -1, '40', True, [40]):
+            for metric, name in (('toner', 'cyan'), ('pages_printed', 'total'), ('toner', 'light_cyan')):
+                with self.subTest(value=value, field=f'{metric}.{name}'):
+                    values = copy.deepcopy(self.values)
+                    values[metric][name] = value
+                    
+                    with self.assertRaisesRegex(ValueError, f'{metric}_{name}'):
+                        brother.PrinterReading.from_dict(values)
+    
+    def test_none_is_only_a_missing_fixed_value(self):
+        self.values['toner']['cyan'] = None
+        self.assertIsNone(brother.PrinterReading.from_dict(self.values).toner_cyan)
+        
+        self.values['toner']['light_cyan'] = None
+        with self.assertRaises(ValueError):
+            brother.PrinterReading.from_dict(self.values)
+    
+    def test_invalid_values_are_rejected_by_the_constructor(self):
+        with self.assertRaises(ValueError):
+            brother.PrinterReading(toner_black=-5)
+        with self.assertRaises(ValueError):
+            brother.PrinterReading(extra={'toner': 5})
+        with self.assertRaises(TypeError):
+            brother.PrinterReading(toner_white=5)
+    
+    def test_invalid_json_is_rejected(self):
+        serialized = json.loads(brother.PrinterReading.from_dict(self.values).to_json())
+        invalid = (
+            {'toner': 1},
+            serialized[:-1],
+            serialized + [{}, {}],
+            serialized + [[1]],
+            [12.5] + serialized[1:],
+        )
+        for value in invalid:
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    brother.PrinterReading.from_json(json.dumps(value))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Tests of the per-printer deadline (RetryPolicy) against a slow emulator.
+"""
+import contextlib
+import io
+import time
+import unittest
+
+import requests
+
+import benchmark
+import brother
+
+DEADLINE = 1.0
+
+# Time a poll may take past its deadline: the chunk being read when it expires
+MARGIN = 1.0
+
+class DeadlineTest(unittest.TestCase):
+    def setUp(self):
+        # 3000 bytes/s: the information page alone takes more than 5 seconds
+        self.emulator = benchmark.PrinterEmulator(slow=3000).start()
+        self.addCleanup(self.emulator.stop)
+        self.printer = {'url': self.emulator.url(0), 'zabbix_hostname': 'printer', 'password': 'initpass'}
+    
+    def poll(self, extractor, policy):
+        start = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            result = brother.poll_printer(self.printer, extractor=extractor, policy=policy)
+        return result, time.monotonic() - start, output.getvalue()
+    
+    def test_slow_body_is_cut_off_at_the_deadline(self):
+        for extractor in sorted(brother.EXTRACTORS):
+            with self.subTest(extractor=extractor):
+                result, elapsed, output = self.poll(extractor, brother.RetryPolicy(retries=0, deadline=DEADLINE))
+                
+                self.assertIsNotNone(result['error'])
+                self.assertIn('deadline', output)
+                self.assertLess(elapsed, DEADLINE + MARGIN)
+    
+    def test_read_stops_between_chunks(self):
+        # The login page (about 400 bytes) takes more than 0.1 seconds at 3000 bytes/s
+        policy = brother.RetryPolicy(retries=0, deadline=0.05).start()
+        response = requests.get(self.emulator.url(0) + '/home/status.html', stream=True, timeout=5)
+        self.addCleanup(response.close)
+        chunks = []
+        
+        with self.assertRaises(requests.exceptions.Timeout):
+            for chunk in policy.read(response, 64):
+                chunks.append(chunk)
+        self.assertLess(sum(map(len, chunks)), len(benchmark.LOGIN_PAGE))
+    
+    def test_body_is_read_without_deadline(self):
+        self.emulator.slow = 0
+        result, _, _ = self.poll('bs4', brother.RetryPolicy(retries=0))
+        
+        self.assertIsNone(result['error'])
+        self.assertEqual(result['data'].as_dict(), self.emulator.printers[0]['values'])
+
+if __name__ == '__main__':
+    unittest.main()
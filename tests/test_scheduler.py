@@ -0,0 +1,174 @@
+"""
+Tests of the queue of the fleet daemon (PrinterScheduler).
+"""
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import brother
+
+class SchedulerQueueTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.inventory = os.path.join(folder.name, 'inventory.json')
+    
+    def load(self, scheduler, *keys):
+        with open(self.inventory, 'w', encoding='utf-8') as file:
+            json.dump([{'url': f'http://127.0.0.1/{key}', 'zabbix_hostname': key, 'password': 'x', 'interval': 60}
+                       for key in keys], file)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(scheduler.load())
+    
+    def due(self, scheduler):
+        """Keys of every entry that would be polled, whatever their time."""
+        keys = []
+        while True:
+            key = scheduler._pop_due(time.monotonic() + 3600)
+            if key is None:
+                return sorted(keys)
+            keys.append(key)
+    
+    def scheduler(self, adaptive=None):
+        return brother.PrinterScheduler(self.inventory, [], adaptive=adaptive)
+    
+    def test_every_printer_is_queued_once(self):
+        scheduler = self.scheduler()
+        self.load(scheduler, 'a', 'b')
+        
+        self.assertEqual(self.due(scheduler), ['a', 'b'])
+    
+    def test_printer_removed_and_added_again_is_queued_once(self):
+        scheduler = self.scheduler()
+        self.load(scheduler, 'a', 'b')
+        self.load(scheduler, 'b')
+        self.load(scheduler, 'a', 'b')
+        
+        self.assertEqual(self.due(scheduler), ['a', 'b'])
+    
+    def test_removed_printer_is_not_polled(self):
+        scheduler = self.scheduler()
+        self.load(scheduler, 'a', 'b')
+        self.load(scheduler, 'b')
+        
+        self.assertEqual(self.due(scheduler), ['b'])
+    
+    def test_rescheduling_replaces_the_previous_entry(self):
+        scheduler = self.scheduler()
+        self.load(scheduler, 'a')
+        scheduler._schedule('a', 10)
+        scheduler._schedule('a', 20)
+        
+        self.assertEqual(self.due(scheduler), ['a'])
+    
+    def test_poll_finishing_after_a_reload_keeps_one_entry(self):
+        scheduler = self.scheduler(brother.AdaptivePolling())
+        self.load(scheduler, 'a')
+        self.assertEqual(self.due(scheduler), ['a'])
+        # 'a' is being polled while it is removed and added again
+        self.load(scheduler, 'b')
+        self.load(scheduler, 'a', 'b')
+        scheduler._schedule('a', scheduler._next_delay(scheduler.printers['a']))
+        
+        self.assertEqual(self.due(scheduler), ['a', 'b'])
+
+def _reading(pages=10000, toner=50):
+    """Reading with every toner at the given level and the drums, belt and fuser well above low_level."""
+    values = {
+        'toner': {color: toner for color in ('cyan', 'magenta', 'yellow', 'black')},
+        'drum': {color: 80 for color in ('cyan', 'magenta', 'yellow', 'black')},
+        'belt_unit': {'pages': 30000, 'percent': 60},
+        'fuser_unit': {'pages': 70000, 'percent': 70},
+        'pages_printed': {'total': pages}
+    }
+    return brother.PrinterReading.from_dict(values)
+
+class AdaptivePollingTest(unittest.TestCase):
+    BASE = 300
+    
+    def setUp(self):
+        self.adaptive = brother.AdaptivePolling()
+        self.printer = {'zabbix_hostname': 'a'}
+        self.now = 1000.0
+    
+    def update(self, reading, after=BASE):
+        self.now += after
+        return self.adaptive.update(self.printer, {'data': reading}, self.BASE, now=self.now)
+    
+    def test_first_poll_keeps_the_base_interval(self):
+        self.assertEqual(self.update(_reading()), (self.BASE, 'first poll'))
+        self.assertEqual(self.adaptive.interval('a', 60), self.BASE)
+    
+    def test_idle_printer_grows_up_to_max_interval(self):
+        self.update(_reading())
+        
+        intervals = [self.update(_reading()) for _ in range(8)]
+        
+        self.assertEqual(intervals[:2], [(450, 'idle'), (675, 'idle')])
+        self.assertEqual(intervals[-1], (self.adaptive.max_interval, 'idle'))
+    
+    def test_busy_printer_shrinks_to_the_target_pages(self):
+        self.update(_reading(pages=10000))
+        
+        interval, reason = self.update(_reading(pages=10200))
+        
+        # 200 pages in 300s: 100 pages take 150s
+        self.assertEqual(interval, 150)
+        self.assertEqual(reason, 'busy (200 pages in 300s)')
+    
+    def test_busy_interval_grows_no_faster_than_idle(self):
+        self.update(_reading(pages=10000))
+        
+        self.assertEqual(self.update(_reading(pages=10010))[0], 450)
+    
+    def test_level_drop_shrinks_to_the_target_drop(self):
+        self.update(_reading(toner=50))
+        
+        interval, reason = self.update(_reading(toner=48))
+        
+        # 2 points in 300s: 1 point takes 150s
+        self.assertEqual(interval, 150)
+        self.assertEqual(reason, 'busy (-2% in 300s)')
+    
+    def test_counter_reset_is_not_activity(self):
+        self.update(_reading(pages=10000))
+        
+        self.assertEqual(self.update(_reading(pages=50)), (450, 'idle'))
+        # The new counter is the reference from now on
+        self.assertEqual(self.update(_reading(pages=250))[1], 'busy (200 pages in 300s)')
+    
+    def test_low_level_caps_the_interval(self):
+        interval, reason = self.update(_reading(toner=5))
+        
+        # Halfway between min_interval and the base interval at half of low_level
+        self.assertEqual(interval, 180)
+        self.assertEqual(reason, 'cyan.toner.level at 5%')
+    
+    def test_printer_overrides_the_limits(self):
+        self.printer.update(min_interval=200, max_interval=400)
+        self.update(_reading(pages=10000))
+        
+        self.assertEqual(self.update(_reading(pages=20000))[0], 200)
+        self.assertEqual(self.update(_reading(pages=20000))[0], 300)
+        self.assertEqual(self.update(_reading(pages=20000))[0], 400)
+    
+    def test_failed_first_poll_stores_nothing(self):
+        self.assertEqual(self.update(None), (self.BASE, 'poll failed'))
+        
+        self.assertEqual(self.adaptive.interval('a', self.BASE), self.BASE)
+        self.assertEqual(self.update(_reading()), (self.BASE, 'first poll'))
+    
+    def test_failed_poll_keeps_the_previous_reading(self):
+        self.update(_reading(pages=10000))
+        self.update(_reading(pages=10000))
+        
+        self.assertEqual(self.update(None), (self.BASE, 'poll failed'))
+        # Compared with the last successful poll, 600s earlier
+        self.assertEqual(self.update(_reading(pages=10300)), (200, 'busy (300 pages in 600s)'))
+
+if __name__ == '__main__':
+    unittest.main()
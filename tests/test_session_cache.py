@@ -0,0 +1,106 @@
+"""
+Tests of the on-disk session cache against the printer emulator.
+"""
+import contextlib
+import io
+import json
+import tempfile
+import time
+import unittest
+
+import requests
+
+import benchmark
+import brother
+
+class SessionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.emulator = benchmark.PrinterEmulator(printers=2).start()
+        self.addCleanup(self.emulator.stop)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.cache = brother.SessionCache(folder.name, ttl=600)
+    
+    def poll(self, number=0, session=None):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            data = brother.login_y_extraer_datos(self.emulator.url(number), 'initpass', timeout=5,
+                                                 session_cache=self.cache, session=session)
+        self.assertEqual(data, self.emulator.printers[number]['values'])
+        return output.getvalue()
+    
+    def entry(self, number=0):
+        with open(self.cache._path(self.emulator.url(number)), encoding='utf-8') as file:
+            return json.load(file)
+    
+    def test_hit_skips_the_login(self):
+        self.poll()
+        output = self.poll()
+        
+        self.assertIn('Reusing cached session', output)
+        self.assertEqual(self.emulator.stats['logins'], 1)
+        self.assertEqual((self.cache.stats['hits'], self.cache.stats['misses']), (1, 1))
+    
+    def test_cookie_attributes_are_kept(self):
+        self.poll(1)
+        
+        cookies = {cookie['name']: cookie for cookie in self.entry(1)['cookies']}
+        self.assertEqual(cookies['AuthCookie']['value'], self.emulator.printers[1]['token'])
+        self.assertEqual(cookies['AuthCookie']['path'], '/printer/1/')
+        self.assertEqual(cookies['AuthCookie']['domain'], '127.0.0.1')
+    
+    def test_cookies_of_one_printer_are_not_sent_to_another(self):
+        self.poll(0)
+        session = requests.Session()
+        for cookie in self.cache.load(self.emulator.url(0)):
+            session.cookies.set(**cookie)
+        
+        response = session.get(f"{self.emulator.url(1)}{brother.INFORMATION_PATH}", timeout=5)
+        self.assertNotIn('Cookie', response.request.headers)
+    
+    def test_expired_entry_logs_in_again(self):
+        self.poll()
+        entry = self.entry()
+        entry['saved'] = time.time() - 601
+        with open(self.cache._path(self.emulator.url(0)), 'w', encoding='utf-8') as file:
+            json.dump(entry, file)
+        
+        output = self.poll()
+        
+        self.assertNotIn('Reusing cached session', output)
+        self.assertEqual(self.emulator.stats['logins'], 2)
+        self.assertEqual((self.cache.stats['expired'], self.cache.stats['hits']), (1, 0))
+        self.assertGreater(self.entry()['saved'], entry['saved'])
+    
+    def test_rejected_session_is_replaced(self):
+        self.poll()
+        # The printer forgets the session: the information URL answers with the login page
+        self.emulator.printers[0]['token'] = 'new-token'
+        
+        output = self.poll()
+        
+        self.assertNotIn('Reusing cached session', output)
+        self.assertEqual(self.emulator.stats['logins'], 2)
+        self.assertEqual((self.cache.stats['rejected'], self.cache.stats['hits']), (1, 0))
+        cookies = {cookie['name']: cookie['value'] for cookie in self.entry()['cookies']}
+        self.assertEqual(cookies['AuthCookie'], 'new-token')
+    
+    def test_warm_session_is_not_a_cache_hit(self):
+        session = requests.Session()
+        self.poll(session=session)
+        output = self.poll(session=session)
+        
+        self.assertNotIn('Reusing cached session', output)
+        self.assertEqual(self.emulator.stats['logins'], 1)
+        self.assertEqual(self.cache.stats['hits'], 0)
+    
+    def test_entry_of_an_old_version_is_a_miss(self):
+        with open(self.cache._path(self.emulator.url(0)), 'w', encoding='utf-8') as file:
+            json.dump({'saved': time.time(), 'cookies': {'AuthCookie': 'x'}}, file)
+        
+        self.poll()
+        
+        self.assertEqual(self.cache.stats['misses'], 1)
+        self.assertIsInstance(self.entry()['cookies'], list)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+"""
+Tests of the SNMP client and BER codec against the agent stand-in of
+benchmark.py (FakeSnmpAgent).
+"""
+import contextlib
+import io
+import random
+import time
+import unittest
+
+import benchmark
+import brother
+
+COLUMNS = (brother.PRT_SUPPLIES_COLORANT, brother.PRT_SUPPLIES_TYPE, brother.PRT_SUPPLIES_DESCRIPTION,
+           brother.PRT_SUPPLIES_UNIT, brother.PRT_SUPPLIES_MAX, brother.PRT_SUPPLIES_LEVEL,
+           brother.PRT_COLORANT_VALUE)
+
+def _values(seed=1):
+    return benchmark.random_printer_values(random.Random(seed))
+
+class BerCodecTest(unittest.TestCase):
+    def test_integers(self):
+        for value in (0, 1, 127, 128, 255, 256, -1, -2, -3, -128, -129, 2 ** 31 - 1, -2 ** 31):
+            with self.subTest(value=value):
+                tag, payload, _ = brother.ber_decode(brother.ber_encode_integer(value))
+                self.assertEqual(brother.snmp_value(tag, payload), value)
+    
+    def test_oids(self):
+        for oid in (brother.BROTHER_MAINTENANCE, (1, 3, 6, 1, 4, 1, 2 ** 32 - 1, 0), (1, 3, 127, 128, 16383, 16384)):
+            with self.subTest(oid=oid):
+                tag, payload, _ = brother.ber_decode(brother.ber_encode_oid(oid))
+                self.assertEqual(tag, brother.BER_OID)
+                self.assertEqual(brother.ber_decode_oid(payload), oid)
+    
+    def test_message_round_trip(self):
+        varbinds = [(brother.PRT_SUPPLIES_LEVEL + (1, 1), brother.BER_INTEGER, b'\xfd'),
+                    (brother.BROTHER_COUNTERS, brother.BER_OCTET_STRING, b'\x00\x01\x04\x00\x00\x01\x00\xff'),
+                    (brother.PRT_COLORANT_VALUE, brother.SNMP_END_OF_MIB_VIEW, b'')]
+        packet = brother.build_snmp_message('public@3', brother.SNMP_RESPONSE, 1234, varbinds, brother.SNMP_TOO_BIG, 0)
+        message = brother.parse_snmp_message(packet)
+        
+        self.assertEqual((message['community'], message['pdu_type'], message['request_id'], message['error_status']),
+                         ('public@3', brother.SNMP_RESPONSE, 1234, brother.SNMP_TOO_BIG))
+        self.assertEqual([(oid, tag, bytes(payload)) for oid, tag, payload in message['varbinds']], varbinds)
+        self.assertEqual(brother.snmp_value(brother.BER_INTEGER, b'\xfd'), -3)
+
+class AgentTestCase(unittest.TestCase):
+    def start_agent(self, values=None, **options):
+        agent = benchmark.FakeSnmpAgent([values or _values()], **options).start()
+        self.addCleanup(agent.stop)
+        return agent
+    
+    def client(self, agent):
+        host, port = agent.address
+        client = brother.SnmpClient(host, port, agent.community_for(0), timeout=2.0)
+        self.addCleanup(client.close)
+        return client
+    
+    def collect(self, agent):
+        host, port = agent.address
+        return brother.collect_snmp_data(host, agent.community_for(0), port)
+    
+    @staticmethod
+    def expected_walk(agent, root):
+        return {oid for oid in agent.tables[0]['oids'] if oid[:len(root)] == root}
+
+class BulkWalkTest(AgentTestCase):
+    def test_walk_returns_every_row_of_each_column(self):
+        agent = self.start_agent()
+        tables = self.client(agent).bulk_walk(COLUMNS)
+        
+        for root in COLUMNS:
+            with self.subTest(root=root):
+                self.assertEqual(set(tables[root]), self.expected_walk(agent, root))
+    
+    def test_too_big_halves_the_repetitions(self):
+        reference = self.client(self.start_agent()).bulk_walk(COLUMNS, max_repetitions=10)
+        # 7 columns: 70 and 35 varbinds are too big, 14 fit
+        agent = self.start_agent(max_varbinds=20)
+        
+        self.assertEqual(self.client(agent).bulk_walk(COLUMNS, max_repetitions=10), reference)
+        self.assertEqual(agent.stats['too_big'], 2)
+    
+    def test_too_big_with_a_single_repetition_is_an_error(self):
+        agent = self.start_agent(max_varbinds=3)
+        
+        with self.assertRaises(ValueError):
+            self.client(agent).bulk_walk(COLUMNS, max_repetitions=4)
+    
+    def test_walk_stops_at_end_of_mib_view(self):
+        # Without the Brother private OIDs the colorant column is the last subtree
+        agent = self.start_agent(brother_oids=False)
+        client = self.client(agent)
+        
+        self.assertEqual(set(client.bulk_walk([brother.PRT_COLORANT_VALUE])[brother.PRT_COLORANT_VALUE]),
+                         self.expected_walk(agent, brother.PRT_COLORANT_VALUE))
+        self.assertEqual(client.bulk_walk([(1, 3, 6, 1, 9)]), {(1, 3, 6, 1, 9): {}})
+    
+    def test_walk_stops_at_the_end_of_the_subtree(self):
+        agent = self.start_agent()
+        client = self.client(agent)
+        rows = client.bulk_walk([brother.PRT_SUPPLIES_TYPE], max_repetitions=50)[brother.PRT_SUPPLIES_TYPE]
+        
+        self.assertEqual(set(rows), self.expected_walk(agent, brother.PRT_SUPPLIES_TYPE))
+        # One request was enough, the rest of the answer belongs to the next column
+        self.assertEqual(client.requests, 1)
+
+class CollectSnmpDataTest(AgentTestCase):
+    def test_all_values(self):
+        values = _values()
+        
+        self.assertEqual(self.collect(self.start_agent(values)), values)
+    
+    def test_missing_brother_blocks(self):
+        values = _values()
+        data = self.collect(self.start_agent(values, brother_oids=False))
+        
+        self.assertEqual(data['toner'], values['toner'])
+        self.assertEqual(data['drum'], values['drum'])
+        # Only the Printer-MIB life count: no colour/B&W split
+        self.assertEqual(data['pages_printed'], {'total': values['pages_printed']['total']})
+        for unit in ('belt_unit', 'fuser_unit'):
+            self.assertEqual(data[unit]['pages'], values[unit]['pages'])
+            self.assertAlmostEqual(data[unit]['percent'], values[unit]['percent'], delta=1)
+    
+    def test_negative_and_unknown_levels_are_skipped(self):
+        values = _values()
+        agent = self.start_agent(values)
+        table = agent.tables[0]['values']
+        # Row 1 is the cyan toner, row 2 the cyan drum, row 3 the magenta toner
+        table[brother.PRT_SUPPLIES_LEVEL + (1, 1)] = (brother.BER_INTEGER, -3)
+        table[brother.PRT_SUPPLIES_LEVEL + (1, 2)] = (brother.BER_INTEGER, -2)
+        table[brother.PRT_SUPPLIES_TYPE + (1, 3)] = (brother.BER_INTEGER, 99)
+        data = self.collect(agent)
+        
+        self.assertNotIn('cyan', data['toner'])
+        self.assertNotIn('magenta', data['toner'])
+        self.assertNotIn('cyan', data['drum'])
+        self.assertEqual(data['toner']['black'], values['toner']['black'])
+        self.assertEqual(data['drum']['magenta'], values['drum']['magenta'])
+
+class AutoSourceTest(AgentTestCase):
+    def setUp(self):
+        self.emulator = benchmark.PrinterEmulator().start()
+        self.addCleanup(self.emulator.stop)
+        self.values = self.emulator.printers[0]['values']
+    
+    def poll(self, agent, snmp_only=None):
+        printer = {'url': self.emulator.url(0), 'zabbix_hostname': 'printer', 'password': 'initpass',
+                   'snmp_port': agent.address[1], 'source': 'auto'}
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = brother.poll_printer(printer, timeout=5, snmp_only=snmp_only)
+        self.assertIsNone(result['error'])
+        return result
+    
+    def test_web_ui_fills_the_missing_fields(self):
+        result = self.poll(self.start_agent(self.values, brother_oids=False))
+        data = result['data'].as_dict()
+        
+        self.assertIn('login_post', result['timings'].stages)
+        self.assertEqual(data['pages_printed'], self.values['pages_printed'])
+        self.assertEqual(data['toner'], self.values['toner'])
+        self.assertEqual(brother.missing_printer_fields(data), [])
+    
+    def test_complete_agent_skips_the_web_ui(self):
+        result = self.poll(self.start_agent(self.values))
+        
+        self.assertNotIn('login_post', result['timings'].stages)
+        self.assertEqual(result['data'].as_dict(), self.values)
+    
+    def without_page_counters(self):
+        """Agent and web UI both without the colour/mono page counters."""
+        for counter in ('colour', 'bw'):
+            del self.values['pages_printed'][counter]
+        self.emulator.pages[0] = benchmark.render_information_page(self.values, 'en')
+        return self.start_agent(self.values, brother_oids=False)
+    
+    def test_useless_web_ui_is_skipped_until_the_mark_expires(self):
+        agent = self.without_page_counters()
+        snmp_only = brother.SnmpOnlyPrinters(ttl=0.2)
+        
+        scraped = ['login_post' in self.poll(agent, snmp_only)['timings'].stages for _ in range(2)]
+        time.sleep(0.25)
+        scraped.append('login_post' in self.poll(agent, snmp_only)['timings'].stages)
+        
+        self.assertEqual(scraped, [True, False, True])
+    
+    def test_useful_web_ui_is_not_skipped(self):
+        agent = self.start_agent(self.values, brother_oids=False)
+        snmp_only = brother.SnmpOnlyPrinters()
+        
+        for _ in range(2):
+            self.assertIn('login_post', self.poll(agent, snmp_only)['timings'].stages)
+    
+    def test_without_memory_every_poll_scrapes(self):
+        agent = self.without_page_counters()
+        
+        for _ in range(2):
+            self.assertIn('login_post', self.poll(agent)['timings'].stages)
+
+if __name__ == '__main__':
+    unittest.main()
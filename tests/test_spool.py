@@ -0,0 +1,122 @@
+"""
+Tests of the on-disk spool of values for an unreachable Zabbix server,
+with the fake trapper of benchmark.py coming back on the same port.
+"""
+import contextlib
+import io
+import json
+import os
+import socket
+import tempfile
+import time
+import unittest
+
+import benchmark
+import brother
+
+def _closed_port():
+    """Returns a local port where nothing is listening."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _items(count, host='printer', clock=None):
+    items = [{'host': host, 'key': f'brother.toner[{number}]', 'value': number} for number in range(count)]
+    if clock is not None:
+        for item in items:
+            item['clock'] = clock
+    return items
+
+class SpoolTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, 'spool.jsonl')
+        self.spool = brother.Spool(self.path)
+        self.port = _closed_port()
+    
+    def send(self, items):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return brother.send_items_to_zabbix(items, '127.0.0.1', self.port, sender='native', spool=self.spool)
+    
+    def start_trapper(self):
+        trapper = benchmark.FakeTrapper().start(port=self.port)
+        self.addCleanup(trapper.stop)
+        return trapper
+    
+    def test_values_are_spooled_while_the_trapper_is_down(self):
+        summary = self.send(_items(3))
+        
+        self.assertEqual((summary['processed'], summary['spooled']), (0, 3))
+        self.assertEqual(self.spool.pending('127.0.0.1', self.port), 3)
+        self.assertEqual(self.spool.pending('127.0.0.1', self.port + 1), 0)
+        with open(self.path, encoding='utf-8') as file:
+            entries = [json.loads(line) for line in file]
+        self.assertEqual([entry['item']['key'] for entry in entries], [item['key'] for item in _items(3)])
+        self.assertTrue(all(entry['item']['value'] == str(number) for number, entry in enumerate(entries)))
+    
+    def test_backlog_is_replayed_once_the_trapper_is_back(self):
+        self.send(_items(3, host='old'))
+        trapper = self.start_trapper()
+        
+        summary = self.send(_items(2, host='new'))
+        
+        self.assertEqual((summary['processed'], summary['spooled'], summary['replayed']), (2, 0, 3))
+        self.assertEqual(sorted(item['host'] for item in trapper.items), ['new', 'new', 'old', 'old', 'old'])
+        self.assertEqual(self.spool.pending(), 0)
+        self.assertEqual(self.spool.stats['replayed'], 3)
+    
+    def test_replayed_values_keep_their_clock(self):
+        collected = int(time.time()) - 3600
+        self.send(_items(2, clock=collected))
+        self.send(_items(1, host='later'))
+        trapper = self.start_trapper()
+        
+        self.send([])
+        
+        clocks = {item['host']: item['clock'] for item in trapper.items}
+        self.assertEqual(clocks['printer'], collected)
+        self.assertGreater(clocks['later'], collected)
+        self.assertTrue(all(item['ns'] == 0 for item in trapper.items))
+    
+    def test_torn_last_line_is_skipped(self):
+        self.send(_items(2))
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write('{"server":"127.0.0.1","port":')
+        
+        self.assertEqual(self.spool.pending(), 2)
+        # A value spooled after the crash doesn't end up glued to the torn line
+        self.send(_items(1, host='after'))
+        self.assertEqual(self.spool.pending(), 3)
+        
+        trapper = self.start_trapper()
+        summary = self.send([])
+        
+        self.assertEqual(summary['replayed'], 3)
+        self.assertEqual(sorted(item['host'] for item in trapper.items), ['after', 'printer', 'printer'])
+        self.assertEqual(os.path.getsize(self.path), 0)
+    
+    def test_backlog_stays_while_the_trapper_is_down(self):
+        self.send(_items(2))
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            replayed = self.spool.replay('127.0.0.1', self.port, lambda batch: brother._send_batch(
+                batch, '127.0.0.1', self.port, 'native'))
+        
+        self.assertEqual(replayed, 0)
+        self.assertEqual(self.spool.pending(), 2)
+    
+    def test_expired_values_are_dropped(self):
+        self.spool = brother.Spool(self.path, max_age=60)
+        self.send(_items(2, clock=int(time.time()) - 120))
+        self.send(_items(1, host='recent'))
+        trapper = self.start_trapper()
+        
+        summary = self.send([])
+        
+        self.assertEqual(summary['replayed'], 1)
+        self.assertEqual([item['host'] for item in trapper.items], ['recent'])
+        self.assertEqual(self.spool.stats['dropped'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Tests of the delta mode (StateStore) on a temporary SQLite file.
+"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import benchmark
+import brother
+
+def _items(values, host='printer'):
+    return [{'host': host, 'key': key, 'value': value} for key, value in values.items()]
+
+class StateStoreTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, 'state.db')
+        self.store = self.open()
+    
+    def open(self):
+        store = brother.StateStore(self.path, heartbeat=3600)
+        self.addCleanup(store.close)
+        return store
+    
+    def test_new_values_are_sent(self):
+        items = _items({'toner.black': 50, 'drum.black': 80})
+        
+        self.assertEqual(self.store.filter(items, now=1000), items)
+    
+    def test_unchanged_values_are_dropped(self):
+        self.store.record(_items({'toner.black': 50, 'drum.black': 80}), now=1000)
+        
+        self.assertEqual(self.store.filter(_items({'toner.black': 50, 'drum.black': 80}), now=1060), [])
+        self.assertEqual(self.store.stats['suppressed'], 2)
+    
+    def test_changed_values_are_sent(self):
+        self.store.record(_items({'toner.black': 50, 'drum.black': 80}), now=1000)
+        
+        changed = self.store.filter(_items({'toner.black': 49, 'drum.black': 80}), now=1060)
+        
+        self.assertEqual(changed, _items({'toner.black': 49}))
+    
+    def test_values_are_compared_as_text(self):
+        self.store.record(_items({'toner.black': 50}), now=1000)
+        
+        self.assertEqual(self.store.filter(_items({'toner.black': '50'}), now=1060), [])
+    
+    def test_unchanged_value_is_sent_again_after_the_heartbeat(self):
+        self.store.record(_items({'toner.black': 50}), now=1000)
+        
+        self.assertEqual(self.store.filter(_items({'toner.black': 50}), now=1000 + 3599), [])
+        self.assertEqual(self.store.filter(_items({'toner.black': 50}), now=1000 + 3600), _items({'toner.black': 50}))
+    
+    def test_heartbeat_restarts_with_every_send(self):
+        self.store.record(_items({'toner.black': 50}), now=1000)
+        self.store.record(_items({'toner.black': 50}), now=4600)
+        
+        self.assertEqual(self.store.filter(_items({'toner.black': 50}), now=4600 + 3599), [])
+    
+    def test_hosts_are_kept_apart(self):
+        self.store.record(_items({'toner.black': 50}, host='a'), now=1000)
+        
+        self.assertEqual(self.store.filter(_items({'toner.black': 50}, host='b'), now=1060),
+                         _items({'toner.black': 50}, host='b'))
+    
+    def test_state_survives_a_restart(self):
+        self.store.record(_items({'toner.black': 50}), now=1000)
+        self.store.close()
+        
+        self.assertEqual(self.open().filter(_items({'toner.black': 50}), now=1060), [])
+
+class DeltaSendTest(unittest.TestCase):
+    def setUp(self):
+        self.trapper = benchmark.FakeTrapper(fail_keys=('drum.black',)).start()
+        self.addCleanup(self.trapper.stop)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.store = brother.StateStore(os.path.join(folder.name, 'state.db'))
+        self.addCleanup(self.store.close)
+    
+    def send(self, items):
+        host, port = self.trapper.address
+        with contextlib.redirect_stdout(io.StringIO()):
+            return brother.send_items_to_zabbix(items, host, port, sender='native', state_store=self.store)
+    
+    def test_only_accepted_values_are_recorded(self):
+        self.send(_items({'toner.black': 50}))
+        self.send(_items({'drum.black': 80}))
+        del self.trapper.items[:]
+        
+        summary = self.send(_items({'toner.black': 50, 'drum.black': 80}))
+        
+        self.assertEqual(summary['suppressed'], 1)
+        self.assertEqual([item['key'] for item in self.trapper.items], ['drum.black'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Tests of the Zabbix template exported for the JSON mode.
+"""
+import json
+import re
+import unittest
+import uuid
+
+import brother
+
+def _uuids(node):
+    """Every 'uuid' value of the export."""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == 'uuid':
+                yield value
+            else:
+                yield from _uuids(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _uuids(value)
+
+class TemplateUuidTest(unittest.TestCase):
+    def setUp(self):
+        self.uuids = list(_uuids(brother.build_zabbix_template()))
+    
+    def test_uuids_are_version_4(self):
+        self.assertTrue(self.uuids)
+        for value in self.uuids:
+            with self.subTest(uuid=value):
+                # Same format Zabbix checks on import: 32 lowercase hex digits of a v4 UUID
+                self.assertRegex(value, re.compile(r'^[0-9a-f]{12}4[0-9a-f]{3}[89ab][0-9a-f]{15}$'))
+                self.assertEqual(uuid.UUID(hex=value).version, 4)
+    
+    def test_uuids_are_unique(self):
+        self.assertEqual(len(set(self.uuids)), len(self.uuids))
+    
+    def test_export_is_deterministic(self):
+        self.assertEqual(json.dumps(brother.build_zabbix_template(), sort_keys=True),
+                         json.dumps(brother.build_zabbix_template(), sort_keys=True))
+
+if __name__ == '__main__':
+    unittest.main()
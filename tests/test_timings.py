@@ -0,0 +1,94 @@
+"""
+Tests of the per-stage poll timings (PollTimings and TimingLog) against the
+printer emulator with a fixed latency per answer.
+"""
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import benchmark
+import brother
+
+LATENCY = 0.05
+
+class EmulatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.emulator = benchmark.PrinterEmulator(printers=1, latency=LATENCY).start()
+        self.addCleanup(self.emulator.stop)
+        # The first poll also pays the lazy imports, which belong to no stage
+        self.poll('fast')
+    
+    def poll(self, extractor):
+        printer = {'url': self.emulator.url(0), 'zabbix_hostname': 'printer-1', 'password': 'initpass'}
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = brother.poll_printer(printer, extractor=extractor, timeout=5)
+        self.assertIsNone(result['error'])
+        return result['timings']
+    
+    def assertStagesAddUp(self, timings):
+        record = timings.as_dict()
+        stages = sum(entry['seconds'] for entry in record['stages'].values())
+        self.assertLessEqual(stages, record['duration'])
+        self.assertAlmostEqual(stages, record['duration'], delta=0.02)
+        self.assertAlmostEqual(record['login_duration'], timings.seconds(*brother.LOGIN_STAGES), places=5)
+
+class PollTimingsTest(EmulatorTestCase):
+    def test_streamed_poll(self):
+        timings = self.poll('fast')
+        
+        self.assertEqual(list(timings.stages), ['status_get', 'csrf_parse', 'login_post'])
+        self.assertEqual(timings.http_requests, 2)
+        self.assertFalse(timings.fallback_fetch)
+        for name in ('status_get', 'login_post'):
+            self.assertGreaterEqual(timings.stages[name]['seconds'], LATENCY)
+        self.assertStagesAddUp(timings)
+    
+    def test_downloaded_page_is_parsed_apart(self):
+        timings = self.poll('bs4')
+        
+        self.assertEqual(list(timings.stages), ['status_get', 'csrf_parse', 'login_post', 'parse'])
+        self.assertEqual(timings.stages['parse']['bytes'], timings.stages['login_post']['bytes'])
+        self.assertStagesAddUp(timings)
+    
+    def test_information_page_fetched_after_the_login(self):
+        self.emulator.redirect = False
+        
+        timings = self.poll('fast')
+        
+        self.assertEqual(list(timings.stages), ['status_get', 'csrf_parse', 'login_post', 'information_get'])
+        self.assertEqual(timings.http_requests, 3)
+        self.assertTrue(timings.fallback_fetch)
+        self.assertStagesAddUp(timings)
+
+class TimingLogTest(EmulatorTestCase):
+    def test_json_line(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        path = os.path.join(folder.name, 'timings.jsonl')
+        log = brother.TimingLog(path)
+        timings = self.poll('fast')
+        log.add({'timings': timings, 'error': None})
+        log.write(timings, error='Timeout')
+        log.close()
+        
+        with open(path, encoding='utf-8') as file:
+            lines = file.read().splitlines()
+        
+        self.assertEqual(len(lines), 2)
+        self.assertNotIn(' ', lines[0].replace('"printer-1"', ''))
+        record = json.loads(lines[0])
+        self.assertEqual(sorted(record), sorted([
+            'timestamp', 'printer', 'duration', 'login_duration', 'stages', 'http_requests', 'downloaded_bytes',
+            'retries', 'fallback_fetch', 'connections', 'error'
+        ]))
+        self.assertEqual(record['printer'], 'printer-1')
+        self.assertIsNone(record['error'])
+        self.assertEqual(sorted(record['stages']['login_post']), ['bytes', 'seconds'])
+        self.assertEqual(record['downloaded_bytes'], sum(entry['bytes'] for entry in record['stages'].values()))
+        self.assertEqual(json.loads(lines[1])['error'], 'Timeout')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+"""
+Tests of the native Zabbix sender protocol against a local fake trapper.
+"""
+import contextlib
+import io
+import os
+import socket
+import stat
+import tempfile
+import unittest
+
+import benchmark
+import brother
+
+def _items(count, host='printer'):
+    return [{'host': host, 'key': f'brother.test[{number}]', 'value': number, 'label': f'Item {number}'}
+            for number in range(count)]
+
+def _closed_port():
+    """Returns a local port where nothing is listening."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class FakeTrapperTestCase(unittest.TestCase):
+    trapper_options = {}
+    
+    def setUp(self):
+        self.trapper = benchmark.FakeTrapper(**self.trapper_options).start()
+        self.addCleanup(self.trapper.stop)
+        self.host, self.port = self.trapper.address
+    
+    def send(self, items, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return brother.send_items_to_zabbix(items, self.host, self.port, **kwargs)
+
+class SuccessfulBatchTest(FakeTrapperTestCase):
+    def test_batch_is_sent_in_one_connection(self):
+        items = _items(5)
+        response = brother.zabbix_sender_protocol(items, self.host, self.port)
+        
+        self.assertEqual(response['response'], 'success')
+        self.assertEqual((response['processed'], response['failed'], response['total']), (5, 0, 5))
+        self.assertEqual(self.trapper.connections, 1)
+        self.assertEqual([item['key'] for item in self.trapper.items], [item['key'] for item in items])
+        # Only the protocol fields reach the server
+        self.assertNotIn('label', self.trapper.items[0])
+    
+    def test_every_item_is_ok(self):
+        summary = self.send(_items(3), sender='native')
+        
+        self.assertEqual((summary['processed'], summary['failed'], summary['total']), (3, 0, 3))
+        self.assertEqual([ok for _, ok in summary['results']], [True, True, True])
+    
+    def test_items_are_split_in_batches(self):
+        summary = self.send(_items(brother.ZABBIX_BATCH_SIZE + 1), sender='native')
+        
+        self.assertEqual(summary['processed'], brother.ZABBIX_BATCH_SIZE + 1)
+        self.assertEqual(self.trapper.connections, 2)
+    
+    def test_clock_is_sent_with_the_values(self):
+        items = [dict(item, clock=1700000000, ns=5) for item in _items(2)]
+        brother.zabbix_sender_protocol(items, self.host, self.port)
+        
+        self.assertEqual([(item['clock'], item['ns']) for item in self.trapper.items], [(1700000000, 5)] * 2)
+
+class PartialFailureTest(FakeTrapperTestCase):
+    trapper_options = {'fail_keys': ['brother.test[1]']}
+    
+    def test_counters_are_parsed(self):
+        response = brother.zabbix_sender_protocol(_items(3), self.host, self.port)
+        
+        self.assertEqual((response['processed'], response['failed'], response['total']), (2, 1, 3))
+    
+    def test_items_of_a_partially_failed_batch_are_unknown(self):
+        summary = self.send(_items(3), sender='native')
+        
+        self.assertEqual((summary['processed'], summary['failed']), (2, 1))
+        self.assertEqual([ok for _, ok in summary['results']], [None, None, None])
+    
+    def test_fully_failed_batch_is_false(self):
+        summary = self.send(_items(2)[1:], sender='native')
+        
+        self.assertEqual([ok for _, ok in summary['results']], [False])
+
+class CompressedResponseTest(FakeTrapperTestCase):
+    trapper_options = {'compress': True}
+    
+    def test_compressed_body_is_decompressed(self):
+        response = brother.zabbix_sender_protocol(_items(2), self.host, self.port)
+        
+        self.assertEqual((response['processed'], response['failed']), (2, 0))
+
+class LargeResponseTest(FakeTrapperTestCase):
+    trapper_options = {'large': True}
+    
+    def test_64_bit_lengths_are_read(self):
+        response = brother.zabbix_sender_protocol(_items(2), self.host, self.port)
+        
+        self.assertEqual((response['processed'], response['failed']), (2, 0))
+
+class LargeCompressedResponseTest(FakeTrapperTestCase):
+    trapper_options = {'compress': True, 'large': True}
+    
+    def test_both_flags(self):
+        response = brother.zabbix_sender_protocol(_items(2), self.host, self.port)
+        
+        self.assertEqual((response['processed'], response['failed']), (2, 0))
+
+class BinaryFallbackTest(unittest.TestCase):
+    """Connection refused in auto mode goes to a zabbix_sender found in PATH."""
+    
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.stdin_path = os.path.join(folder.name, 'stdin.txt')
+        script = os.path.join(folder.name, 'zabbix_sender')
+        with open(script, 'w', encoding='utf-8') as file:
+            file.write(
+                '#!/bin/sh\n'
+                f'echo "$@" > "{self.stdin_path}.args"\n'
+                f'cat > "{self.stdin_path}"\n'
+                'echo "info from server: \\"processed: 2; failed: 0; total: 2; seconds spent: 0.000050\\""\n'
+                'echo "sent: 2; skipped: 0; total: 2"\n'
+            )
+        os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+        path = os.environ.get('PATH', '')
+        os.environ['PATH'] = folder.name + os.pathsep + path
+        self.addCleanup(os.environ.__setitem__, 'PATH', path)
+    
+    def test_refused_connection_uses_the_binary(self):
+        port = _closed_port()
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            summary = brother.send_items_to_zabbix(_items(2), '127.0.0.1', port, sender='auto')
+        
+        self.assertIn('Error sending to', output.getvalue())
+        self.assertEqual((summary['processed'], summary['failed']), (2, 0))
+        self.assertEqual([ok for _, ok in summary['results']], [True, True])
+        with open(self.stdin_path + '.args', encoding='utf-8') as file:
+            self.assertEqual(file.read().split(), ['-z', '127.0.0.1', '-p', str(port), '-i', '-'])
+        with open(self.stdin_path, encoding='utf-8') as file:
+            self.assertEqual(file.read(), '"printer" brother.test[0] 0\n"printer" brother.test[1] 1\n')
+    
+    def test_no_fall_back_once_the_values_were_sent(self):
+        for reply in ('invalid', 'none'):
+            with self.subTest(reply=reply):
+                trapper = benchmark.FakeTrapper(reply=reply).start()
+                self.addCleanup(trapper.stop)
+                host, port = trapper.address
+                with contextlib.redirect_stdout(io.StringIO()) as output:
+                    summary = brother.send_items_to_zabbix(_items(2), host, port, sender='auto')
+                
+                self.assertIn('No valid answer', output.getvalue())
+                self.assertEqual(len(trapper.items), 2)
+                self.assertEqual((summary['processed'], summary['failed']), (0, 2))
+                self.assertEqual([ok for _, ok in summary['results']], [False, False])
+                self.assertFalse(os.path.exists(self.stdin_path))
+    
+    def test_sent_values_are_not_spooled(self):
+        trapper = benchmark.FakeTrapper(reply='none').start()
+        self.addCleanup(trapper.stop)
+        spool = brother.Spool(os.path.join(os.path.dirname(self.stdin_path), 'spool.jsonl'))
+        host, port = trapper.address
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = brother.send_items_to_zabbix(_items(2), host, port, sender='auto', spool=spool)
+        
+        self.assertEqual(summary['spooled'], 0)
+        self.assertEqual(spool.pending(), 0)
+    
+    def test_native_mode_does_not_fall_back(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = brother.send_items_to_zabbix(_items(2), '127.0.0.1', _closed_port(), sender='native')
+        
+        self.assertEqual((summary['processed'], summary['failed']), (0, 2))
+        self.assertFalse(os.path.exists(self.stdin_path))
+
+if __name__ == '__main__':
+    unittest.main()